@@ -0,0 +1,110 @@
+import math
+import time
+import threading
+
+# Weight of the latest request in the running estimate of the service time
+SERVICE_TIME_SMOOTHING = 0.1
+
+
+class AdmissionController:
+    """
+    Bounds the /predict requests a worker runs at once.
+
+    A request that finds every slot taken waits at most max_wait_ms for one
+    and is then turned away, so excess load is shed in milliseconds rather
+    than queued until clients time out. With fewer slots than server
+    threads, some threads always remain for /health and /ready. The
+    controller keeps a running estimate of the service time, from which
+    rejected clients get a Retry-After hint.
+    """
+
+    def __init__(self, max_in_flight, max_wait_ms=0.0):
+        """
+        Args:
+            max_in_flight (int): Requests allowed to run at the same time.
+            max_wait_ms (float): Longest wait for a free slot.
+        """
+        self.max_in_flight = max_in_flight
+        self.max_wait = max_wait_ms / 1000
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.service_seconds = None
+
+    def try_acquire(self, deadline=None):
+        """
+        Take a slot, waiting at most max_wait_ms and never past the deadline.
+
+        Args:
+            deadline (float): time.monotonic() by which the request must be
+                              done, or None.
+
+        Returns:
+            bool: Whether the request was admitted; release() must follow.
+        """
+        wait = self.max_wait
+        if deadline is not None:
+            wait = min(wait, max(deadline - time.monotonic(), 0.0))
+        admitted = self._slots.acquire(timeout=wait) if wait > 0 else self._slots.acquire(False)
+        with self._lock:
+            if admitted:
+                self.in_flight += 1
+                self.admitted += 1
+            else:
+                self.rejected += 1
+        return admitted
+
+    def release(self, seconds=None):
+        """
+        Free a slot.
+
+        Args:
+            seconds (float): How long the request held it, for the estimate
+                             of the service time.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            if seconds is not None:
+                if self.service_seconds is None:
+                    self.service_seconds = seconds
+                else:
+                    self.service_seconds += SERVICE_TIME_SMOOTHING * (seconds - self.service_seconds)
+        self._slots.release()
+
+    def saturated(self):
+        return self.in_flight >= self.max_in_flight
+
+    def retry_after(self):
+        """
+        Whole seconds a rejected client should wait before retrying: about
+        the time for the requests in flight to finish, at least 1.
+        """
+        return max(1, math.ceil(self.service_seconds or 0.0))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "service_seconds": self.service_seconds,
+            }
+
+
+def request_deadline(deadline_ms, started):
+    """
+    The deadline of a request on the time.monotonic() clock.
+
+    Args:
+        deadline_ms (float): Budget of the request in milliseconds, or None
+                             for no deadline.
+        started (float): time.monotonic() when the request arrived.
+    """
+    return started + deadline_ms / 1000 if deadline_ms is not None else None
+
+
+def deadline_expired(deadline):
+    return deadline is not None and time.monotonic() >= deadline
@@ -0,0 +1,131 @@
+import os
+import time
+import queue
+import threading
+from collections import Counter
+from api.metrics import metrics
+
+
+class _PendingRequest:
+    def __init__(self, records):
+        self.records = records
+        self.enqueued_at = time.perf_counter()
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent /predict calls of one worker into shared batches.
+
+    Requests are collected for up to window_ms, or until max_rows records
+    are waiting, and handed to process() together, so the pipeline and the
+    forest run once for the whole group. Each caller gets back only its own
+    slice of the result.
+    """
+
+    def __init__(self, process, window_ms=5.0, max_rows=64):
+        """
+        Args:
+            process (callable): Takes a list with the records of each request
+                                and returns one result per request.
+            window_ms (float): Longest time the first request of a batch
+                               waits for others to join it.
+            max_rows (int): Batch size that triggers processing right away.
+        """
+        self.process = process
+        self.window = window_ms / 1000
+        self.max_rows = max_rows
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        # Realized batch sizes, in records and in requests
+        self.batch_rows = Counter()
+        self.batch_requests = Counter()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, records):
+        """
+        Queue the records of one request and wait for their result.
+
+        Args:
+            records (list[dict]): Raw input records of the request.
+
+        Returns:
+            The result process() produced for this request.
+        """
+        self._ensure_thread()
+        pending = _PendingRequest(records)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def stats(self):
+        """
+        Distribution of realized batch sizes since startup.
+        """
+        with self._lock:
+            return {
+                "window_ms": self.window * 1000,
+                "max_rows": self.max_rows,
+                "batch_rows": dict(sorted(self.batch_rows.items())),
+                "batch_requests": dict(sorted(self.batch_requests.items())),
+            }
+
+    def _ensure_thread(self):
+        # Started on first use, in the worker itself: threads created before
+        # gunicorn forks its workers (--preload) do not survive the fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            rows = len(batch[0].records)
+            deadline = time.monotonic() + self.window
+            while rows < self.max_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    pending = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(pending)
+                rows += len(pending.records)
+            self._run(batch, rows)
+
+    def _run(self, batch, rows):
+        with self._lock:
+            self.batch_rows[rows] += 1
+            self.batch_requests[len(batch)] += 1
+        started = time.perf_counter()
+        for pending in batch:
+            metrics.observe("queue_wait_seconds", started - pending.enqueued_at, queue="batching")
+
+        try:
+            results = self.process([pending.records for pending in batch])
+            for pending, result in zip(batch, results):
+                pending.result = result
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].error = e
+                return
+            # One bad request must not fail the rest: retry them one by one
+            for pending in batch:
+                try:
+                    pending.result = self.process([pending.records])[0]
+                except Exception as error:
+                    pending.error = error
+        finally:
+            for pending in batch:
+                pending.done.set()
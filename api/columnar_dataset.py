@@ -0,0 +1,242 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+# Type of a dictionary-encoded text column in a schema
+STRING = "string"
+
+
+class ColumnarDataset:
+    """
+    Typed, append-only columnar dataset made of .npy column files.
+
+    Layout of the directory:
+
+        manifest.json          schema, string dictionaries, partitions
+        part-00000/<column>.npy
+        part-00001/<column>.npy
+
+    Numeric and date columns keep their numpy dtype, so every column file
+    can be memory-mapped. Text columns are dictionary-encoded: the files
+    hold int32 codes (-1 for missing values) into dictionaries kept in the
+    manifest, which only grow, so codes stay valid across partitions.
+    Partitions are written before the manifest that lists them is
+    replaced atomically, so readers never see a partial append. Several
+    partitions can be staged and committed together, with the input they
+    come from, so an interrupted run leaves the dataset as it was. A
+    rebuild is written next to the dataset it replaces, which readers keep
+    seeing until the rebuild is committed.
+    """
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.manifest = manifest
+        self._staged = []
+        # Dataset this one replaces on its first commit(), if any
+        self._replaces = None
+        self._codes = {
+            column: {value: code for code, value in enumerate(values)}
+            for column, values in manifest["dictionaries"].items()
+        }
+
+    @classmethod
+    def create(cls, directory, schema, overwrite=False):
+        """
+        Create an empty dataset.
+
+        Args:
+            directory (str): Directory of the dataset.
+            schema (dict): Column name -> numpy dtype string, or STRING.
+            overwrite (bool): Replace an existing dataset at directory. The
+                              new one is built in directory + ".tmp" and
+                              only moved there by commit().
+
+        Returns:
+            ColumnarDataset: The new dataset.
+        """
+        replaces = None
+        if os.path.exists(directory):
+            if not overwrite:
+                raise ValueError(f"Dataset already exists: {directory}")
+            replaces, directory = directory, f"{directory}.tmp"
+            # Left behind by an interrupted rebuild
+            if os.path.exists(directory):
+                shutil.rmtree(directory)
+        os.makedirs(directory)
+        manifest = {
+            "schema": schema,
+            "dictionaries": {
+                column: [] for column, dtype in schema.items() if dtype == STRING
+            },
+            "partitions": [],
+            "sources": [],
+        }
+        dataset = cls(directory, manifest)
+        dataset._write_manifest()
+        dataset._replaces = replaces
+        return dataset
+
+    @classmethod
+    def open(cls, directory):
+        """
+        Open a dataset written by create() and append().
+        """
+        with open(os.path.join(directory, "manifest.json")) as manifest_file:
+            return cls(directory, json.load(manifest_file))
+
+    @property
+    def schema(self):
+        return self.manifest["schema"]
+
+    @property
+    def n_rows(self):
+        return sum(partition["rows"] for partition in self.manifest["partitions"])
+
+    def has_source(self, source):
+        """
+        Whether the input identified by source was already appended.
+        """
+        return source in self.manifest["sources"]
+
+    def append(self, frame, source=None):
+        """
+        Write a DataFrame with the dataset's columns as a new partition.
+
+        Args:
+            frame (pd.DataFrame): Rows to append; extra columns are ignored.
+            source (str): Identifier of the input the rows come from,
+                          recorded so the same input is not appended twice.
+
+        Returns:
+            int: Number of rows appended.
+        """
+        rows = self.stage(frame)
+        self.commit(source)
+        return rows
+
+    def stage(self, frame):
+        """
+        Write a DataFrame as a new partition that readers see only after
+        commit(). Files of partitions staged by an interrupted run are
+        overwritten.
+
+        Returns:
+            int: Number of rows staged.
+        """
+        missing = [column for column in self.schema if column not in frame]
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+
+        name = f"part-{len(self.manifest['partitions']) + len(self._staged):05d}"
+        partition_dir = os.path.join(self.directory, name)
+        os.makedirs(partition_dir, exist_ok=True)
+        for column, dtype in self.schema.items():
+            if dtype == STRING:
+                values = self._encode(column, frame[column])
+            else:
+                values = frame[column].to_numpy(dtype=dtype)
+            np.save(os.path.join(partition_dir, f"{column}.npy"), values)
+
+        self._staged.append({"name": name, "rows": len(frame)})
+        return len(frame)
+
+    def commit(self, source=None):
+        """
+        List the staged partitions, and the input they come from, in the
+        manifest with a single atomic write.
+
+        Args:
+            source (str): Identifier of the input the rows come from,
+                          recorded so the same input is not appended twice.
+        """
+        self.manifest["partitions"] += self._staged
+        self._staged = []
+        if source is not None:
+            self.manifest["sources"].append(source)
+        self._write_manifest()
+        if self._replaces is not None:
+            self._replace_old()
+
+    def read_partition(self, index, columns=None, mmap_mode="r"):
+        """
+        Column arrays of one partition, memory-mapped by default.
+
+        Text columns are returned as their int32 codes; see decode().
+        """
+        partition_dir = os.path.join(self.directory, self.manifest["partitions"][index]["name"])
+        return {
+            column: np.load(os.path.join(partition_dir, f"{column}.npy"), mmap_mode=mmap_mode)
+            for column in (columns or self.schema)
+        }
+
+    def read_column(self, column, mmap_mode="r"):
+        """
+        One column over all partitions, as a single array.
+        """
+        parts = [
+            self.read_partition(i, [column], mmap_mode)[column]
+            for i in range(len(self.manifest["partitions"]))
+        ]
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            dtype = np.int32 if self.schema[column] == STRING else self.schema[column]
+            return np.empty(0, dtype=dtype)
+        return np.concatenate(parts)
+
+    def decode(self, column, codes):
+        """
+        Text values of dictionary codes (None for missing values).
+        """
+        dictionary = np.asarray(self.manifest["dictionaries"][column] + [None], dtype=object)
+        return dictionary[codes]
+
+    def to_frame(self, columns=None):
+        """
+        Load the dataset, or some of its columns, as a DataFrame.
+        """
+        data = {}
+        for column in columns or self.schema:
+            values = self.read_column(column)
+            data[column] = (
+                self.decode(column, values) if self.schema[column] == STRING
+                else np.asarray(values)
+            )
+        return pd.DataFrame(data)
+
+    def _encode(self, column, values):
+        codes = self._codes[column]
+        dictionary = self.manifest["dictionaries"][column]
+        inverse, uniques = pd.factorize(values)
+        if len(uniques) == 0:
+            return np.full(len(values), -1, dtype=np.int32)
+        # Map the distinct values of the chunk, adding unseen ones
+        mapped = np.empty(len(uniques), dtype=np.int32)
+        for i, value in enumerate(uniques):
+            value = str(value)
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(dictionary)
+                dictionary.append(value)
+            mapped[i] = code
+        return np.where(inverse >= 0, mapped[inverse], -1).astype(np.int32)
+
+    def _replace_old(self):
+        # A directory cannot be renamed over a non-empty one: move the old
+        # dataset aside first, so the path is only missing between the renames
+        old = f"{self._replaces}.old"
+        if os.path.exists(old):
+            shutil.rmtree(old)
+        os.replace(self._replaces, old)
+        os.replace(self.directory, self._replaces)
+        shutil.rmtree(old)
+        self.directory, self._replaces = self._replaces, None
+
+    def _write_manifest(self):
+        path = os.path.join(self.directory, "manifest.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as manifest_file:
+            json.dump(self.manifest, manifest_file)
+        os.replace(tmp_path, path)
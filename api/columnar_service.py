@@ -0,0 +1,69 @@
+import numpy as np
+from api.preprocessing_service import feature_pipeline
+from api.time_features import TIME_FEATURES, epoch_ns, time_feature_row
+
+REQUIRED_COLUMNS = [
+    "TransactionID", "Timestamp", "MerchantID", "Amount", "CustomerID",
+    "TransactionAmount", "AnomalyScore", "Category", "CustomerAge",
+    "AccountBalance", "SuspiciousFlag", "LastLogin"
+]
+
+
+def compile_features(input_data, pipeline=None):
+    """
+    Build the model's feature matrix straight from the request JSON.
+
+    A pandas-free equivalent of preprocess_data followed by
+    perform_feature_engineering for small batches: values are written
+    column by column into a preallocated float32 matrix in training column
+    order, which is the dtype the forest scores in.
+
+    Args:
+        input_data (dict or list[dict]): Raw input data from the user.
+        pipeline (FeaturePipeline): Fitted preprocessing state; defaults to
+                                    the artifact saved with the model.
+
+    Returns:
+        np.ndarray or None: Feature matrix of shape (n_records, n_features),
+                            or None when the input needs the general pandas
+                            path (unusual layouts, missing or invalid values),
+                            which also produces the proper error message.
+    """
+    pipeline = pipeline or feature_pipeline
+    records = [input_data] if isinstance(input_data, dict) else input_data
+    if not isinstance(records, list) or not records:
+        return None
+
+    try:
+        features = np.empty((len(records), len(pipeline.columns)), dtype=np.float32)
+        column_index = {col: i for i, col in enumerate(pipeline.columns)}
+        time_columns = [column_index[col] for col in TIME_FEATURES]
+        category_codes = {cat: code for code, cat in enumerate(pipeline.categories)}
+        converters = {
+            col: int if dtype.startswith("int") else float
+            for col, dtype in pipeline.input_dtypes.items() if col != "Category"
+        }
+
+        for row, record in enumerate(records):
+            if not isinstance(record, dict) or any(col not in record for col in REQUIRED_COLUMNS):
+                return None
+
+            # Model inputs, with missing values (None or NaN) filled with 0
+            # like fillna(0)
+            for col, convert in converters.items():
+                value = record[col]
+                value = 0 if value is None else convert(value)
+                features[row, column_index[col]] = 0 if value != value else value
+            features[row, column_index["Category"]] = category_codes[record["Category"]]
+
+            # Time-based features
+            timestamp = epoch_ns(record["Timestamp"])
+            last_login = epoch_ns(record["LastLogin"])
+            if timestamp is None or last_login is None:
+                return None
+            features[row, time_columns] = time_feature_row(timestamp, last_login)
+
+        return features
+
+    except (KeyError, TypeError, ValueError):
+        return None
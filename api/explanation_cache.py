@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+from api.metrics import metrics
+
+# Counter names of cache events in the shared metrics registry
+CACHE_EVENTS = {"hits": "hit", "misses": "miss", "evictions": "eviction"}
+
+
+class ExplanationCache:
+    """
+    Content-addressed explanation cache shared by all workers on a host.
+
+    Entries are JSON files named by a hash of the engineered feature matrix
+    and the model version, so every gunicorn worker reads and fills the same
+    cache. Entries expire after ttl seconds, which is kept below the lifetime
+    of the presigned URLs they hold, and the oldest entries are evicted once
+    the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir="static/explanation_cache", max_bytes=10_000_000,
+                 ttl=540, rescan_every=100):
+        """
+        Args:
+            cache_dir (str): Directory holding the cache entries.
+            max_bytes (int): Size cap for all entries together.
+            ttl (int): Seconds an entry stays valid after it was written.
+            rescan_every (int): Writes between full rescans of the directory,
+                                which pick up entries written by other workers.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.rescan_every = rescan_every
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._bytes = self._scan_bytes()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(features, model_version):
+        """
+        Stable hash of a feature matrix and the model version that scores it.
+
+        Args:
+            features: Engineered features (DataFrame or 2D array).
+            model_version (str): Identifier of the loaded model.
+
+        Returns:
+            str: Hex digest used as the cache key.
+        """
+        # Hash the float32 values the forest actually scores, so the pandas
+        # and columnar paths share entries for the same request
+        values = np.ascontiguousarray(features, dtype=np.float32)
+        digest = hashlib.sha256(model_version.encode())
+        digest.update(np.asarray(values.shape, dtype=np.int64).tobytes())
+        digest.update(values.tobytes())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Return the cached value for a key, or None on a miss or expired entry.
+        """
+        path = self._path(key)
+        try:
+            with open(path) as entry_file:
+                entry = json.load(entry_file)
+        except (FileNotFoundError, ValueError):
+            self._count("misses")
+            return None
+
+        if time.time() - entry["created_at"] > self.ttl:
+            self._remove(path)
+            self._count("misses")
+            return None
+
+        self._count("hits")
+        return entry["value"]
+
+    def set(self, key, value):
+        """
+        Store a JSON-serializable value and evict old entries past max_bytes.
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as entry_file:
+            json.dump({"created_at": time.time(), "value": value}, entry_file)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._writes += 1
+            self._bytes += size
+            rescan = self._writes % self.rescan_every == 0
+        if rescan or self._bytes > self.max_bytes:
+            self._evict()
+
+    def stats(self):
+        """
+        Hit, miss and eviction counters of all workers on the host (from
+        the shared metrics snapshots, so up to one flush interval old),
+        those of the answering worker, and the cache size.
+        """
+        totals = {counter: 0 for counter in CACHE_EVENTS}
+        events = {event: counter for counter, event in CACHE_EVENTS.items()}
+        for labels, values in metrics.collect().get("explanation_cache_events_total", []):
+            if labels.get("event") in events:
+                totals[events[labels["event"]]] += values[0]
+        return {
+            **totals,
+            "worker": {
+                "pid": os.getpid(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            },
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _evict(self):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        # Expired entries go first, then the oldest until we fit the cap
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes and now - mtime <= self.ttl:
+                break
+            if self._remove(path):
+                total -= size
+
+        with self._lock:
+            self._bytes = total
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            self.evictions += 1
+            self._bytes -= size
+        metrics.increment("explanation_cache_events_total", event="eviction")
+        return True
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+        metrics.increment("explanation_cache_events_total", event=CACHE_EVENTS[counter])
+
+    def _scan_bytes(self):
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            try:
+                total += os.path.getsize(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+        return total
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
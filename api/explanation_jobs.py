@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from api.metrics import metrics
+
+
+class QueueFullError(Exception):
+    """
+    Raised when the explanation queue already holds its maximum of jobs.
+    """
+
+
+class ExplanationJobQueue:
+    """
+    Bounded pool that renders and uploads SHAP plots off the request path.
+
+    Job states are written as JSON files under job_dir, so any gunicorn
+    worker on the host can answer a status query for a job that another
+    worker accepted.
+    """
+
+    def __init__(self, render, job_dir="static/jobs", max_workers=2,
+                 max_pending=64, job_ttl=600, prune_interval=60.0):
+        """
+        Args:
+            render (callable): Function (model, features, **options) ->
+                               plot URL dict.
+            job_dir (str): Directory holding the job state files.
+            max_workers (int): Number of background render threads.
+            max_pending (int): Maximum number of queued or running jobs.
+            job_ttl (int): Seconds a finished job is kept before pruning.
+            prune_interval (float): Seconds between scans for expired jobs.
+        """
+        self.render = render
+        self.job_dir = job_dir
+        self.job_ttl = job_ttl
+        self.prune_interval = prune_interval
+        self._prune_lock = threading.Lock()
+        self._last_prune = 0.0
+        os.makedirs(job_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="explanation"
+        )
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, model, features, **options):
+        """
+        Queue the plots for a feature matrix and return the job ID.
+
+        Keyword options are passed on to render.
+
+        Raises:
+            QueueFullError: If max_pending jobs are already in flight.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("Explanation queue is full")
+
+        job_id = uuid.uuid4().hex
+        try:
+            self._write(job_id, {"status": "queued", "created_at": time.time()})
+            self._executor.submit(self._run, job_id, model, features.copy(),
+                                  time.perf_counter(), options)
+        except Exception:
+            self._slots.release()
+            raise
+        self.maybe_prune()
+        return job_id
+
+    def status(self, job_id):
+        """
+        Return the stored state of a job, or None if it is unknown.
+
+        Raises:
+            ValueError: If job_id is not a valid job ID.
+        """
+        path = self._path(job_id)
+        try:
+            with open(path) as job_file:
+                return json.load(job_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def maybe_prune(self):
+        """
+        Prune if prune_interval has passed since the last scan, so the
+        directory is not listed on every submit.
+        """
+        now = time.monotonic()
+        if now - self._last_prune < self.prune_interval:
+            return False
+        with self._prune_lock:
+            if now - self._last_prune < self.prune_interval:
+                return False
+            self._last_prune = now
+        self.prune()
+        return True
+
+    def prune(self):
+        """
+        Remove job files older than job_ttl, whose plot URLs have expired.
+        """
+        cutoff = time.time() - self.job_ttl
+        for name in os.listdir(self.job_dir):
+            path = os.path.join(self.job_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job_id, model, features, submitted_at, options):
+        metrics.observe("queue_wait_seconds", time.perf_counter() - submitted_at,
+                        queue="explanations")
+        state = self.status(job_id) or {}
+        try:
+            state["status"] = "running"
+            self._write(job_id, state)
+            state["plot_urls"] = self.render(model, features, **options)
+            state["status"] = "done"
+        except Exception as e:
+            state["status"] = "failed"
+            state["error"] = str(e)
+        finally:
+            state["finished_at"] = time.time()
+            self._write(job_id, state)
+            self._slots.release()
+
+    def _path(self, job_id):
+        # Job IDs are hex strings; anything else must not reach the filesystem
+        if not job_id.isalnum():
+            raise ValueError(f"Invalid job ID: {job_id}")
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _write(self, job_id, state):
+        state["id"] = job_id
+        path = self._path(job_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as job_file:
+            json.dump(state, job_file)
+        os.replace(tmp_path, path)
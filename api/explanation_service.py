@@ -1,43 +1,267 @@
+import io
 import os
+import time
 import uuid
-from functools import lru_cache
-import pandas as pd
-import boto3
+import weakref
+import threading
+import numpy as np
 import shap
 import matplotlib.pyplot as plt
-from dotenv import load_dotenv
-
-load_dotenv()
-# Access the environment variables
-bucket_name = "fraud-detection-de"
-region = "us-east-2"
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name=region,
-)
-
-@lru_cache(maxsize=100)
-def generate_cache_shap_explanations(model, features_tuple):
-    features = pd.DataFrame(features_tuple)
-    return generate_shap_explanations(model, features)
-
-def upload_to_s3(file_path, s3_key):
-    try:
-        # Upload file to S3
-        s3.upload_file(file_path, bucket_name, s3_key)
-        # Generate a pre-signed URL
-        url = s3.generate_presigned_url(
-            ClientMethod="get_object",
-            Params={"Bucket": bucket_name, "Key": s3_key},
-            ExpiresIn=600,  # Time in seconds
-        )
-        return url
-    except boto3.exceptions.S3UploadFailedError as e:
-        raise ValueError(f"S3 upload failed: {e}")
-
-def generate_shap_explanations(model, features, save_plots=True):
+from api.storage_service import create_object_store
+from api.plot_renderer import SummaryPlotRenderer
+from api.forest_engine import CompiledForest
+from api.metrics import metrics
+
+# Store that receives the rendered plots (S3 unless OBJECT_STORE says otherwise)
+object_store = create_object_store()
+
+# pyplot keeps global figure state, so only one thread may draw at a time
+_pyplot_lock = threading.Lock()
+
+# Column names of the engineered feature matrix, in training order
+FEATURE_NAMES = ['Amount', 'TransactionAmount', 'AnomalyScore', 'Category',
+                 'CustomerAge', 'AccountBalance', 'SuspiciousFlag', 'gap',
+                 'Hour', 'Day', 'Month', 'Weekday', 'Year']
+
+# Plot backend: "agg" draws with the thread-safe renderer, "shap" goes
+# through shap.summary_plot and pyplot
+PLOT_RENDERER = os.getenv("PLOT_RENDERER", "agg")
+
+plot_renderer = SummaryPlotRenderer(FEATURE_NAMES)
+
+# Attribution methods of the explain option: exact TreeSHAP, Saabas path
+# contributions from the compiled forest (one traversal, approximate), or
+# no explanation at all
+EXPLAIN_METHODS = ("exact", "fast", "none")
+
+# Weight of the latest call in the running estimate of TreeSHAP's cost
+EXACT_COST_SMOOTHING = 0.2
+
+# TreeSHAP holds the GIL for a whole call, so large batches are explained
+# this many records at a time to let the worker's other threads (/health,
+# /ready) run in between; the values are the same either way
+EXACT_CHUNK_ROWS = int(os.getenv("EXACT_CHUNK_ROWS", "16"))
+
+# Building a TreeExplainer walks every tree of the forest, so keep one per
+# loaded model instead of rebuilding it for each request, together with the
+# compiled forest of the fast method
+_explainers = {}
+
+# Models whose explainer was dropped because they are no longer served.
+# Jobs queued before the swap may still explain with them; they get a
+# throwaway explainer instead of registering the model again
+_retired_models = weakref.WeakSet()
+
+class ExactCost:
+    """
+    Running estimate of TreeSHAP's seconds per record, to decide whether an
+    exact explanation fits a request's deadline.
+    """
+
+    def __init__(self, smoothing=EXACT_COST_SMOOTHING):
+        self.smoothing = smoothing
+        self.seconds_per_row = None
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, n_rows):
+        per_row = seconds / max(n_rows, 1)
+        with self._lock:
+            if self.seconds_per_row is None:
+                self.seconds_per_row = per_row
+            else:
+                self.seconds_per_row += self.smoothing * (per_row - self.seconds_per_row)
+
+    def estimate(self, n_rows):
+        """
+        Expected seconds of an exact explanation of n_rows records (0 before
+        any observation).
+        """
+        return (self.seconds_per_row or 0.0) * n_rows
+
+exact_cost = ExactCost()
+
+def _build_entry(model):
+    # Array-backed forests describe themselves in SHAP's dictionary format
+    if hasattr(model, "to_shap_model"):
+        return model, shap.TreeExplainer(model.to_shap_model()), model
+    return model, shap.TreeExplainer(model), CompiledForest.from_sklearn(model)
+
+def register_explainer(model):
+    """
+    Build the SHAP explainer for a model once and keep it for reuse.
+
+    Also compiles the forest for the fast method and times the explainer
+    on a few records, which seeds the cost estimate of the deadline.
+
+    Args:
+        model: The trained machine learning model (compatible with SHAP),
+               or a CompiledForest.
+
+    Returns:
+        shap.TreeExplainer: The explainer bound to the model.
+    """
+    _retired_models.discard(model)
+    _, explainer, forest = _explainers[id(model)] = _build_entry(model)
+
+    sample = np.zeros((8, forest.n_features_in_))
+    # The first call pays one-off setup costs, which would skew the estimate
+    explainer.shap_values(sample[:1])
+    start = time.perf_counter()
+    explainer.shap_values(sample)
+    exact_cost.observe(time.perf_counter() - start, len(sample))
+    return explainer
+
+def unregister_explainer(model):
+    """
+    Drop the explainer of a model that is no longer served. Later calls
+    with the model still work but no longer keep an explainer for it.
+    """
+    _retired_models.add(model)
+    entry = _explainers.get(id(model))
+    if entry is not None and entry[0] is model:
+        del _explainers[id(model)]
+
+def _entry(model):
+    entry = _explainers.get(id(model))
+    if entry is not None and entry[0] is model:
+        return entry
+    if model in _retired_models:
+        return _build_entry(model)
+    register_explainer(model)
+    return _explainers[id(model)]
+
+def get_explainer(model):
+    """
+    Return the registered explainer for a model, building it on first use.
+    """
+    return _entry(model)[1]
+
+def choose_method(method, n_rows, deadline=None):
+    """
+    Fall back from exact to fast when TreeSHAP would overrun the deadline.
+
+    Args:
+        method (str): Requested method, one of EXPLAIN_METHODS.
+        n_rows (int): Records to explain.
+        deadline (float): time.monotonic() by which the explanation must be
+                          done, or None for no deadline.
+
+    Returns:
+        str: The method to run.
+    """
+    if method == "exact" and deadline is not None:
+        if exact_cost.estimate(n_rows) > deadline - time.monotonic():
+            return "fast"
+    return method
+
+def attributions(model, values, method="exact"):
+    """
+    Per-record contributions of every feature towards the fraud class.
+
+    Args:
+        model: The trained model, or a CompiledForest.
+        values: Feature matrix (array or DataFrame) in training column order.
+        method (str): "exact" for TreeSHAP, "fast" for Saabas contributions.
+
+    Returns:
+        tuple: (base value, contributions of shape (n_records, n_features));
+               with either method, the base value plus a record's
+               contributions is its predicted fraud probability.
+    """
+    _, explainer, forest = _entry(model)
+    if method == "fast":
+        with metrics.timer("predict_stage_seconds", stage="explain_fast"):
+            bias, contributions = forest.contributions(np.asarray(values))
+        return float(bias[-1]), contributions[:, :, 1]
+    if method != "exact":
+        raise ValueError(f"Unknown explain method: {method}")
+
+    start = time.perf_counter()
+    with metrics.timer("predict_stage_seconds", stage="explain"):
+        if len(values) <= EXACT_CHUNK_ROWS:
+            shap_values_class1 = explainer.shap_values(values)[:, :, 1]
+        else:
+            shap_values_class1 = np.concatenate([
+                explainer.shap_values(values[i:i + EXACT_CHUNK_ROWS])[:, :, 1]
+                for i in range(0, len(values), EXACT_CHUNK_ROWS)
+            ])
+    exact_cost.observe(time.perf_counter() - start, len(shap_values_class1))
+    return float(np.atleast_1d(explainer.expected_value)[-1]), shap_values_class1
+
+def set_object_store(store):
+    """
+    Replace the store that receives rendered plots (e.g. a local stub).
+    """
+    global object_store
+    object_store = store
+
+def _png_bytes():
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format="png")
+    plt.close()
+    return buffer.getvalue()
+
+def render_summary_plots(shap_values_class1, features, renderer=None):
+    """
+    Draw the bar and standard SHAP summary plots as in-memory PNGs.
+
+    Args:
+        shap_values_class1: SHAP values towards the fraud class.
+        features (pd.DataFrame): Features the values were computed for.
+        renderer (str): "agg" or "shap"; defaults to PLOT_RENDERER.
+
+    Returns:
+        dict: PNG bytes of the "bar_plot" and the "summary_plot".
+    """
+    if (renderer or PLOT_RENDERER) == "agg":
+        return plot_renderer.render(shap_values_class1, features)
+
+    with _pyplot_lock:
+        # Generate the bar summary plot
+        shap.summary_plot(shap_values_class1, features, plot_type="bar", show=False)
+        bar_plot = _png_bytes()
+
+        # Generate the standard summary plot
+        shap.summary_plot(shap_values_class1, features, show=False)
+        summary_plot = _png_bytes()
+    return {"bar_plot": bar_plot, "summary_plot": summary_plot}
+
+def render_shap_plots(model, features, method="exact"):
+    """
+    Compute SHAP values and render the summary plots, without uploading them.
+
+    Args:
+        model: The trained machine learning model (compatible with SHAP).
+        features: The engineered features (Pandas DataFrame) with columns
+                  in training order.
+        method (str): "exact" or "fast" attributions (see attributions()).
+
+    Returns:
+        dict: PNG bytes of the "bar_plot" and the "summary_plot".
+    """
+    # Compute SHAP values with the explainer built when the model was loaded
+    features.columns = FEATURE_NAMES
+    _, shap_values_class1 = attributions(model, features, method)
+
+    # Plots stay in memory, nothing is written to local disk
+    with metrics.timer("predict_stage_seconds", stage="render"):
+        return render_summary_plots(shap_values_class1, features)
+
+def upload_plots(plots):
+    """
+    Upload rendered plots concurrently, with unique keys.
+
+    Returns:
+        dict: Pre-signed URLs of the "bar_plot" and the "summary_plot".
+    """
+    unique_id = str(uuid.uuid4())
+    with metrics.timer("predict_stage_seconds", stage="upload"):
+        return object_store.upload_many({
+            "bar_plot": (f"shap_summary_bar_{unique_id}.png", plots["bar_plot"]),
+            "summary_plot": (f"shap_summary_{unique_id}.png", plots["summary_plot"]),
+        })
+
+def generate_shap_explanations(model, features, save_plots=True, method="exact"):
     """
     Generate SHAP explanations for given features using the provided model.
 
@@ -45,56 +269,86 @@ def generate_shap_explanations(model, features, save_plots=True):
         model: The trained machine learning model (compatible with SHAP).
         features: The preprocessed features for which
                   explanations are generated (Pandas DataFrame).
-        save_plots: Whether to save SHAP summary plots as static files.
+        save_plots: Whether to render and upload the SHAP summary plots.
+        method (str): "exact" or "fast" attributions (see attributions()).
+
+    Returns:
+        dict: Pre-signed URLs of the "bar_plot" and the "summary_plot"
+              (empty when save_plots is False).
+    """
+    try:
+        if not save_plots:
+            return {}
+        return upload_plots(render_shap_plots(model, features, method))
+
+    except Exception as e:
+        raise ValueError(f"Error generating SHAP explanations: {e}")
+
+def generate_shap_json(model, features, top_k=3, method="exact", deadline=None):
+    """
+    Compute per-record SHAP contributions without rendering any plots.
+
+    Args:
+        model: The trained machine learning model (compatible with SHAP).
+        features: The engineered features (Pandas DataFrame or 2D array)
+                  with columns in training order.
+        top_k: Number of most influential features to report per record.
+        method (str): "exact" or "fast" attributions (see attributions()).
+        deadline (float): time.monotonic() by which an exact explanation
+                          must be done, else the fast one is returned.
+
+    Returns:
+        list[dict]: One entry per record with the base value, the SHAP
+                    contribution of every feature towards the fraud class,
+                    the top-k features ranked by absolute contribution and
+                    the method that computed them.
+    """
+    try:
+        values = features.values if hasattr(features, "values") else features
+        method = choose_method(method, len(values), deadline)
+
+        # One batched call for the whole request
+        base_value, shap_values_class1 = attributions(model, values, method)
+
+        explanations = []
+        for row in shap_values_class1:
+            ranked = np.argsort(-np.abs(row), kind="stable")[:top_k]
+            explanations.append({
+                "base_value": base_value,
+                "contributions": dict(zip(FEATURE_NAMES, row.tolist())),
+                "top_features": [
+                    {"feature": FEATURE_NAMES[i], "shap_value": float(row[i])}
+                    for i in ranked
+                ],
+                "method": method,
+            })
+        return explanations
+
+    except Exception as e:
+        raise ValueError(f"Error generating SHAP explanations: {e}")
+
+def generate_plot_data(model, features, method="exact", deadline=None):
+    """
+    Compute SHAP values and return them as data for client-side plots.
+
+    Args:
+        model: The trained machine learning model (compatible with SHAP).
+        features: The engineered features (Pandas DataFrame or 2D array)
+                  with columns in training order.
+        method (str): "exact" or "fast" attributions (see attributions()).
+        deadline (float): time.monotonic() by which an exact explanation
+                          must be done, else the fast one is returned.
 
     Returns:
-        shap_values: The computed SHAP values.
-        plot_paths: A dictionary containing file paths to saved SHAP plots.
+        dict: Bar and beeswarm data as drawn by templates/plots.html, and
+              the method that computed them.
     """
     try:
-        os.makedirs("static", exist_ok=True)
-
-        # Create SHAP explainer
-        explainer = shap.TreeExplainer(model)
-
-        # Compute SHAP values
-        features.columns = ['Amount', 'TransactionAmount', 'AnomalyScore', 'Category',
-                            'CustomerAge', 'AccountBalance', 'SuspiciousFlag', 'gap',
-                            'Hour', 'Day', 'Month', 'Weekday', 'Year']
-        shap_values = explainer.shap_values(features)
-
-        # Extract SHAP values
-        shap_values_class1 = shap_values[:, :, 1]
-
-        # Generate unique filenames for plots
-        unique_id = str(uuid.uuid4())
-        plot_paths = {
-            "bar_plot": os.path.join("static", f"shap_summary_bar_{unique_id}.png"),
-            "summary_plot": os.path.join("static", f"shap_summary_{unique_id}.png"),
-        }
-
-        if save_plots:
-            # Generate the bar summary plot
-            shap.summary_plot(shap_values_class1, features, plot_type="bar", show=False)
-            plt.savefig(plot_paths["bar_plot"])
-            plt.close()
-
-            # Generate the standard summary plot
-            shap.summary_plot(shap_values_class1, features, show=False)
-            plt.savefig(plot_paths["summary_plot"])
-            plt.close()
-
-        # Upload plots to S3 with unique keys
-        plot_urls = {
-            "bar_plot": upload_to_s3(plot_paths["bar_plot"], f"shap_summary_bar_{unique_id}.png"),
-            "summary_plot": upload_to_s3(plot_paths["summary_plot"], f"shap_summary_{unique_id}.png")
-        }
-
-        # Clean up local plot files
-        os.remove(plot_paths["bar_plot"])
-        os.remove(plot_paths["summary_plot"])
-
-        return plot_urls
+        values = features.values if hasattr(features, "values") else features
+        method = choose_method(method, len(values), deadline)
+
+        _, shap_values_class1 = attributions(model, values, method)
+        return {**plot_renderer.plot_data(shap_values_class1, values), "method": method}
 
     except Exception as e:
         raise ValueError(f"Error generating SHAP explanations: {e}")
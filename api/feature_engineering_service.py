@@ -1,28 +1,29 @@
-def perform_feature_engineering(df):
+from api.preprocessing_service import feature_pipeline
+from api.time_features import add_time_features
+
+def perform_feature_engineering(df, pipeline=None):
     """
     Perform feature engineering on the preprocessed DataFrame.
 
     Args:
         df (pd.DataFrame): Preprocessed DataFrame.
+        pipeline (FeaturePipeline): Fitted preprocessing state that fixes the
+                                    column order; defaults to the saved one.
 
     Returns:
         pd.DataFrame: DataFrame with engineered features.
     """
+    pipeline = pipeline or feature_pipeline
     try:
-        # Calculate gap in days between Timestamp and LastLogin
-        df["gap"] = (df["Timestamp"] - df["LastLogin"]).dt.days.abs()
-
-        # Extract useful time-based features
-        df["Hour"] = df["Timestamp"].dt.hour
-        df["Day"] = df["Timestamp"].dt.day
-        df["Month"] = df["Timestamp"].dt.month
-        df["Weekday"] = df["Timestamp"].dt.weekday
-        df["Year"] = df["Timestamp"].dt.year
+        # Gap in days between Timestamp and LastLogin, and the calendar
+        # fields of Timestamp
+        add_time_features(df)
 
         # Drop original datetime columns
         df.drop(columns=["Timestamp", "LastLogin"], inplace=True)
 
-        return df
+        # Order the columns as the model saw them during training
+        return df[pipeline.columns]
 
     except Exception as e:
         raise ValueError(f"Error during feature engineering: {e}")
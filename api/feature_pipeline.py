@@ -0,0 +1,87 @@
+import json
+import numpy as np
+import pandas as pd
+
+# Artifact written next to models/ml_model.pkl by the training script
+DEFAULT_PIPELINE_PATH = "models/feature_pipeline.json"
+
+
+class InvalidInputError(ValueError):
+    """
+    Raised when request data cannot be encoded like the training data, a
+    client error rather than a failure of the service.
+    """
+
+
+class FeaturePipeline:
+    """
+    Preprocessing state fitted at training time and reused when serving.
+
+    Holds the Category vocabulary (in LabelEncoder order), the column order
+    of the feature matrix the model was trained on and the dtypes of the
+    input columns, so that every request is encoded exactly like the
+    training data without refitting anything.
+    """
+
+    def __init__(self, categories, columns, input_dtypes):
+        """
+        Args:
+            categories (list[str]): Category values; the position is the code.
+            columns (list[str]): Feature columns in training order.
+            input_dtypes (dict): dtype name for each model input column.
+        """
+        self.categories = list(categories)
+        self.columns = list(columns)
+        self.input_dtypes = dict(input_dtypes)
+        # Lookup table from category value to code, used for whole batches
+        self._category_index = pd.Index(self.categories)
+
+    @classmethod
+    def from_training_data(cls, X, label_encoder, engineered_columns):
+        """
+        Capture the pipeline from the training feature matrix.
+
+        Args:
+            X (pd.DataFrame): Training features with Category already encoded.
+            label_encoder (LabelEncoder): Encoder fitted on Category.
+            engineered_columns (list[str]): Columns derived from timestamps,
+                                            which are not request inputs.
+        """
+        input_dtypes = {
+            col: str(dtype) for col, dtype in X.dtypes.items()
+            if col not in engineered_columns
+        }
+        return cls(label_encoder.classes_.tolist(), X.columns.tolist(), input_dtypes)
+
+    def encode_categories(self, values):
+        """
+        Encode Category values with the training vocabulary.
+
+        Args:
+            values (array-like): Raw Category values.
+
+        Returns:
+            np.ndarray: Integer codes.
+
+        Raises:
+            InvalidInputError: If a value was not seen during training.
+        """
+        codes = self._category_index.get_indexer(values)
+        if (codes < 0).any():
+            unknown = sorted(set(np.asarray(values, dtype=object)[codes < 0].tolist()), key=str)
+            raise InvalidInputError(f"Unknown Category values: {unknown}")
+        return codes.astype(np.int64)
+
+    def save(self, path=DEFAULT_PIPELINE_PATH):
+        with open(path, "w") as pipeline_file:
+            json.dump({
+                "categories": self.categories,
+                "columns": self.columns,
+                "input_dtypes": self.input_dtypes,
+            }, pipeline_file, indent=2)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PIPELINE_PATH):
+        with open(path) as pipeline_file:
+            state = json.load(pipeline_file)
+        return cls(state["categories"], state["columns"], state["input_dtypes"])
@@ -0,0 +1,355 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+
+# Marks an unused slot of the ID index; never a valid entity ID
+EMPTY_KEY = np.iinfo(np.int64).min
+
+# Multiplier of the Fibonacci hash spreading IDs over the index slots
+_GOLDEN = 0x9E3779B97F4A7C15
+_UINT64_MASK = (1 << 64) - 1
+
+# Lookups of up to this many IDs probe in Python rather than with numpy,
+# whose per-call overhead dominates for single requests
+SCALAR_LOOKUP_MAX = 8
+
+# Request fields the store fills in, and the entity column holding each
+ENRICHED_FIELDS = {
+    "CustomerAge": ("customer", "CustomerAge"),
+    "AccountBalance": ("customer", "AccountBalance"),
+    "LastLogin": ("customer", "LastLogin"),
+    "SuspiciousFlag": ("customer", "SuspiciousFlag"),
+}
+
+# Request field holding the ID of each entity
+ENTITY_KEYS = {"customer": "CustomerID"}
+
+
+def _slots(ids, bits):
+    hashed = ids.astype(np.int64).view(np.uint64) * np.uint64(_GOLDEN)
+    return (hashed >> np.uint64(64 - bits)).astype(np.int64)
+
+
+def build_index(ids):
+    """
+    Open-addressing hash index from entity ID to row number.
+
+    The table has a power-of-two number of slots, at least twice the
+    number of IDs, and resolves collisions by linear probing. It is built
+    with vectorized insertion rounds rather than one ID at a time.
+
+    Args:
+        ids (np.ndarray): Unique int64 IDs, in row order.
+
+    Returns:
+        tuple: (keys, rows, bits) where slot i holds ID keys[i] at row
+               rows[i], and the table has 2 ** bits slots.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(np.unique(ids)) != len(ids):
+        raise ValueError("Entity IDs must be unique")
+    if (ids == EMPTY_KEY).any():
+        raise ValueError(f"Entity ID {EMPTY_KEY} is reserved")
+    bits = max(4, int(np.ceil(np.log2(2 * len(ids) + 1))))
+    mask = (1 << bits) - 1
+    keys = np.full(1 << bits, EMPTY_KEY, dtype=np.int64)
+    rows = np.full(1 << bits, -1, dtype=np.int32)
+
+    slots = _slots(ids, bits)
+    pending = np.arange(len(ids))
+    while pending.size:
+        candidate_slots = slots[pending]
+        free = keys[candidate_slots] == EMPTY_KEY
+        # Of the IDs landing on the same free slot, the first one takes it
+        taken, first = np.unique(candidate_slots[free], return_index=True)
+        winners = pending[free][first]
+        keys[taken] = ids[winners]
+        rows[taken] = winners
+        placed = np.zeros(len(ids), dtype=bool)
+        placed[winners] = True
+        pending = pending[~placed[pending]]
+        slots[pending] = (slots[pending] + 1) & mask
+    return keys, rows, bits
+
+
+def lookup_rows(keys, rows, bits, ids):
+    """
+    Row numbers of IDs in an index from build_index(), -1 when unknown.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    mask = (1 << bits) - 1
+    slots = _slots(ids, bits)
+    result = np.full(len(ids), -1, dtype=np.int32)
+    active = np.arange(len(ids))
+    # Probe all IDs at once, following only the ones not resolved yet
+    while active.size:
+        active_slots = slots[active]
+        found = keys[active_slots]
+        hit = found == ids[active]
+        result[active[hit]] = rows[active_slots[hit]]
+        probing = ~hit & (found != EMPTY_KEY)
+        active = active[probing]
+        slots[active] = (active_slots[probing] + 1) & mask
+    return result
+
+
+def lookup_row(keys, rows, bits, entity_id):
+    """
+    Row number of one ID in an index from build_index(), -1 when unknown.
+    """
+    mask = (1 << bits) - 1
+    slot = ((entity_id & _UINT64_MASK) * _GOLDEN & _UINT64_MASK) >> (64 - bits)
+    while True:
+        key = int(keys[slot])
+        if key == entity_id:
+            return int(rows[slot])
+        if key == EMPTY_KEY:
+            return -1
+        slot = (slot + 1) & mask
+
+
+class EntityTable:
+    """
+    Read-only attribute columns of one entity type, indexed by ID.
+    """
+
+    def __init__(self, keys, rows, bits, columns, dictionaries):
+        self.keys = keys
+        self.rows = rows
+        self.bits = bits
+        self.columns = columns
+        self.dictionaries = {
+            name: np.asarray(values + [None], dtype=object)
+            for name, values in dictionaries.items()
+        }
+
+    def lookup(self, ids):
+        """
+        Row numbers of the IDs, -1 for unknown ones.
+        """
+        if len(ids) <= SCALAR_LOOKUP_MAX:
+            return np.array(
+                [lookup_row(self.keys, self.rows, self.bits, int(i)) for i in ids],
+                dtype=np.int32,
+            )
+        return lookup_rows(self.keys, self.rows, self.bits, ids)
+
+    def values(self, column, rows):
+        """
+        Values of a column at the given rows (text columns decoded).
+        """
+        values = self.columns[column][rows]
+        if column in self.dictionaries:
+            return self.dictionaries[column][values]
+        return values
+
+
+class FeatureStore:
+    """
+    Customer attributes, memory-mapped from snapshots.
+
+    A store root holds immutable snapshot directories and a CURRENT file
+    naming the active one. Every column and the ID index are .npy files
+    mapped read-only, so all gunicorn workers share a single copy of the
+    pages. Publishing a snapshot replaces CURRENT atomically; readers pick
+    it up on their next check and swap their whole snapshot at once, so a
+    request never mixes two versions.
+    """
+
+    def __init__(self, root, check_interval=10.0):
+        """
+        Args:
+            root (str): Directory written by FeatureStore.publish().
+            check_interval (float): Seconds between checks for a new snapshot.
+        """
+        self.root = root
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self.version = None
+        self.tables = {}
+        self.reload()
+
+    @staticmethod
+    def publish(root, name, entities):
+        """
+        Write a snapshot and make it the current one.
+
+        Args:
+            root (str): Store root directory.
+            name (str): Snapshot name, unique within the root.
+            entities (dict): Entity name -> (ids, {column: array}). Text
+                             columns are given as arrays of strings.
+
+        Returns:
+            str: Directory of the snapshot.
+        """
+        snapshot_dir = os.path.join(root, "snapshots", name)
+        if os.path.exists(snapshot_dir):
+            raise ValueError(f"Snapshot already exists: {name}")
+        manifest = {"entities": {}}
+        for entity, (ids, columns) in entities.items():
+            entity_dir = os.path.join(snapshot_dir, entity)
+            os.makedirs(entity_dir)
+            keys, rows, bits = build_index(ids)
+            np.save(os.path.join(entity_dir, "index_keys.npy"), keys)
+            np.save(os.path.join(entity_dir, "index_rows.npy"), rows)
+            dictionaries = {}
+            for column, values in columns.items():
+                values = np.asarray(values)
+                if values.dtype.kind in "OU":
+                    # Text is stored as int32 codes into a dictionary
+                    uniques, codes = np.unique(values.astype(str), return_inverse=True)
+                    dictionaries[column] = uniques.tolist()
+                    values = codes.astype(np.int32)
+                np.save(os.path.join(entity_dir, f"{column}.npy"), values)
+            manifest["entities"][entity] = {
+                "rows": len(ids),
+                "bits": bits,
+                "columns": list(columns),
+                "dictionaries": dictionaries,
+            }
+        with open(os.path.join(snapshot_dir, "manifest.json"), "w") as manifest_file:
+            json.dump(manifest, manifest_file)
+
+        current = os.path.join(root, "CURRENT")
+        with open(f"{current}.tmp", "w") as current_file:
+            current_file.write(name)
+        os.replace(f"{current}.tmp", current)
+        return snapshot_dir
+
+    def current_version(self):
+        with open(os.path.join(self.root, "CURRENT")) as current_file:
+            return current_file.read().strip()
+
+    def reload(self):
+        """
+        Map the current snapshot if it is not the one already loaded.
+
+        Returns:
+            bool: Whether a new snapshot was loaded.
+        """
+        version = self.current_version()
+        if version == self.version:
+            return False
+        snapshot_dir = os.path.join(self.root, "snapshots", version)
+        with open(os.path.join(snapshot_dir, "manifest.json")) as manifest_file:
+            manifest = json.load(manifest_file)
+        tables = {}
+        for entity, spec in manifest["entities"].items():
+            entity_dir = os.path.join(snapshot_dir, entity)
+
+            def load(name):
+                # Plain ndarray views of the mapping: indexing an np.memmap
+                # costs several times more per call
+                return np.asarray(
+                    np.load(os.path.join(entity_dir, f"{name}.npy"), mmap_mode="r")
+                )
+
+            tables[entity] = EntityTable(
+                load("index_keys"), load("index_rows"), spec["bits"],
+                {column: load(column) for column in spec["columns"]},
+                spec["dictionaries"],
+            )
+        # One assignment, so concurrent requests see either snapshot whole
+        self.tables, self.version = tables, version
+        return True
+
+    def maybe_reload(self):
+        """
+        Reload if check_interval has passed and a new snapshot is published.
+        """
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        with self._lock:
+            if now - self._last_check < self.check_interval:
+                return False
+            self._last_check = now
+            return self.reload()
+
+    def lookup(self, entity, ids, columns):
+        """
+        Attributes of entities by ID.
+
+        Args:
+            entity (str): An entity of the snapshot, e.g. "customer".
+            ids: Entity IDs.
+            columns (list): Attribute columns to return.
+
+        Returns:
+            tuple: (found mask, {column: values}); values of unknown IDs
+                   are unspecified.
+        """
+        table = self.tables[entity]
+        rows = table.lookup(ids)
+        found = rows >= 0
+        safe_rows = np.where(found, rows, 0)
+        return found, {column: table.values(column, safe_rows) for column in columns}
+
+    def enrich(self, records):
+        """
+        Fill in the ENRICHED_FIELDS a record does not carry, by its IDs.
+
+        Values sent by the caller are kept. Records whose ID is unknown or
+        not numeric are left as they are.
+
+        Args:
+            records (dict or list): A /predict record or a list of them.
+
+        Returns:
+            The records, with the missing fields added (copies of the
+            records that changed; the input is not modified).
+        """
+        self.maybe_reload()
+        single = isinstance(records, dict)
+        records = [records] if single else list(records)
+
+        by_entity = {}
+        for field, (entity, column) in ENRICHED_FIELDS.items():
+            by_entity.setdefault(entity, []).append((field, column))
+
+        for entity, fields in by_entity.items():
+            if entity not in self.tables:
+                continue
+            positions, ids = [], []
+            for i, record in enumerate(records):
+                if not isinstance(record, dict) or all(field in record for field, _ in fields):
+                    continue
+                try:
+                    ids.append(int(record[ENTITY_KEYS[entity]]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                positions.append(i)
+            if not positions:
+                continue
+            found, values = self.lookup(entity, ids, [column for _, column in fields])
+            for j, i in enumerate(positions):
+                if not found[j]:
+                    continue
+                record = records[i] = dict(records[i])
+                for field, column in fields:
+                    if field not in record:
+                        record[field] = _to_json(values[column][j])
+        return records[0] if single else records
+
+
+def _to_json(value):
+    # Request records carry dates as strings and numbers as Python scalars
+    if isinstance(value, np.datetime64):
+        return str(np.datetime_as_string(value, unit="D"))
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def open_feature_store(root=None):
+    """
+    Open the store at FEATURE_STORE_DIR, or None when enrichment is off.
+    """
+    root = root or os.getenv("FEATURE_STORE_DIR")
+    if not root:
+        return None
+    return FeatureStore(root, check_interval=float(os.getenv("FEATURE_STORE_CHECK_SECONDS", "10")))
@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import atexit
+import bisect
+import threading
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Upper bounds of the batch size histogram buckets, in records
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+# Snapshot holding the merged counters of workers that have exited
+RETIRED_SNAPSHOT = "retired.json"
+
+HISTOGRAMS = {
+    "predict_stage_seconds": ("Latency of each /predict pipeline stage.", LATENCY_BUCKETS),
+    "request_seconds": ("Latency of each HTTP endpoint.", LATENCY_BUCKETS),
+    "queue_wait_seconds": ("Time spent waiting in an internal queue.", LATENCY_BUCKETS),
+    "predict_batch_rows": ("Records scored per model call.", BATCH_BUCKETS),
+}
+
+COUNTERS = {
+    "explanation_cache_events_total": "Explanation cache hits, misses and evictions.",
+}
+
+
+class _Timer:
+    # A plain class rather than @contextmanager: it costs a third as much
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Per-worker latency and size histograms and event counters, exported
+    in Prometheus format.
+
+    Observations only touch in-memory counters. Every flush_interval
+    seconds a background thread of each worker writes a snapshot of its
+    counters to metrics_dir, and /metrics merges the snapshots of all
+    workers on the host, so the numbers cover every gunicorn worker
+    whichever one answers the scrape.
+
+    As in prometheus_client's multiprocess mode, the directory is wiped
+    when the server starts (reset()) and an exiting worker's snapshot is
+    folded into a shared retired snapshot (retire()), so counters neither
+    leak from earlier runs nor drop when a worker is recycled. Snapshot
+    files are named by PID and a per-process token, so a new worker that
+    reuses a PID never overwrites the file of the old one.
+    """
+
+    def __init__(self, metrics_dir=None, flush_interval=5.0):
+        """
+        Args:
+            metrics_dir (str): Directory shared by the workers for their
+                               snapshots; aggregation is off when None.
+            flush_interval (float): Seconds between snapshot writes.
+        """
+        self.metrics_dir = metrics_dir
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # name -> {labels tuple: [bucket counts..., sum, count]}, and
+        # [count] for counters
+        self._series = {name: {} for name in (*HISTOGRAMS, *COUNTERS)}
+        self._pid = None
+        self._path = None
+        if metrics_dir:
+            os.makedirs(metrics_dir, exist_ok=True)
+            atexit.register(self.close)
+
+    def observe(self, name, value, **labels):
+        """
+        Record one observation in the histogram called name.
+        """
+        if self.metrics_dir and self._pid != os.getpid():
+            self._start_flusher()
+        buckets = HISTOGRAMS[name][1]
+        key = tuple(sorted(labels.items())) if len(labels) > 1 else tuple(labels.items())
+        index = bisect.bisect_left(buckets, value)
+        with self._lock:
+            series = self._series[name].get(key)
+            if series is None:
+                series = self._series[name][key] = [0] * (len(buckets) + 3)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def _start_flusher(self):
+        # Started in the worker itself: threads created before gunicorn
+        # forks its workers (--preload) do not survive the fork, and the
+        # counts inherited from the master are not the worker's own
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self._series = {name: {} for name in self._series}
+            self._pid = os.getpid()
+            self._path = os.path.join(self.metrics_dir,
+                                      f"{self._pid}-{uuid.uuid4().hex[:8]}.json")
+        threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                # e.g. the directory was removed; try again next time
+                pass
+
+    def increment(self, name, amount=1, **labels):
+        """
+        Add to the counter called name.
+        """
+        if self.metrics_dir and self._pid != os.getpid():
+            self._start_flusher()
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series[name].get(key)
+            if series is None:
+                series = self._series[name][key] = [0]
+            series[0] += amount
+
+    def timer(self, name, **labels):
+        """
+        Observe the wall-clock duration of the with-block, in seconds.
+        """
+        return _Timer(self, name, labels)
+
+    def snapshot(self):
+        """
+        Copy of this worker's counters, in a JSON-serializable form.
+        """
+        with self._lock:
+            return {
+                name: [[dict(key), list(values)] for key, values in series.items()]
+                for name, series in self._series.items()
+            }
+
+    def flush(self):
+        """
+        Write this worker's snapshot where the other workers can read it.
+        """
+        if not self.metrics_dir or self._pid != os.getpid():
+            return
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w") as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        os.replace(tmp_path, self._path)
+
+    def close(self):
+        """
+        Fold this worker's counters into the retired snapshot (at exit).
+        """
+        if self.metrics_dir and self._pid == os.getpid() and os.path.isdir(self.metrics_dir):
+            self.flush()
+            self.retire(self.metrics_dir, os.getpid())
+            self._pid = None
+
+    @staticmethod
+    def retire(metrics_dir, pid):
+        """
+        Merge the snapshots of an exited process into the retired snapshot
+        and remove them. The gunicorn master calls this for every worker it
+        reaps, which also covers workers that were killed.
+        """
+        prefix = f"{pid}-"
+        with open(os.path.join(metrics_dir, "retired.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            paths = [os.path.join(metrics_dir, name) for name in os.listdir(metrics_dir)
+                     if name.startswith(prefix) and name.endswith(".json")]
+            if not paths:
+                return
+            retired_path = os.path.join(metrics_dir, RETIRED_SNAPSHOT)
+            merged = _merge_snapshots([retired_path] + paths)
+            tmp_path = f"{retired_path}.tmp"
+            with open(tmp_path, "w") as snapshot_file:
+                json.dump(merged, snapshot_file)
+            os.replace(tmp_path, retired_path)
+            for path in paths:
+                os.remove(path)
+
+    @staticmethod
+    def reset(metrics_dir):
+        """
+        Remove every snapshot, when the server (re)starts.
+        """
+        if not metrics_dir or not os.path.isdir(metrics_dir):
+            return
+        for name in os.listdir(metrics_dir):
+            if name.endswith((".json", ".tmp")):
+                try:
+                    os.remove(os.path.join(metrics_dir, name))
+                except FileNotFoundError:
+                    pass
+
+    def collect(self):
+        """
+        Merge the latest snapshots of all workers on the host.
+        """
+        if not self.metrics_dir:
+            return self.snapshot()
+        if self._pid != os.getpid():
+            self._start_flusher()
+        self.flush()
+        return _merge_snapshots([
+            os.path.join(self.metrics_dir, name) for name in os.listdir(self.metrics_dir)
+            if name.endswith(".json")
+        ])
+
+    def render_prometheus(self):
+        """
+        All histograms and counters, merged across workers, in Prometheus
+        text format.
+        """
+        lines = []
+        for name, series in self.collect().items():
+            series = sorted(series, key=lambda item: sorted(item[0].items()))
+            if name in COUNTERS:
+                lines.append(f"# HELP {name} {COUNTERS[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, values in series:
+                    label_text = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+                    suffix = f"{{{label_text}}}" if label_text else ""
+                    lines.append(f"{name}{suffix} {values[0]}")
+                continue
+            help_text, buckets = HISTOGRAMS[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, values in series:
+                label_text = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+                prefix = f"{label_text}," if label_text else ""
+                cumulative = 0
+                for bound, count in zip(buckets, values):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {values[-1]}')
+                suffix = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{name}_sum{suffix} {values[-2]}")
+                lines.append(f"{name}_count{suffix} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _merge_snapshots(paths):
+    """
+    Sum the series of snapshot files, skipping missing or partial ones.
+    """
+    merged = {name: {} for name in (*HISTOGRAMS, *COUNTERS)}
+    for path in paths:
+        try:
+            with open(path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (FileNotFoundError, ValueError):
+            continue
+        for name, series in snapshot.items():
+            if name not in merged:
+                continue
+            for labels, values in series:
+                key = tuple(sorted(labels.items()))
+                total = merged[name].setdefault(key, [0] * len(values))
+                for i, value in enumerate(values):
+                    total[i] += value
+    return {
+        name: [[dict(key), values] for key, values in series.items()]
+        for name, series in merged.items()
+    }
+
+
+# Registry shared by the services of this worker. Snapshots go to
+# METRICS_DIR, which gunicorn.conf.py and the Dockerfile set; when it is
+# unset (scripts, tests) only this process's numbers are kept
+metrics = MetricsRegistry(metrics_dir=os.getenv("METRICS_DIR"))
@@ -0,0 +1,318 @@
+import os
+import time
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+from api.scoring_service import (
+    FAST_PATH_MAX_ROWS,
+    large_batch_model,
+    load_model,
+    load_model_version,
+)
+from api.columnar_service import REQUIRED_COLUMNS, compile_features
+from api.preprocessing_service import preprocess_data
+from api.feature_engineering_service import perform_feature_engineering
+from api.feature_pipeline import FeaturePipeline
+from api.forest_engine import CompiledForest
+from api.explanation_service import get_explainer, unregister_explainer
+
+# Files of a model version, as written by models/train.py
+MODEL_FILE = "ml_model.pkl"
+PIPELINE_FILE = "feature_pipeline.json"
+
+# Transactions a new model version scores and explains before serving
+WARM_UP_DATASET = os.getenv("WARM_UP_DATASET", "complete_dataset.csv")
+WARM_UP_ROWS = int(os.getenv("WARM_UP_ROWS", "300"))
+
+
+class ModelBundle:
+    """
+    Everything a request needs from one model version, swapped as a unit.
+    """
+
+    def __init__(self, model, compiled_forest, pipeline, version, batch_model=None):
+        """
+        Args:
+            model: The loaded model, used for SHAP.
+            compiled_forest (CompiledForest): Array-backed copy of the model.
+            pipeline (FeaturePipeline): Preprocessing state fitted with the
+                                        model; None for the default artifact.
+            version (str): Identifier of the model artifact.
+            batch_model: Scores large batches; the model itself when None.
+        """
+        self.model = model
+        self.batch_model = batch_model if batch_model is not None else model
+        self.compiled_forest = compiled_forest
+        self.pipeline = pipeline
+        self.version = version
+        self.load_seconds = None
+        self.warm_up_seconds = None
+
+
+def load_warm_up_records(path=WARM_UP_DATASET, n=WARM_UP_ROWS):
+    """
+    Read the first transactions of a dataset as /predict request records.
+
+    Returns:
+        list[dict]: Request records, empty when the dataset is missing.
+    """
+    if not path or not os.path.exists(path):
+        return []
+    df = pd.read_csv(path, nrows=n)[REQUIRED_COLUMNS]
+    for col in ("TransactionID", "MerchantID", "CustomerID"):
+        df[col] = df[col].astype(str)
+    return df.to_dict(orient="records")
+
+
+def warm_up(bundle, records):
+    """
+    Run every scoring and explanation path of a bundle once.
+
+    The first calls of a freshly loaded model pay for lazy imports, numpy
+    and sklearn dispatch setup and the explainer's buffers; doing them here
+    keeps that cost off the first requests. The calls go around
+    scoring_service so the warm-up does not show in the request metrics.
+
+    Args:
+        bundle (ModelBundle): The bundle to warm.
+        records (list[dict]): Sample request records.
+    """
+    if not records:
+        return
+    # The columnar fast path, for single records and small batches
+    for batch in (records[:1], records[:FAST_PATH_MAX_ROWS]):
+        features = compile_features(batch, bundle.pipeline)
+        bundle.compiled_forest.predict(features)
+    # The pandas path and the sklearn forest, for larger batches
+    features = perform_feature_engineering(preprocess_data(records, bundle.pipeline),
+                                           bundle.pipeline)
+    bundle.model.predict(features.values)
+    # Both explanation methods. A couple of rows is enough for TreeSHAP,
+    # whose calls hold the GIL of a worker that is serving meanwhile
+    sample = features.values[:FAST_PATH_MAX_ROWS].astype(np.float64)
+    get_explainer(bundle.model).shap_values(sample[:2])
+    bundle.compiled_forest.contributions(sample)
+
+
+def load_bundle(model_path, pipeline_path=None, version=None, arrays_dir=None,
+                warm_up_records=None):
+    """
+    Load a model version and warm it up.
+
+    Args:
+        model_path (str): Pickled sklearn model.
+        pipeline_path (str): Preprocessing state saved with the model; the
+                             default artifact is used when None.
+        version (str): Identifier of the model; when None, the version
+                       recorded with the arrays, or else the hash of
+                       model_path (of the arrays' manifest.json).
+        arrays_dir (str): Directory written by models/export_forest.py,
+                          loaded instead of the pickle when set.
+        warm_up_records (list[dict]): Sample request records; nothing is
+                                      warmed when None.
+
+    Returns:
+        ModelBundle: The loaded bundle, with its load and warm-up times.
+    """
+    start = time.perf_counter()
+    model = load_model(model_path, arrays_dir)
+    if arrays_dir:
+        # Arrays exported without a version are named after their manifest
+        version = (version or model.model_version
+                   or load_model_version(os.path.join(arrays_dir, "manifest.json")))
+        compiled_forest = model
+    else:
+        version = version or load_model_version(model_path)
+        compiled_forest = CompiledForest.from_sklearn(model, model_version=version)
+    pipeline = FeaturePipeline.load(pipeline_path) if pipeline_path else None
+    bundle = ModelBundle(model, compiled_forest, pipeline, version,
+                         batch_model=large_batch_model(model, model_path))
+    loaded = time.perf_counter()
+    warm_up(bundle, warm_up_records)
+    bundle.load_seconds = loaded - start
+    bundle.warm_up_seconds = time.perf_counter() - loaded
+    return bundle
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts with hot swapping.
+
+    A registry root holds one immutable directory per model version and a
+    CURRENT file naming the one to serve. Pointing CURRENT at another
+    version makes every worker load it in a background thread, warm it up
+    and swap it in with a single assignment, while requests keep being
+    served by the old version. A request takes the bundle once, so it never
+    mixes two versions.
+    """
+
+    def __init__(self, root, check_interval=10.0, warm_up_records=None):
+        """
+        Args:
+            root (str): Directory written by ModelRegistry.publish().
+            check_interval (float): Seconds between checks for a new version.
+            warm_up_records (list[dict]): Sample request records every new
+                                          version is warmed with.
+        """
+        self.root = root
+        self.check_interval = check_interval
+        self.warm_up_records = warm_up_records
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self._loader = None
+        self._retired = None
+        self._failed_version = None
+        self.last_error = None
+        # The first version is loaded in the foreground: there is nothing to serve yet
+        self.bundle = self._load(self.current_version())
+
+    @staticmethod
+    def publish(root, model_path, pipeline_path):
+        """
+        Copy a trained model into the registry and make it the current one.
+
+        Args:
+            root (str): Registry root directory.
+            model_path (str): Pickled sklearn model.
+            pipeline_path (str): Preprocessing state saved with the model.
+
+        Returns:
+            str: The version, named after the hash of the model.
+        """
+        version = load_model_version(model_path)
+        version_dir = os.path.join(root, "versions", version)
+        if not os.path.exists(version_dir):
+            # Copied next to the final name, then renamed, so a reader never
+            # sees a version without all of its files
+            staging_dir = f"{version_dir}.tmp{os.getpid()}"
+            os.makedirs(staging_dir)
+            shutil.copyfile(model_path, os.path.join(staging_dir, MODEL_FILE))
+            shutil.copyfile(pipeline_path, os.path.join(staging_dir, PIPELINE_FILE))
+            os.replace(staging_dir, version_dir)
+        ModelRegistry.activate(root, version)
+        return version
+
+    @staticmethod
+    def activate(root, version):
+        """
+        Make a published version the current one, e.g. to roll back.
+        """
+        if not os.path.isdir(os.path.join(root, "versions", version)):
+            raise ValueError(f"Unknown model version: {version}")
+        current = os.path.join(root, "CURRENT")
+        with open(f"{current}.tmp", "w") as current_file:
+            current_file.write(version)
+        os.replace(f"{current}.tmp", current)
+
+    def versions(self):
+        return sorted(
+            name for name in os.listdir(os.path.join(self.root, "versions"))
+            if ".tmp" not in name
+        )
+
+    def current_version(self):
+        with open(os.path.join(self.root, "CURRENT")) as current_file:
+            return current_file.read().strip()
+
+    def _load(self, version):
+        version_dir = os.path.join(self.root, "versions", version)
+        return load_bundle(
+            os.path.join(version_dir, MODEL_FILE),
+            os.path.join(version_dir, PIPELINE_FILE),
+            version=version,
+            warm_up_records=self.warm_up_records,
+        )
+
+    def reload(self):
+        """
+        Load, warm up and swap in the current version if it is not the one
+        already served. Runs in the calling thread.
+
+        Returns:
+            bool: Whether a new version was swapped in.
+        """
+        version = self.current_version()
+        if version == self.bundle.version:
+            return False
+        try:
+            bundle = self._load(version)
+        except Exception as e:
+            self._failed_version = version
+            self.last_error = f"Error loading model version {version}: {e}"
+            raise ValueError(self.last_error)
+        self.last_error = None
+        # One assignment, so concurrent requests see either version whole.
+        # The explainer of the version replaced by the previous swap goes
+        # now: requests that took it before that swap have long finished.
+        retired, self._retired, self.bundle = self._retired, self.bundle, bundle
+        if retired is not None and retired.model is not bundle.model:
+            unregister_explainer(retired.model)
+        return True
+
+    def reload_in_background(self):
+        """
+        Start reload() in a thread unless one is already running.
+
+        Returns:
+            bool: Whether a load was started.
+        """
+        with self._lock:
+            # Threads do not survive a fork, so a loader inherited from the
+            # gunicorn master is never alive in a worker
+            if self._loader is not None and self._loader.is_alive():
+                return False
+            self._loader = threading.Thread(target=self._reload_quietly, name="model-reload",
+                                            daemon=True)
+            self._loader.start()
+            return True
+
+    def _reload_quietly(self):
+        try:
+            self.reload()
+        except ValueError:
+            # Recorded in last_error; the old version keeps serving
+            pass
+
+    def maybe_reload(self):
+        """
+        Start a background reload if check_interval has passed and another
+        version is current.
+        """
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        with self._lock:
+            if now - self._last_check < self.check_interval:
+                return False
+            self._last_check = now
+        # A version that failed to load is only retried on an explicit reload
+        if self.current_version() in (self.bundle.version, self._failed_version):
+            return False
+        return self.reload_in_background()
+
+    def stats(self):
+        bundle = self.bundle
+        return {
+            "version": bundle.version,
+            "current_version": self.current_version(),
+            "loading": self._loader is not None and self._loader.is_alive(),
+            "load_seconds": bundle.load_seconds,
+            "warm_up_seconds": bundle.warm_up_seconds,
+            "last_error": self.last_error,
+        }
+
+
+def open_model_registry(root=None):
+    """
+    Open the registry at MODEL_REGISTRY_DIR, or None when models are not
+    versioned and the fixed MODEL_PATH is served.
+    """
+    root = root or os.getenv("MODEL_REGISTRY_DIR")
+    if not root:
+        return None
+    return ModelRegistry(
+        root,
+        check_interval=float(os.getenv("MODEL_REGISTRY_CHECK_SECONDS", "10")),
+        warm_up_records=load_warm_up_records(),
+    )
@@ -0,0 +1,224 @@
+import io
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from shap.plots import colors
+
+# Number of bins used to stack the beeswarm points, as in shap.summary_plot
+BEESWARM_BINS = 100
+
+# Points per feature sent to the client in plot-data mode
+MAX_CLIENT_POINTS = 500
+
+
+def feature_order(shap_values):
+    """
+    Feature indices by decreasing mean absolute SHAP value.
+    """
+    return np.argsort(-np.abs(shap_values).mean(axis=0), kind="stable")
+
+
+def beeswarm_offsets(shap_values, bins=BEESWARM_BINS):
+    """
+    Vertical offsets that stack the points of one feature in a beeswarm.
+
+    Points falling in the same SHAP value bin are spread alternately above
+    and below the feature's row, like shap.summary_plot, but computed with
+    array operations instead of a loop over points.
+
+    Args:
+        shap_values (np.ndarray): SHAP values of one feature, shape (n,).
+        bins (int): Number of bins over the range of the values.
+
+    Returns:
+        np.ndarray: Offsets in [-0.4, 0.4], shape (n,).
+    """
+    n = len(shap_values)
+    if n == 0:
+        return np.zeros(0)
+    span = shap_values.max() - shap_values.min()
+    quant = np.round(bins * (shap_values - shap_values.min()) / (span + 1e-8))
+    order = np.argsort(quant, kind="stable")
+    sorted_quant = quant[order]
+    # Rank of each point within its bin
+    starts = np.flatnonzero(np.r_[True, sorted_quant[1:] != sorted_quant[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    layer = np.arange(n) - np.repeat(starts, counts)
+    offsets = np.empty(n)
+    offsets[order] = np.ceil(layer / 2) * ((layer % 2) * 2 - 1)
+    return offsets * (0.4 / (np.abs(offsets).max() + 1))
+
+
+def color_values(feature_values):
+    """
+    Feature values scaled to [0, 1] between their 5th and 95th percentiles.
+    """
+    low, high = np.nanpercentile(feature_values, [5, 95])
+    if high <= low:
+        low, high = np.nanmin(feature_values), np.nanmax(feature_values)
+    if high <= low:
+        return np.full(len(feature_values), 0.5)
+    return np.clip((feature_values - low) / (high - low), 0, 1)
+
+
+class SummaryPlotRenderer:
+    """
+    Draws SHAP bar and beeswarm summary plots with matplotlib's Agg API.
+
+    Every call builds its own Figure and canvas, so nothing goes through
+    pyplot's global state and several threads can render at once.
+    """
+
+    def __init__(self, feature_names, dpi=100, row_height=0.4):
+        """
+        Args:
+            feature_names (list): Names of the SHAP matrix columns.
+            dpi (int): Resolution of the PNGs.
+            row_height (float): Height of one feature row, in inches.
+        """
+        self.feature_names = list(feature_names)
+        self.dpi = dpi
+        self.figsize = (8, len(self.feature_names) * row_height + 1.5)
+        self.cmap = colors.red_blue
+        # Subplot margins of each plot kind, measured once by warm_up; a
+        # tight layout costs as much as drawing the figure
+        self._margins = {}
+
+    def warm_up(self):
+        """
+        Render throwaway plots so fonts, glyph caches and the Agg renderer
+        are loaded, and the margins of both figures measured, before the
+        first request instead of during it.
+        """
+        rng = np.random.default_rng(0)
+        shape = (20, len(self.feature_names))
+        self._margins.clear()
+        self.render(rng.normal(size=shape), rng.random(shape))
+
+    def render(self, shap_values, features):
+        """
+        Render both summary plots.
+
+        Args:
+            shap_values (np.ndarray): SHAP values towards the fraud class,
+                                      shape (n_records, n_features).
+            features: Feature values of the same records (array or DataFrame).
+
+        Returns:
+            dict: PNG bytes of the "bar_plot" and the "summary_plot".
+        """
+        shap_values = np.asarray(shap_values, dtype=np.float64)
+        features = np.asarray(features, dtype=np.float64)
+        order = feature_order(shap_values)
+        return {
+            "bar_plot": self.render_bar(shap_values, order),
+            "summary_plot": self.render_beeswarm(shap_values, features, order),
+        }
+
+    def render_bar(self, shap_values, order=None):
+        """
+        Bar plot of the mean absolute SHAP value of each feature, as PNG bytes.
+        """
+        if order is None:
+            order = feature_order(shap_values)
+        importance = np.abs(shap_values).mean(axis=0)[order]
+        fig, ax = self._figure(order)
+        rows = np.arange(len(order))[::-1]
+        ax.barh(rows, importance, 0.7, align="center", color=colors.blue_rgb)
+        ax.set_xlabel("mean(|SHAP value|) (average impact on model output magnitude)")
+        return self._png(fig, "bar")
+
+    def render_beeswarm(self, shap_values, features, order=None):
+        """
+        Beeswarm plot of every SHAP value coloured by feature value, as PNG bytes.
+        """
+        if order is None:
+            order = feature_order(shap_values)
+        fig, ax = self._figure(order)
+        ax.axvline(x=0, color="#999999", zorder=-1)
+        # All features in one scatter collection: far fewer artists to draw
+        rows = np.arange(len(order))[::-1]
+        x = shap_values[:, order].T.ravel()
+        y = np.concatenate([row + beeswarm_offsets(shap_values[:, i])
+                            for row, i in zip(rows, order)])
+        c = np.concatenate([color_values(features[:, i]) for i in order])
+        points = ax.scatter(x, y, c=c, cmap=self.cmap, vmin=0, vmax=1, s=16,
+                            linewidth=0, rasterized=len(x) > 5000)
+        ax.set_xlabel("SHAP value (impact on model output)")
+        colorbar = fig.colorbar(points, ax=ax, ticks=[0, 1], aspect=50)
+        colorbar.set_ticklabels(["Low", "High"])
+        colorbar.set_label("Feature value", labelpad=0)
+        colorbar.outline.set_visible(False)
+        return self._png(fig, "beeswarm")
+
+    def plot_data(self, shap_values, features, max_points=MAX_CLIENT_POINTS, seed=0):
+        """
+        Plot-ready data for templates/plots.html to draw in the browser.
+
+        Args:
+            shap_values (np.ndarray): SHAP values towards the fraud class.
+            features: Feature values of the same records.
+            max_points (int): Records kept per feature for the beeswarm;
+                              larger batches are sampled.
+            seed (int): Seed of the sampling, so responses are reproducible.
+
+        Returns:
+            dict: "bar" rows of mean absolute SHAP values and "beeswarm"
+                  rows of (SHAP value, offset, colour value) points, both
+                  ordered by decreasing importance.
+        """
+        shap_values = np.asarray(shap_values, dtype=np.float64)
+        features = np.asarray(features, dtype=np.float64)
+        order = feature_order(shap_values)
+        importance = np.abs(shap_values).mean(axis=0)
+
+        rows = np.arange(len(shap_values))
+        if len(rows) > max_points:
+            rows = np.sort(np.random.default_rng(seed).choice(rows, max_points, replace=False))
+
+        beeswarm = []
+        for i in order:
+            values = shap_values[rows, i]
+            beeswarm.append({
+                "feature": self.feature_names[i],
+                "shap_values": np.round(values, 6).tolist(),
+                "offsets": np.round(beeswarm_offsets(values), 4).tolist(),
+                "colors": np.round(color_values(features[rows, i]), 4).tolist(),
+            })
+        return {
+            "n_records": len(shap_values),
+            "bar": [
+                {"feature": self.feature_names[i], "mean_abs_shap": float(importance[i])}
+                for i in order
+            ],
+            "beeswarm": beeswarm,
+        }
+
+    def _figure(self, order):
+        fig = Figure(figsize=self.figsize, dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.set_yticks(np.arange(len(order))[::-1])
+        ax.set_yticklabels([self.feature_names[i] for i in order], fontsize=13)
+        ax.set_ylim(-1, len(order))
+        ax.xaxis.set_ticks_position("bottom")
+        ax.yaxis.set_ticks_position("none")
+        for side in ("right", "top", "left"):
+            ax.spines[side].set_visible(False)
+        ax.tick_params(labelsize=11)
+        return fig, ax
+
+    def _png(self, fig, kind):
+        margins = self._margins.get(kind)
+        if margins is None:
+            fig.tight_layout()
+            params = fig.subplotpars
+            margins = self._margins[kind] = {
+                "left": params.left, "right": params.right,
+                "bottom": params.bottom, "top": params.top,
+            }
+        else:
+            fig.subplots_adjust(**margins)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png")
+        return buffer.getvalue()
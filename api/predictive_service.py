@@ -4,14 +4,25 @@ def make_prediction(model, features):
 
     Args:
         model: Loaded machine learning model.
-        features (pd.DataFrame): Feature-engineered data.
+        features (pd.DataFrame or np.ndarray): Feature-engineered data.
 
     Returns:
         list: Model predictions for the input features.
     """
     # Perform the prediction
-    predictions = model.predict(features.values).tolist()
-    
-    # Map numeric predictions to labels
+    values = features.values if hasattr(features, "values") else features
+    return label_predictions(model.predict(values))
+
+
+def label_predictions(predictions):
+    """
+    Map numeric class predictions to the labels the API returns.
+
+    Args:
+        predictions (np.ndarray or list): Predicted classes.
+
+    Returns:
+        list: "Fraud", "Not Fraud" or "Unknown" per prediction.
+    """
     label_mapping = {0.0: "Not Fraud", 1.0: "Fraud"}
-    return [label_mapping.get(pred, "Unknown") for pred in predictions]
+    return [label_mapping.get(pred, "Unknown") for pred in list(predictions)]
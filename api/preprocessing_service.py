@@ -1,25 +1,32 @@
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
+from api.feature_pipeline import FeaturePipeline, InvalidInputError
+from api.time_features import to_datetime64
 
-# Initialize LabelEncoder for 'Category'
-label_encoder = LabelEncoder()
+# Load the preprocessing state fitted alongside the model
+feature_pipeline = FeaturePipeline.load()
 
-def preprocess_data(input_data):
+def preprocess_data(input_data, pipeline=None):
     """
     Preprocess raw input data for the model.
 
     Args:
-        input_data (list[dict]): Raw input data from the user.
+        input_data (list[dict]): Raw input data from the user, or a
+                                 DataFrame of records (e.g. a CSV chunk).
+        pipeline (FeaturePipeline): Fitted preprocessing state; defaults to
+                                    the artifact saved with the model.
 
     Returns:
         pd.DataFrame: Preprocessed DataFrame ready for feature engineering.
     """
+    pipeline = pipeline or feature_pipeline
     try:
         # Convert input JSON data to a DataFrame
         if isinstance(input_data, dict):  # Single record case
             df = pd.DataFrame([input_data])
         elif isinstance(input_data, list):  # Multiple records case
             df = pd.DataFrame(input_data)
+        elif isinstance(input_data, pd.DataFrame):  # Batch scoring case
+            df = input_data.copy()
         else:
             raise ValueError("Input data must be a dict or a list of dicts.")
 
@@ -34,11 +41,11 @@ def preprocess_data(input_data):
             raise ValueError(f"Missing required columns: {missing_columns}")
 
         # Convert datetime columns
-        df["Timestamp"] = pd.to_datetime(df["Timestamp"])
-        df["LastLogin"] = pd.to_datetime(df["LastLogin"])
+        df["Timestamp"] = to_datetime64(df["Timestamp"])
+        df["LastLogin"] = to_datetime64(df["LastLogin"])
 
-        # Encode categorical columns
-        df["Category"] = label_encoder.fit_transform(df["Category"])
+        # Encode categorical columns with the training vocabulary
+        df["Category"] = pipeline.encode_categories(df["Category"])
 
         # Drop unnecessary columns
         columns_to_drop = ["TransactionID", "MerchantID", "CustomerID"]
@@ -47,7 +54,12 @@ def preprocess_data(input_data):
         # Handle missing values
         df.fillna(0, inplace=True)
 
+        # Cast the model inputs to their training dtypes
+        df = df.astype(pipeline.input_dtypes)
+
         return df
 
+    except InvalidInputError as e:
+        raise InvalidInputError(f"Error during preprocessing: {e}")
     except Exception as e:
         raise ValueError(f"Error during preprocessing: {e}")
@@ -0,0 +1,100 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from api.scoring_service import MODEL_PATH, large_batch_model, load_model, score_records
+from api.forest_engine import CompiledForest
+from api.admission import deadline_expired
+from api.explanation_service import (
+    FEATURE_NAMES,
+    generate_plot_data,
+    generate_shap_json,
+    plot_renderer,
+    render_shap_plots,
+)
+
+# Model of this pool process, loaded once by init_worker
+_model = None
+_compiled_forest = None
+_batch_model = None
+
+
+def init_worker(model_path=MODEL_PATH, arrays_dir=None, started=None):
+    """
+    Load the model, its explainer and the plot renderer in a pool process,
+    then put the process ID on the started queue, if any.
+    """
+    global _model, _compiled_forest, _batch_model
+    _model = load_model(model_path, arrays_dir)
+    _compiled_forest = (
+        _model if arrays_dir else CompiledForest.from_sklearn(_model)
+    )
+    _batch_model = large_batch_model(_model, model_path)
+    plot_renderer.warm_up()
+    if started is not None:
+        started.put(os.getpid())
+
+
+def score(input_data):
+    """
+    Engineer the features of raw request data and score them.
+
+    Returns:
+        tuple: (features, prediction labels)
+    """
+    return score_records(_batch_model, _compiled_forest, input_data)
+
+
+def explain_json(features, top_k, method="exact", deadline=None):
+    # None when the deadline passed while the task waited for a process
+    if deadline_expired(deadline):
+        return None
+    return generate_shap_json(_model, features, top_k=top_k, method=method, deadline=deadline)
+
+
+def plot_data(features, method="exact", deadline=None):
+    if deadline_expired(deadline):
+        return None
+    return generate_plot_data(_model, features, method=method, deadline=deadline)
+
+
+def render_plots(features, method="exact"):
+    """
+    Compute SHAP values and render both summary plots as PNG bytes.
+    """
+    return render_shap_plots(_model, pd.DataFrame(features, columns=FEATURE_NAMES), method)
+
+
+def create_pool(processes=None, model_path=MODEL_PATH, arrays_dir=None):
+    """
+    Start a process pool whose processes each hold a copy of the model.
+
+    Processes are spawned rather than forked, so they do not inherit the
+    event loop, threads or locks of the serving process. With arrays_dir
+    the forest is memory-mapped and its pages are shared by the processes.
+
+    Args:
+        processes (int): Pool size; defaults to the number of CPUs.
+        model_path (str): Pickled sklearn model.
+        arrays_dir (str): Directory written by models/export_forest.py.
+
+    Returns:
+        tuple: (ProcessPoolExecutor, list of the pool's process IDs), with
+               every process already started and holding the model.
+    """
+    processes = processes or os.cpu_count()
+    context = multiprocessing.get_context("spawn")
+    started = context.Queue()
+    pool = ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=context,
+        initializer=init_worker,
+        initargs=(model_path, arrays_dir, started),
+    )
+    # Start every process now so no request waits for a model to load:
+    # spawned pools add a process for each task no idle process can take
+    for future in [pool.submit(os.getpid) for _ in range(processes)]:
+        future.result()
+    pids = [started.get() for _ in range(processes)]
+    started.close()
+    return pool, pids
@@ -0,0 +1,190 @@
+import os
+import pickle
+import hashlib
+import threading
+from api.preprocessing_service import preprocess_data
+from api.feature_engineering_service import perform_feature_engineering
+from api.columnar_service import compile_features
+from api.predictive_service import make_prediction
+from api.forest_engine import CompiledForest
+from api.explanation_service import register_explainer
+from api.feature_store import open_feature_store
+from api.velocity import open_velocity_aggregator
+from api.metrics import metrics
+
+MODEL_PATH = "models/ml_model.pkl"
+
+# Batches up to this size skip pandas and go through the columnar fast path
+FAST_PATH_MAX_ROWS = int(os.getenv("FAST_PATH_MAX_ROWS", "32"))
+
+# Batches up to this size are scored by the array-backed forest
+COMPILED_FOREST_MAX_ROWS = int(os.getenv("COMPILED_FOREST_MAX_ROWS", "256"))
+
+# Customer attributes looked up by ID when a request does not carry them;
+# off unless FEATURE_STORE_DIR points at a store (see build_feature_store.py)
+feature_store = open_feature_store()
+
+# Per-customer sliding-window counts shared by every process through
+# VELOCITY_STATE_PATH; off when unset
+velocity_aggregator = open_velocity_aggregator()
+
+
+def load_model(model_path=MODEL_PATH, arrays_dir=None):
+    """
+    Load the model and build its SHAP explainer.
+
+    Args:
+        model_path (str): Pickled sklearn model.
+        arrays_dir (str): Directory written by models/export_forest.py;
+                          when set, the memory-mapped arrays are loaded
+                          instead of the pickle.
+    """
+    if arrays_dir:
+        # Memory-mapped tree arrays: workers share the pages, nothing is unpickled
+        model = CompiledForest.load(arrays_dir)
+    else:
+        with open(model_path, "rb") as model_file:
+            model = pickle.load(model_file)
+    # Build the SHAP explainer alongside the model so requests never pay for it
+    register_explainer(model)
+    return model
+
+
+class PickledModel:
+    """
+    The sklearn model a forest served from arrays was exported from,
+    unpickled on first use.
+
+    The array-backed forest beats sklearn on small batches but is several
+    times slower on large ones (about 3x at 10,000 rows), so batches over
+    COMPILED_FOREST_MAX_ROWS go to the pickle instead. Only processes that
+    receive such batches pay for unpickling it. When the pickle is missing
+    or is not the one the arrays were exported from, the forest scores
+    every batch.
+    """
+
+    def __init__(self, model_path, forest):
+        """
+        Args:
+            model_path (str): Pickled sklearn model.
+            forest (CompiledForest): The forest loaded from arrays.
+        """
+        self.model_path = model_path
+        self.forest = forest
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._unpickle()
+        return self._model
+
+    def _unpickle(self):
+        try:
+            with open(self.model_path, "rb") as model_file:
+                payload = model_file.read()
+        except OSError:
+            return self.forest
+        # The arrays carry the hash of the pickle they were exported from
+        if hashlib.sha256(payload).hexdigest()[:16] != self.forest.model_version:
+            return self.forest
+        return pickle.loads(payload)
+
+    def predict(self, X):
+        return self._load().predict(X)
+
+
+def large_batch_model(model, model_path=MODEL_PATH):
+    """
+    The model that scores batches over COMPILED_FOREST_MAX_ROWS: the model
+    itself, or the pickle of a forest loaded from arrays.
+    """
+    if isinstance(model, CompiledForest):
+        return PickledModel(model_path, model)
+    return model
+
+
+def load_model_version(model_path=MODEL_PATH):
+    """
+    Identify a model artifact by the hash of its contents.
+    """
+    with open(model_path, "rb") as model_file:
+        return hashlib.sha256(model_file.read()).hexdigest()[:16]
+
+
+def build_features(input_data, pipeline=None):
+    """
+    Run preprocessing and feature engineering on the raw request data.
+
+    Args:
+        input_data: A record dict, a list of them or a DataFrame.
+        pipeline (FeaturePipeline): Preprocessing state of the model being
+                                    served; defaults to the saved artifact.
+    """
+    if feature_store is not None and isinstance(input_data, (dict, list)):
+        with metrics.timer("predict_stage_seconds", stage="enrich"):
+            input_data = feature_store.enrich(input_data)
+
+    if isinstance(input_data, dict) or (
+        isinstance(input_data, list) and len(input_data) <= FAST_PATH_MAX_ROWS
+    ):
+        with metrics.timer("predict_stage_seconds", stage="columnar"):
+            features = compile_features(input_data, pipeline)
+        if features is not None:
+            return features
+
+    # Step 1: Preprocess the data
+    with metrics.timer("predict_stage_seconds", stage="preprocess"):
+        preprocessed_data = preprocess_data(input_data, pipeline)
+
+    # Step 2: Perform real-time feature engineering
+    with metrics.timer("predict_stage_seconds", stage="feature_engineering"):
+        return perform_feature_engineering(preprocessed_data, pipeline)
+
+
+def score_records(model, compiled_forest, input_data, pipeline=None):
+    """
+    Engineer the features of the raw request data and score them.
+
+    Args:
+        model: The model for large batches, see large_batch_model().
+        compiled_forest (CompiledForest): Array-backed copy of the model,
+                                          used for small batches.
+        input_data: A record dict, a list of them or a DataFrame.
+        pipeline (FeaturePipeline): Preprocessing state fitted with the
+                                    model; defaults to the saved artifact.
+
+    Returns:
+        tuple: (features, prediction labels)
+    """
+    features = build_features(input_data, pipeline)
+
+    # Step 3: Make prediction using the pre-loaded model
+    scorer = compiled_forest if len(features) <= COMPILED_FOREST_MAX_ROWS else model
+    metrics.observe("predict_batch_rows", len(features))
+    with metrics.timer("predict_stage_seconds", stage="predict"):
+        return features, make_prediction(scorer, features)
+
+
+def velocity_features(input_data):
+    """
+    Record the transactions in the velocity windows and return their features.
+
+    Runs after scoring, so records the aggregator cannot take (e.g. a
+    non-numeric CustomerID) do not fail the request: nothing is recorded
+    and the error is returned in place of the features.
+
+    Returns:
+        list[dict], dict or None: One dict of features per record, a dict
+                                  with the "error", or None when velocity
+                                  features are off.
+    """
+    if velocity_aggregator is None or not isinstance(input_data, (dict, list)):
+        return None
+    with metrics.timer("predict_stage_seconds", stage="velocity"):
+        try:
+            return velocity_aggregator.update_records(input_data)
+        except ValueError as e:
+            return {"error": str(e)}
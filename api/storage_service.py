@@ -0,0 +1,144 @@
+import os
+import boto3
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from dotenv import load_dotenv
+
+load_dotenv()
+# Access the environment variables
+bucket_name = "fraud-detection-de"
+region = "us-east-2"
+
+# Lifetime of the URLs handed out for uploaded plots, in seconds
+URL_EXPIRES_IN = 600
+
+# Concurrent uploads, and pooled HTTP connections, per worker
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "8"))
+
+
+class ObjectStore:
+    """
+    Base class of the stores that receive rendered plots.
+
+    Subclasses implement upload_bytes; upload_many sends several objects
+    concurrently over the store's shared client.
+    """
+
+    def __init__(self, concurrency=UPLOAD_CONCURRENCY):
+        # Threads are only started by the first upload, after gunicorn forks
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="upload"
+        )
+
+    def upload_bytes(self, data, key, content_type="image/png"):
+        raise NotImplementedError
+
+    def upload_many(self, objects, content_type="image/png"):
+        """
+        Upload several in-memory objects concurrently.
+
+        Args:
+            objects (dict): Name -> (key, bytes) of every object to upload.
+            content_type (str): Content type stored with the objects.
+
+        Returns:
+            dict: Name -> URL of every uploaded object.
+        """
+        futures = {
+            name: self._executor.submit(self.upload_bytes, data, key, content_type)
+            for name, (key, data) in objects.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+class S3ObjectStore(ObjectStore):
+    """
+    Object store backed by the project's S3 bucket.
+
+    endpoint_url points the client at an S3-compatible server instead of
+    AWS (MinIO, LocalStack, or the stand-in in benchmarks/uploads.py).
+    """
+
+    def __init__(self, bucket=bucket_name, region_name=region, endpoint_url=None,
+                 concurrency=UPLOAD_CONCURRENCY):
+        super().__init__(concurrency)
+        self.bucket = bucket
+        # One client per worker: its connection pool is shared by the upload
+        # threads, so keep-alive connections are reused across requests
+        self.client = boto3.client(
+            "s3",
+            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+            region_name=region_name,
+            endpoint_url=endpoint_url,
+            config=Config(max_pool_connections=concurrency,
+                          retries={"max_attempts": 3, "mode": "standard"}),
+        )
+
+    def upload_bytes(self, data, key, content_type="image/png"):
+        """
+        Upload an in-memory object and return a pre-signed URL to it.
+
+        Args:
+            data (bytes): Object content.
+            key (str): Object key in the bucket.
+            content_type (str): Content type stored with the object.
+
+        Returns:
+            str: Pre-signed URL valid for URL_EXPIRES_IN seconds.
+        """
+        try:
+            # A single PUT; upload_file would go through the transfer manager
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=data,
+                                   ContentType=content_type)
+        except (BotoCoreError, ClientError) as e:
+            raise ValueError(f"S3 upload failed: {e}")
+        # Signing is computed locally from the credentials, no request is sent
+        return self.client.generate_presigned_url(
+            ClientMethod="get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=URL_EXPIRES_IN,  # Time in seconds
+        )
+
+
+class LocalObjectStore(ObjectStore):
+    """
+    Object store that writes objects into a local directory.
+
+    Used to run the service and its explanation queue offline, without
+    access to the S3 bucket.
+    """
+
+    def __init__(self, root, concurrency=UPLOAD_CONCURRENCY):
+        super().__init__(concurrency)
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def upload_bytes(self, data, key, content_type="image/png"):
+        """
+        Write an in-memory object into the store and return a file:// URL to it.
+        """
+        destination = os.path.join(self.root, key)
+        with open(destination, "wb") as object_file:
+            object_file.write(data)
+        return f"file://{destination}"
+
+
+def create_object_store():
+    """
+    Create the object store selected by the OBJECT_STORE environment variable.
+
+    OBJECT_STORE=s3 (default) uploads to the project bucket, or to the
+    S3-compatible server at S3_ENDPOINT_URL when set. OBJECT_STORE=local
+    writes into LOCAL_STORE_DIR (default "static/store").
+    """
+    kind = os.getenv("OBJECT_STORE", "s3")
+    if kind == "s3":
+        return S3ObjectStore(
+            bucket=os.getenv("S3_BUCKET", bucket_name),
+            endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+        )
+    if kind == "local":
+        return LocalObjectStore(os.getenv("LOCAL_STORE_DIR", "static/store"))
+    raise ValueError(f"Unknown object store: {kind}")
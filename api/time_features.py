@@ -0,0 +1,309 @@
+import datetime
+import numpy as np
+import pandas as pd
+
+# Features derived from Timestamp and LastLogin, in training column order
+TIME_FEATURES = ["gap", "Hour", "Day", "Month", "Weekday", "Year"]
+
+NS_PER_SECOND = 10**9
+NS_PER_HOUR = 3600 * NS_PER_SECOND
+NS_PER_DAY = 86400 * NS_PER_SECOND
+
+# Missing timestamps, as pandas stores NaT
+NAT = np.iinfo(np.int64).min
+
+# Calendar of every day in this range, looked up by days since the epoch
+_CALENDAR_START = np.datetime64("1900-01-01", "D")
+_CALENDAR_END = np.datetime64("2200-01-01", "D")
+
+
+def _build_calendar():
+    days = np.arange(_CALENDAR_START, _CALENDAR_END)
+    months = days.astype("datetime64[M]")
+    return {
+        "Year": (days.astype("datetime64[Y]").astype(np.int64) + 1970).astype(np.int16),
+        "Month": (months.astype(np.int64) % 12 + 1).astype(np.int8),
+        "Day": ((days - months).astype(np.int64) + 1).astype(np.int8),
+        # 1970-01-01 was a Thursday, weekday 3 counting from Monday
+        "Weekday": ((days.astype(np.int64) + 3) % 7).astype(np.int8),
+    }
+
+
+_CALENDAR = _build_calendar()
+_CALENDAR_OFFSET = int(_CALENDAR_START.astype(np.int64))
+
+# Up to this many values, timestamps are parsed one by one in Python,
+# which beats the fixed cost of the vectorized pass
+SCALAR_MAX = 8
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+# Calendar fields as Python lists, for time_feature_row()
+_CALENDAR_LISTS = {name: values.tolist() for name, values in _CALENDAR.items()}
+
+# Byte positions of the digits and separators of YYYY-MM-DD?HH:MM:SS
+_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+_SEPARATORS = {4: b"-", 7: b"-", 10: b"T ", 13: b":", 16: b":"}
+
+
+def parse_timestamp(value):
+    """
+    Parse the fixed ISO layouts our clients send without going through pandas.
+
+    Accepts "YYYY-MM-DD", "YYYY-MM-DDTHH:MM:SS" and "YYYY-MM-DD HH:MM:SS",
+    the latter two with optional fractional seconds.
+
+    Returns:
+        tuple: (date, seconds since midnight) or None for any other layout,
+               including timezone offsets.
+    """
+    if not isinstance(value, str) or len(value) < 10:
+        return None
+    if value[4] != "-" or value[7] != "-":
+        return None
+    date = datetime.date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+    if len(value) == 10:
+        return date, 0.0
+    if len(value) < 19 or value[10] not in "T " or value[13] != ":" or value[16] != ":":
+        return None
+    seconds = int(value[11:13]) * 3600 + int(value[14:16]) * 60 + int(value[17:19])
+    if len(value) > 19:
+        fraction = value[20:]
+        if value[19] != "." or not fraction.isdigit():
+            return None
+        seconds += int(fraction) / 10 ** len(fraction)
+    return date, seconds
+
+
+def epoch_ns(value):
+    """
+    Epoch nanoseconds of a timestamp in one of the fixed layouts, or None.
+
+    Only whole seconds are parsed here; fractions, like any other layout
+    or an invalid date, are left to pandas, which rounds them exactly.
+    """
+    if not isinstance(value, str) or len(value) not in (10, 19):
+        return None
+    try:
+        parsed = parse_timestamp(value)
+    except ValueError:
+        return None
+    if parsed is None:
+        return None
+    if len(value) == 19 and (value[11:13] > "23" or value[14:16] > "59" or value[17:19] > "59"):
+        return None
+    date, seconds = parsed
+    return ((date.toordinal() - _EPOCH_ORDINAL) * 86400 + int(seconds)) * NS_PER_SECOND
+
+
+def _days_from_civil(year, month, day):
+    # Days since 1970-01-01 of proleptic Gregorian dates (H. Hinnant's algorithm)
+    year = year - (month <= 2)
+    era = np.floor_divide(year, 400)
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def _number(digits, start, end):
+    # Decimal value of the digits in columns start to end of each row
+    value = digits[:, start].astype(np.int32)
+    for position in range(start + 1, end):
+        value = value * 10 + digits[:, position]
+    return value
+
+
+def _parse_fixed(chars):
+    """
+    Epoch nanoseconds of rows of bytes in one of the fixed layouts.
+
+    Args:
+        chars (np.ndarray): uint8 array of shape (n, 10) or (n, 19).
+
+    Returns:
+        tuple: (epochs, valid mask); invalid rows are left to pandas.
+    """
+    width = chars.shape[1]
+    # Non-digits wrap around to values above 9
+    digits = chars - np.uint8(ord("0"))
+    valid = (digits[:, [p for p in _DIGITS if p < width]] <= 9).all(axis=1)
+    for position, allowed in _SEPARATORS.items():
+        if position < width:
+            matches = chars[:, position] == allowed[0]
+            for separator in allowed[1:]:
+                matches |= chars[:, position] == separator
+            valid &= matches
+
+    year, month, day = _number(digits, 0, 4), _number(digits, 5, 7), _number(digits, 8, 10)
+    valid &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+    days = _days_from_civil(year, np.clip(month, 1, 12), day).astype(np.int64)
+    # Dates like February 30 land on another day of the calendar
+    index = days - _CALENDAR_OFFSET
+    valid &= (index >= 0) & (index < len(_CALENDAR["Day"]))
+    index = np.clip(index, 0, len(_CALENDAR["Day"]) - 1)
+    valid &= (_CALENDAR["Day"][index] == day) & (_CALENDAR["Month"][index] == month)
+
+    seconds = days * 86400
+    if width == 19:
+        hour, minute, second = (_number(digits, 11, 13), _number(digits, 14, 16),
+                                _number(digits, 17, 19))
+        valid &= (hour < 24) & (minute < 60) & (second < 60)
+        seconds += hour * 3600 + minute * 60 + second
+    return seconds * NS_PER_SECOND, valid
+
+
+def to_epoch_ns(values):
+    """
+    Parse timestamps into int64 nanoseconds since the epoch.
+
+    ISO strings in the fixed layouts ("YYYY-MM-DD", "YYYY-MM-DDTHH:MM:SS",
+    "YYYY-MM-DD HH:MM:SS") are parsed by a vectorized pass over their
+    bytes, or one by one below SCALAR_MAX values; anything else (fractional
+    seconds, offsets, other layouts, invalid dates) goes through
+    pd.to_datetime, which raises on values it cannot parse. Offsets are
+    dropped, keeping the local wall time, as the .dt accessors do.
+
+    Args:
+        values: Strings or datetime64 values, as a list, array or Series.
+
+    Returns:
+        np.ndarray: int64 epoch nanoseconds, NAT for missing values.
+    """
+    if isinstance(values, pd.Series):
+        values = values.to_numpy()
+    elif len(values) <= SCALAR_MAX and not isinstance(values, np.ndarray):
+        values = np.array(values, dtype=object)
+    else:
+        values = np.asarray(values)
+    if values.dtype.kind == "M":
+        return values.astype("datetime64[ns]").view(np.int64)
+
+    epochs = np.full(len(values), NAT, dtype=np.int64)
+    pending = np.ones(len(values), dtype=bool)
+    if len(values) <= SCALAR_MAX:
+        for row, value in enumerate(values.tolist()):
+            parsed = epoch_ns(value)
+            if parsed is not None:
+                epochs[row] = parsed
+                pending[row] = False
+    elif values.dtype.kind in "OU":
+        try:
+            encoded = values.astype("S")
+        except (UnicodeEncodeError, ValueError, TypeError):
+            encoded = np.zeros(len(values), dtype="S1")
+        # Fixed-width bytes, zero-padded: a string of a given length has a
+        # non-zero last byte, and a zero after it
+        itemsize = encoded.dtype.itemsize
+        chars = encoded.view(np.uint8).reshape(len(encoded), itemsize)
+        for width in (10, 19):
+            if itemsize < width:
+                continue
+            has_length = chars[:, width - 1] != 0
+            if itemsize > width:
+                has_length &= chars[:, width] == 0
+            rows = np.flatnonzero(has_length)
+            if not len(rows):
+                continue
+            parsed, valid = _parse_fixed(chars[rows, :width])
+            epochs[rows[valid]] = parsed[valid]
+            pending[rows[valid]] = False
+
+    if pending.any():
+        parsed = pd.to_datetime(pd.Series(values[pending], dtype=object))
+        if getattr(parsed.dt, "tz", None) is not None:
+            parsed = parsed.dt.tz_localize(None)
+        epochs[pending] = parsed.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    return epochs
+
+
+def to_datetime64(values):
+    """
+    to_epoch_ns() as a datetime64[ns] array, the dtype pandas columns use.
+    """
+    return to_epoch_ns(values).view("datetime64[ns]")
+
+
+def time_features(timestamp_ns, last_login_ns):
+    """
+    gap, Hour, Day, Month, Weekday and Year in one pass over the epochs.
+
+    gap is the absolute number of whole days from LastLogin to Timestamp,
+    rounded down like Timedelta.days, between local wall times: where the
+    two carry different UTC offsets, it can differ by a day from the
+    difference of the instants. The calendar fields of Timestamp come
+    from a lookup table indexed by day, outside of which they are computed
+    by numpy's datetime conversions.
+
+    Args:
+        timestamp_ns (np.ndarray): Transaction times, from to_epoch_ns().
+        last_login_ns (np.ndarray): Last login times, from to_epoch_ns().
+
+    Returns:
+        dict: Feature name -> array, in TIME_FEATURES order, with the
+              dtypes of the pandas .dt accessors (int64 gap, int32
+              calendar fields), or float64 with NaN where a timestamp is
+              missing.
+    """
+    timestamp_ns = np.asarray(timestamp_ns, dtype=np.int64)
+    last_login_ns = np.asarray(last_login_ns, dtype=np.int64)
+    days = np.floor_divide(timestamp_ns, NS_PER_DAY)
+    index = days - _CALENDAR_OFFSET
+
+    features = {
+        "gap": np.abs(np.floor_divide(timestamp_ns - last_login_ns, NS_PER_DAY)),
+        "Hour": ((timestamp_ns - days * NS_PER_DAY) // NS_PER_HOUR).astype(np.int32),
+    }
+    inside = (index >= 0) & (index < len(_CALENDAR["Day"]))
+    if inside.all():
+        for name in ("Day", "Month", "Weekday", "Year"):
+            features[name] = _CALENDAR[name][index].astype(np.int32)
+    else:
+        dates = days.astype("datetime64[D]")
+        months = dates.astype("datetime64[M]")
+        features["Day"] = ((dates - months).astype(np.int64) + 1).astype(np.int32)
+        features["Month"] = (months.astype(np.int64) % 12 + 1).astype(np.int32)
+        features["Weekday"] = ((days + 3) % 7).astype(np.int32)
+        features["Year"] = (dates.astype("datetime64[Y]").astype(np.int64) + 1970).astype(np.int32)
+
+    missing = timestamp_ns == NAT
+    missing_gap = missing | (last_login_ns == NAT)
+    if missing_gap.any():
+        for name in TIME_FEATURES:
+            features[name] = features[name].astype(np.float64)
+            features[name][missing_gap if name == "gap" else missing] = np.nan
+    return {name: features[name] for name in TIME_FEATURES}
+
+
+def time_feature_row(timestamp_ns, last_login_ns):
+    """
+    time_features() of a single pair of epochs, without numpy.
+
+    Returns:
+        tuple: The TIME_FEATURES values, as ints.
+    """
+    days = timestamp_ns // NS_PER_DAY
+    gap = abs((timestamp_ns - last_login_ns) // NS_PER_DAY)
+    hour = (timestamp_ns - days * NS_PER_DAY) // NS_PER_HOUR
+    index = days - _CALENDAR_OFFSET
+    if 0 <= index < len(_CALENDAR_LISTS["Day"]):
+        return (gap, hour, _CALENDAR_LISTS["Day"][index], _CALENDAR_LISTS["Month"][index],
+                _CALENDAR_LISTS["Weekday"][index], _CALENDAR_LISTS["Year"][index])
+    date = datetime.date.fromordinal(_EPOCH_ORDINAL + days)
+    return gap, hour, date.day, date.month, date.weekday(), date.year
+
+
+def add_time_features(df, timestamp="Timestamp", last_login="LastLogin"):
+    """
+    Add the TIME_FEATURES columns to a DataFrame of transactions.
+
+    Args:
+        df (pd.DataFrame): Frame with timestamp and last_login columns, as
+                           strings or datetimes.
+
+    Returns:
+        pd.DataFrame: The same frame, with the features added in place.
+    """
+    features = time_features(to_epoch_ns(df[timestamp]), to_epoch_ns(df[last_login]))
+    for name, values in features.items():
+        df[name] = values
+    return df
@@ -0,0 +1,275 @@
+import os
+import fcntl
+import datetime
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from api.time_features import parse_timestamp
+
+# Sliding windows: name -> (length in seconds, number of buckets). The
+# window covers the current bucket and the ones before it, so "1h" spans
+# between 55 and 60 minutes of history.
+WINDOWS = {"1h": (3600, 12), "24h": (86400, 24)}
+
+# Customers tracked at once; the least recently seen are evicted beyond it
+VELOCITY_CAPACITY = int(os.getenv("VELOCITY_CAPACITY", "65536"))
+
+# Slots probed for a customer before the stalest of them is evicted
+MAX_PROBES = 16
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+_GOLDEN = 0x9E3779B97F4A7C15
+_UINT64_MASK = (1 << 64) - 1
+
+
+def feature_names(windows=None):
+    """
+    Names of the velocity features, in the order they are computed.
+    """
+    names = []
+    for window in windows or WINDOWS:
+        names += [f"txn_count_{window}", f"amount_sum_{window}"]
+    return names
+
+
+def to_epoch_seconds(value):
+    """
+    Seconds since the Unix epoch of a request Timestamp, as in training.
+
+    Like the time features (see api/time_features.py), a UTC offset is
+    dropped and the local wall time kept, which is what the naive training
+    timestamps record.
+    """
+    parsed = parse_timestamp(value)
+    if parsed is not None:
+        date, seconds = parsed
+        return (date.toordinal() - _EPOCH_ORDINAL) * 86400 + int(seconds)
+    timestamp = pd.Timestamp(value)
+    if timestamp is pd.NaT:
+        raise ValueError(f"Missing Timestamp: {value!r}")
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_localize(None)
+    return int(timestamp.value // 10**9)
+
+
+class VelocityAggregator:
+    """
+    Per-customer transaction counts and amounts over sliding windows.
+
+    Every window is a ring of fixed-width buckets per customer, so an
+    update advances the ring by at most its number of buckets and adds to
+    one of them: O(1) time, whatever the customer's history. Customers live
+    in a fixed-capacity open-addressing table; a customer idle for longer
+    than the widest window holds nothing but zeros, and its slot is reused
+    by the next customer probing it. When every probed slot is still live,
+    the least recently seen customer is evicted. Memory is fixed by
+    capacity.
+
+    With a path, the table lives in a memory-mapped file guarded by a file
+    lock, so all gunicorn workers and pool processes update the same
+    counts. Without one, it lives in process memory, which is what the
+    offline pipeline uses.
+
+    Features are computed from event time (the transaction Timestamp) and
+    exclude the transaction itself. Fed the same transactions in the same
+    order, offline and online produce identical values. A transaction
+    older than the customer's latest one only counts the earlier buckets
+    still held by the ring: its window loses the buckets that already slid
+    out, and a transaction older than the whole ring gets zeros.
+    """
+
+    def __init__(self, capacity=VELOCITY_CAPACITY, windows=None, path=None):
+        """
+        Args:
+            capacity (int): Customers tracked at once.
+            windows (dict): Window name -> (seconds, buckets); WINDOWS by default.
+            path (str): State file shared between processes, or None.
+        """
+        self.capacity = capacity
+        self.windows = windows or WINDOWS
+        self.max_window = max(seconds for seconds, _ in self.windows.values())
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._lock_file = None
+        self._lock_pid = None
+
+        layout = [
+            ("used", np.uint8, (capacity,)),
+            ("keys", np.int64, (capacity,)),
+            ("last_seen", np.int64, (capacity,)),
+        ]
+        for name, (_, buckets) in self.windows.items():
+            layout += [
+                (f"head_{name}", np.int64, (capacity,)),
+                (f"counts_{name}", np.int32, (capacity, buckets)),
+                (f"sums_{name}", np.float64, (capacity, buckets)),
+            ]
+        size = sum(np.dtype(dtype).itemsize * int(np.prod(shape)) for _, dtype, shape in layout)
+
+        if path is None:
+            buffer = bytearray(size)
+        else:
+            with self._locked():
+                exists = os.path.exists(path) and os.path.getsize(path) > 0
+                if exists and os.path.getsize(path) != size:
+                    raise ValueError(
+                        f"Velocity state {path} does not match capacity {capacity} "
+                        f"and windows {list(self.windows)}"
+                    )
+                buffer = np.memmap(path, dtype=np.uint8, mode="r+" if exists else "w+",
+                                   shape=(size,))
+
+        self._arrays = {}
+        offset = 0
+        for name, dtype, shape in layout:
+            self._arrays[name] = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            offset += self._arrays[name].nbytes
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            if self.path is None:
+                yield
+                return
+            # flock is held per open file, and a forked worker shares the
+            # parent's: every process opens the lock file itself
+            if self._lock_pid != os.getpid():
+                self._lock_file = open(f"{self.path}.lock", "a")
+                self._lock_pid = os.getpid()
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _slot(self, customer_id, now):
+        """
+        Slot of a customer, claiming (and clearing) one if it has none.
+        """
+        used = self._arrays["used"]
+        keys = self._arrays["keys"]
+        last_seen = self._arrays["last_seen"]
+        slot = ((customer_id & _UINT64_MASK) * _GOLDEN & _UINT64_MASK) % self.capacity
+        reusable = None
+        stalest = None
+        for _ in range(min(MAX_PROBES, self.capacity)):
+            if not used[slot]:
+                if reusable is None:
+                    reusable = slot
+                break
+            if keys[slot] == customer_id:
+                return slot
+            if reusable is None and last_seen[slot] <= now - self.max_window:
+                reusable = slot
+            if stalest is None or last_seen[slot] < last_seen[stalest]:
+                stalest = slot
+            slot = (slot + 1) % self.capacity
+        slot = reusable if reusable is not None else stalest
+
+        used[slot] = 1
+        keys[slot] = customer_id
+        last_seen[slot] = now
+        for name, (seconds, n_buckets) in self.windows.items():
+            self._arrays[f"head_{name}"][slot] = now // (seconds // n_buckets)
+            self._arrays[f"counts_{name}"][slot] = 0
+            self._arrays[f"sums_{name}"][slot] = 0.0
+        return slot
+
+    def _update(self, customer_id, timestamp, amount, out, row):
+        slot = self._slot(customer_id, timestamp)
+        last_seen = self._arrays["last_seen"]
+        if timestamp > last_seen[slot]:
+            last_seen[slot] = timestamp
+        column = 0
+        for name, (seconds, n_buckets) in self.windows.items():
+            heads = self._arrays[f"head_{name}"]
+            counts = self._arrays[f"counts_{name}"][slot]
+            sums = self._arrays[f"sums_{name}"][slot]
+            bucket = timestamp // (seconds // n_buckets)
+            head = int(heads[slot])
+            if bucket > head:
+                # Buckets that slid out of the window are cleared
+                if bucket - head >= n_buckets:
+                    counts[:] = 0
+                    sums[:] = 0.0
+                else:
+                    for stale in range(head + 1, bucket + 1):
+                        counts[stale % n_buckets] = 0
+                        sums[stale % n_buckets] = 0.0
+                heads[slot] = head = bucket
+            # Summing a few dozen Python floats beats numpy's call overhead
+            if bucket < head:
+                # A late event only counts the buckets up to its own that
+                # are still in the ring, not the later transactions
+                kept = [stale % n_buckets for stale in range(head - n_buckets + 1, bucket + 1)]
+                out[row, column] = sum(counts[kept].tolist())
+                out[row, column + 1] = sum(sums[kept].tolist())
+            else:
+                out[row, column] = sum(counts.tolist())
+                out[row, column + 1] = sum(sums.tolist())
+            if bucket > head - n_buckets:
+                counts[bucket % n_buckets] += 1
+                sums[bucket % n_buckets] += amount
+            column += 2
+
+    def update_many(self, customer_ids, timestamps, amounts):
+        """
+        Record transactions in order and return their velocity features.
+
+        Args:
+            customer_ids: Customer ID of each transaction.
+            timestamps: Event time of each, in seconds since the epoch.
+            amounts: Amount of each.
+
+        Returns:
+            np.ndarray: Shape (n, 2 * len(windows)), columns in the order
+                        of feature_names(); values before each transaction.
+        """
+        customer_ids = [int(customer_id) for customer_id in customer_ids]
+        timestamps = [int(timestamp) for timestamp in timestamps]
+        amounts = [float(amount) for amount in amounts]
+        out = np.zeros((len(customer_ids), 2 * len(self.windows)), dtype=np.float64)
+        with self._locked():
+            for row, (customer_id, timestamp, amount) in enumerate(
+                zip(customer_ids, timestamps, amounts)
+            ):
+                self._update(customer_id, timestamp, amount, out, row)
+        return out
+
+    def update_records(self, records):
+        """
+        Record /predict records and return their velocity features.
+
+        Args:
+            records (dict or list): Records with CustomerID, Timestamp and Amount.
+
+        Returns:
+            list[dict]: Feature name -> value, one dict per record.
+        """
+        records = [records] if isinstance(records, dict) else records
+        try:
+            values = self.update_many(
+                [record["CustomerID"] for record in records],
+                [to_epoch_seconds(record["Timestamp"]) for record in records],
+                [record["Amount"] for record in records],
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Error during velocity update: {e}")
+        names = feature_names(self.windows)
+        return [
+            {name: (int(value) if name.startswith("txn_count") else float(value))
+             for name, value in zip(names, row)}
+            for row in values
+        ]
+
+
+def open_velocity_aggregator(path=None):
+    """
+    Shared aggregator at VELOCITY_STATE_PATH, or None when it is off.
+    """
+    path = path or os.getenv("VELOCITY_STATE_PATH")
+    if not path:
+        return None
+    return VelocityAggregator(path=path)
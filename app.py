@@ -1,57 +1,474 @@
-from flask import Flask, jsonify, request
-from api.preprocessing_service import preprocess_data
-from api.predictive_service import make_prediction
-from api.explanation_service import generate_cache_shap_explanations
-from api.feature_engineering_service import perform_feature_engineering
-import pickle
+from flask import Flask, Response, g, jsonify, render_template, request, stream_with_context
+from api.explanation_service import (
+    generate_shap_explanations,
+    generate_shap_json,
+    generate_plot_data,
+    plot_renderer,
+    EXPLAIN_METHODS,
+    FEATURE_NAMES,
+)
+from api import scoring_service
+from api.scoring_service import MODEL_PATH
+from api.model_registry import (
+    ModelRegistry,
+    load_bundle,
+    load_warm_up_records,
+    open_model_registry,
+)
+from api.batching import MicroBatcher
+from api.admission import AdmissionController, deadline_expired, request_deadline
+from api.metrics import metrics
+from api.explanation_jobs import ExplanationJobQueue, QueueFullError
+from api.explanation_cache import ExplanationCache
+from api.feature_pipeline import InvalidInputError
+from api.storage_service import URL_EXPIRES_IN
+import os
+import json
+import time
+import hmac
+import pandas as pd
 
-# Load model once to improve performance
-def load_model(model_path="models/ml_model.pkl"):
-    with open(model_path, "rb") as model_file:
-        return pickle.load(model_file)
+# Directory written by models/export_forest.py; the pickle is used when unset
+MODEL_ARRAYS_DIR = os.getenv("MODEL_ARRAYS_DIR")
 
-ml_model = load_model()
+# Versioned models published by models/publish_model.py, swapped in without
+# a restart; when unset, MODEL_ARRAYS_DIR or the pickle is served for good
+model_registry = open_model_registry()
+
+# Load model once to improve performance, together with its array-backed
+# copy of the forest (much cheaper than sklearn on small batches)
+static_model = (
+    load_bundle(MODEL_PATH, arrays_dir=MODEL_ARRAYS_DIR, warm_up_records=load_warm_up_records())
+    if model_registry is None else None
+)
+
+# Shared secret of the /admin endpoints; they are disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def current_model():
+    """
+    The model bundle that serves a request; take it once per request.
+    """
+    if model_registry is None:
+        return static_model
+    model_registry.maybe_reload()
+    return model_registry.bundle
+
+# Load fonts and the Agg renderer now; with --preload the workers inherit them
+plot_renderer.warm_up()
+
+# Plot URLs shared by all workers, keyed by features and model version.
+# Entries expire a minute before their presigned URLs do.
+explanation_cache = ExplanationCache(
+    cache_dir=os.getenv("EXPLANATION_CACHE_DIR", "static/explanation_cache"),
+    max_bytes=int(os.getenv("EXPLANATION_CACHE_MAX_BYTES", "10000000")),
+    ttl=URL_EXPIRES_IN - 60,
+)
+
+def score_records(model, input_data):
+    """
+    Engineer the features of the raw request data and score them.
+
+    Args:
+        model (ModelBundle): The model version to score with.
+
+    Returns:
+        tuple: (features, prediction labels)
+    """
+    return scoring_service.score_records(model.batch_model, model.compiled_forest, input_data,
+                                         model.pipeline)
+
+def score_batch(requests):
+    """
+    Score the records of several requests at once and split the results.
+
+    Every result also carries the model that scored it, for the explanations.
+    """
+    model = current_model()
+    features, prediction = score_records(
+        model, [record for records in requests for record in records])
+    results = []
+    start = 0
+    for records in requests:
+        end = start + len(records)
+        results.append((features[start:end], prediction[start:end], model))
+        start = end
+    return results
+
+# Opt-in coalescing of concurrent requests into one pipeline and model call
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "0"))
+batcher = (
+    MicroBatcher(score_batch, window_ms=BATCH_WINDOW_MS,
+                 max_rows=int(os.getenv("BATCH_MAX_ROWS", "64")))
+    if BATCH_WINDOW_MS > 0 else None
+)
+
+def render_plots(model, features, method="exact"):
+    key = ExplanationCache.make_key(features, explanation_version(model, method))
+    plot_urls = explanation_cache.get(key)
+    if plot_urls is None:
+        features = pd.DataFrame(features, columns=FEATURE_NAMES)
+        plot_urls = generate_shap_explanations(model.model, features, method=method)
+        explanation_cache.set(key, plot_urls)
+    return plot_urls
+
+def explanation_version(model, method):
+    # Plots of the fast method are cached apart from the exact ones
+    return model.version if method == "exact" else f"{model.version}-{method}"
+
+# Plot rendering and upload run in the background, off the request path
+explanation_queue = ExplanationJobQueue(
+    render_plots,
+    job_dir=os.getenv("EXPLANATION_JOB_DIR", "static/jobs"),
+    max_workers=int(os.getenv("EXPLANATION_WORKERS", "2")),
+    max_pending=int(os.getenv("EXPLANATION_MAX_PENDING", "64")),
+    job_ttl=URL_EXPIRES_IN,
+)
+
+# Threads of a gunicorn worker, as set by gunicorn.conf.py
+SERVER_THREADS = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# /predict requests run at once per worker, always leaving a thread for
+# /health and /ready. Scoring holds the GIL, so without micro-batching two
+# requests keep a worker busy and more would only queue for the GIL. With
+# BATCH_WINDOW_MS set, admitted requests mostly wait in the batcher and
+# only concurrent ones can share a batch, so every other thread takes one.
+PREDICT_MAX_IN_FLIGHT = int(os.getenv("PREDICT_MAX_IN_FLIGHT", "0")) or max(
+    1, SERVER_THREADS - 1 if batcher is not None else min(2, SERVER_THREADS - 1))
+admission = AdmissionController(
+    PREDICT_MAX_IN_FLIGHT, max_wait_ms=float(os.getenv("ADMISSION_MAX_WAIT_MS", "50")),
+)
+
+# Default budget of a /predict request; "0" disables it
+REQUEST_DEADLINE_MS = float(os.getenv("REQUEST_DEADLINE_MS", "10000")) or None
+
+def overloaded(body, status):
+    """
+    A 429 or 503 response telling the client when to retry.
+    """
+    response = jsonify(body)
+    response.status_code = status
+    response.headers["Retry-After"] = str(admission.retry_after())
+    return response
 
 app = Flask(__name__)
 
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_latency(response):
+    # Only requests that hit a route are labelled, to bound the label values
+    if request.url_rule is not None and "request_start" in g:
+        metrics.observe("request_seconds", time.perf_counter() - g.request_start,
+                        endpoint=request.url_rule.rule, status=str(response.status_code))
+    return response
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """
-    Health check endpoint.
+    Health check endpoint (liveness): answers as long as the worker runs,
+    without touching the model or waiting for prediction capacity.
     """
     return jsonify({"status": "healthy"}), 200
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness probe: 503 with a Retry-After hint while every /predict slot
+    of this worker is taken, so a load balancer can send traffic elsewhere
+    without the orchestrator restarting a busy but healthy task.
+    """
+    state = {"model_version": current_model().version, **admission.stats()}
+    if admission.saturated():
+        return overloaded({"status": "busy", **state}, 503)
+    return jsonify({"status": "ready", **state}), 200
+
 @app.route('/predict', methods=['POST'])
 def predict():
     """
     Predict fraud and provide SHAP explanations.
+
+    Query parameters:
+        explanation: "plots" (default) queues SHAP summary plots and returns
+                     the job ID to poll at /explanations/<id>, "json" returns
+                     per-record SHAP contributions, "plot_data" returns the
+                     data templates/plots.html draws in the browser.
+        top_k: Number of top features per record in "json" mode (default 3;
+               negative values are rejected with 400).
+        format: "html" renders templates/plots.html in "plot_data" mode.
+        explain: "exact" (default) computes TreeSHAP values, "fast" the
+                 Saabas contributions of the compiled forest (one pass
+                 over the trees, approximate), "none" skips explanations.
+        deadline_ms: Budget of the request in milliseconds (default
+                     REQUEST_DEADLINE_MS). In "json" and "plot_data" modes,
+                     an exact explanation expected to overrun it is computed
+                     with the fast method instead; the method used is
+                     reported with the explanations. Once the budget is
+                     spent, the explanation is skipped altogether and the
+                     response says so in "explanation_skipped".
+
+    Records that cannot be encoded like the training data (e.g. a Category
+    unseen in training) are rejected with 400.
+
+    At most PREDICT_MAX_IN_FLIGHT requests run at once per worker; others
+    are answered 429 with a Retry-After header (503 if their deadline ran
+    out while waiting for a slot).
+
+    With VELOCITY_STATE_PATH set, responses also carry each record's
+    per-customer velocity features under "velocity", or {"error": ...}
+    there when the records could not be recorded.
+    """
+    explanation = request.args.get("explanation", "plots")
+    if explanation not in ("plots", "json", "plot_data"):
+        return jsonify({"error": f"Unknown explanation mode: {explanation}"}), 400
+    method = request.args.get("explain", "exact")
+    if method not in EXPLAIN_METHODS:
+        return jsonify({"error": f"Unknown explain method: {method}"}), 400
+    top_k = request.args.get("top_k", default=3, type=int)
+    if top_k < 0:
+        return jsonify({"error": f"top_k must not be negative: {top_k}"}), 400
+    deadline_ms = request.args.get("deadline_ms", default=REQUEST_DEADLINE_MS, type=float)
+    # Deadlines are on the monotonic clock, counted from the request start
+    deadline = request_deadline(
+        deadline_ms, time.monotonic() - (time.perf_counter() - g.request_start))
+
+    # Shed load before reading the body, the first costly step
+    if not admission.try_acquire(deadline):
+        if deadline_expired(deadline):
+            return overloaded({"error": "Deadline exceeded before the request could start"}, 503)
+        return overloaded({"error": "Too many requests in flight"}, 429)
+    admitted = time.perf_counter()
+    try:
+        return run_prediction(explanation, method, top_k, deadline)
+    finally:
+        admission.release(time.perf_counter() - admitted)
+
+def run_prediction(explanation, method, top_k, deadline):
+    """
+    Score the request body and explain the result (see predict()).
     """
     try:
         input_data = request.json
         if not input_data:
             return jsonify({"error": "Invalid input data"}), 400
-        
-        # Step 1: Preprocess the data
-        preprocessed_data = preprocess_data(input_data)
 
-        # Step 2: Perform real-time feature engineering
-        features = perform_feature_engineering(preprocessed_data)
+        # Steps 1 to 3: Preprocess, engineer the features and predict,
+        # together with concurrent requests when batching is enabled
+        if batcher is not None and isinstance(input_data, (dict, list)):
+            records = [input_data] if isinstance(input_data, dict) else input_data
+            features, prediction, model = batcher.submit(records)
+        else:
+            model = current_model()
+            features, prediction = score_records(model, input_data)
+        result = {"prediction": prediction}
+        velocity = scoring_service.velocity_features(input_data)
+        if velocity is not None:
+            result["velocity"] = velocity
 
-        # Step 3: Make prediction using the pre-loaded model
-        prediction = make_prediction(ml_model, features)
+        # Step 4: Generate SHAP explanations, if there is budget left
+        if method == "none":
+            return jsonify(result), 200
+        if deadline_expired(deadline):
+            return jsonify({**result, "explanation_skipped": "Deadline exceeded"}), 200
+        if explanation == "json":
+            return jsonify({
+                **result,
+                "explanations": generate_shap_json(model.model, features, top_k=top_k,
+                                                   method=method, deadline=deadline)
+            }), 200
+        if explanation == "plot_data":
+            # No rasters on the server: the browser draws the plots
+            plot_data = generate_plot_data(model.model, features, method=method,
+                                           deadline=deadline)
+            if request.args.get("format") == "html":
+                return render_template("plots.html", plot_data=plot_data), 200
+            return jsonify({**result, "plot_data": plot_data}), 200
 
-        # Step 4: Generate SHAP explanations
-        features_tuple = tuple(map(tuple, features.values))
-        plot_urls = generate_cache_shap_explanations(ml_model, features_tuple)
+        try:
+            job_id = explanation_queue.submit(model, features, method=method)
+        except QueueFullError as e:
+            return jsonify({
+                **result,
+                "explanation_error": str(e)
+            }), 200
 
-        # Return the prediction in JSON and display the HTML
+        # Return the prediction in JSON and where to fetch the plots from
         return jsonify({
-            "prediction": prediction,
-            "plot_urls": plot_urls
+            **result,
+            "explanation_id": job_id,
+            "explanation_url": f"/explanations/{job_id}"
         }), 200
-    
+
+    except InvalidInputError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Records scored together by /predict/stream
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "1000"))
+
+def score_ndjson(lines):
+    """
+    Score NDJSON lines in chunks and yield one NDJSON result per line.
+    """
+    chunk = []
+    model = current_model()
+
+    def score(lines_records):
+        _, prediction = score_records(model, [record for _, record in lines_records])
+        return [{"line": number, "TransactionID": record.get("TransactionID"),
+                 "prediction": label}
+                for (number, record), label in zip(lines_records, prediction)]
+
+    def flush():
+        try:
+            results = score(chunk)
+        except Exception:
+            # Score the chunk line by line so one bad record fails alone
+            results = []
+            for item in chunk:
+                try:
+                    results.extend(score([item]))
+                except Exception as e:
+                    results.append({"line": item[0], "error": str(e)})
+        chunk.clear()
+        return "".join(json.dumps(result) + "\n" for result in results)
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("Each line must be a JSON object")
+        except ValueError as e:
+            yield json.dumps({"line": number, "error": str(e)}) + "\n"
+            continue
+        chunk.append((number, record))
+        if len(chunk) >= STREAM_CHUNK_ROWS:
+            yield flush()
+    if chunk:
+        yield flush()
+
+@app.route('/predict/stream', methods=['POST'])
+def predict_stream():
+    """
+    Bulk scoring: NDJSON transactions in, NDJSON predictions out.
+
+    The body is read and scored STREAM_CHUNK_ROWS lines at a time, so
+    memory use stays bounded whatever the size of the upload. No SHAP
+    explanations are produced on this endpoint.
+
+    An upload holds a PREDICT_MAX_IN_FLIGHT slot until its last line is
+    scored; without a free one it is answered like /predict (429, or 503
+    once deadline_ms has passed).
+    """
+    deadline_ms = request.args.get("deadline_ms", default=REQUEST_DEADLINE_MS, type=float)
+    deadline = request_deadline(
+        deadline_ms, time.monotonic() - (time.perf_counter() - g.request_start))
+    if not admission.try_acquire(deadline):
+        if deadline_expired(deadline):
+            return overloaded({"error": "Deadline exceeded before the request could start"}, 503)
+        return overloaded({"error": "Too many requests in flight"}, 429)
+
+    def admitted_stream():
+        try:
+            yield from score_ndjson(request.stream)
+        finally:
+            # Uploads last far longer than /predict calls: they are kept out
+            # of the service time behind Retry-After
+            admission.release()
+
+    return Response(stream_with_context(admitted_stream()), mimetype="application/x-ndjson")
+
+@app.route('/explanations/<job_id>', methods=['GET'])
+def explanation_status(job_id):
+    """
+    Status of a background explanation job and, once done, its plot URLs.
+    """
+    try:
+        state = explanation_queue.status(job_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if state is None:
+        return jsonify({"error": "Unknown explanation ID"}), 404
+    return jsonify(state), 200
+
+@app.route('/explanations/<job_id>/view', methods=['GET'])
+def explanation_view(job_id):
+    """
+    Page showing the plots of a finished explanation job.
+    """
+    try:
+        state = explanation_queue.status(job_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if state is None:
+        return jsonify({"error": "Unknown explanation ID"}), 404
+    if state.get("status") != "done":
+        return jsonify(state), 202
+    return render_template(
+        "plots.html",
+        bar_plot_path=state["plot_urls"]["bar_plot"],
+        summary_plot_path=state["plot_urls"]["summary_plot"],
+    ), 200
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """
+    Explanation cache counters of all workers (and of this one), and this
+    worker's request batching, admission control and model version.
+    """
+    model = current_model()
+    return jsonify({
+        "explanation_cache": explanation_cache.stats(),
+        "batching": batcher.stats() if batcher is not None else None,
+        "admission": admission.stats(),
+        "model": model_registry.stats() if model_registry is not None else {
+            "version": model.version,
+            "load_seconds": model.load_seconds,
+            "warm_up_seconds": model.warm_up_seconds,
+        },
+    }), 200
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """
+    Switch to another published model version without a restart.
+
+    The JSON body may name the version to serve ({"version": "..."}); by
+    default the current one of the registry is reloaded. A version that is
+    not one of the published ones is rejected with 400. This worker starts
+    loading it in the background right away, the others on their next
+    registry check. Until a worker has warmed the new version up, it keeps
+    serving the old one. Requires the X-Admin-Token header to match
+    ADMIN_TOKEN.
+    """
+    token = request.headers.get("X-Admin-Token", "")
+    if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+        return jsonify({"error": "Forbidden"}), 403
+    if model_registry is None:
+        return jsonify({"error": "Model registry is off (MODEL_REGISTRY_DIR is unset)"}), 409
+
+    body = request.get_json(silent=True)
+    version = body.get("version") if isinstance(body, dict) else None
+    if version is not None:
+        # Only the names of published versions, never a path
+        if not isinstance(version, str) or version not in model_registry.versions():
+            return jsonify({"error": f"Unknown model version: {version!r}"}), 400
+        ModelRegistry.activate(model_registry.root, version)
+    model_registry.reload_in_background()
+    return jsonify(model_registry.stats()), 202
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Latency and batch size histograms of all workers (of this one only
+    when METRICS_DIR is unset), in Prometheus format.
+    """
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000, debug=True)
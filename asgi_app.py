@@ -0,0 +1,277 @@
+"""
+Asynchronous entry point with the same /health and /predict contract as app.py.
+
+The event loop only parses requests, waits and answers. Scoring, SHAP
+values and plot rendering run in a pool of processes that each hold the
+model, so a slow request never holds what /health needs. Plot uploads
+and presigning happen in the background jobs shared with app.py.
+
+Run with: METRICS_DIR=static/metrics uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+"""
+
+import os
+import time
+import asyncio
+import functools
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+from starlette.templating import Jinja2Templates
+from api import scoring_pool, scoring_service
+from api.scoring_service import MODEL_PATH, load_model_version
+from api.forest_engine import CompiledForest
+from api.explanation_service import EXPLAIN_METHODS, upload_plots
+from api.explanation_jobs import ExplanationJobQueue, QueueFullError
+from api.explanation_cache import ExplanationCache
+from api.feature_pipeline import InvalidInputError
+from api.storage_service import URL_EXPIRES_IN
+from api.metrics import MetricsRegistry, metrics
+from api.admission import AdmissionController, deadline_expired, request_deadline
+
+# Directory written by models/export_forest.py; the pickle is used when unset
+MODEL_ARRAYS_DIR = os.getenv("MODEL_ARRAYS_DIR")
+
+# Processes scoring and explaining requests; defaults to the number of CPUs
+SCORING_PROCESSES = int(os.getenv("SCORING_PROCESSES", "0")) or None
+
+# /predict requests in flight at once, by default two per pool process;
+# the rest are turned away at once: waiting would block the event loop
+admission = AdmissionController(
+    int(os.getenv("PREDICT_MAX_IN_FLIGHT", "0")) or 2 * (SCORING_PROCESSES or os.cpu_count()),
+)
+
+# Default budget of a /predict request; "0" disables it
+REQUEST_DEADLINE_MS = float(os.getenv("REQUEST_DEADLINE_MS", "10000")) or None
+
+ml_model_version = (
+    CompiledForest.load(MODEL_ARRAYS_DIR).model_version
+    if MODEL_ARRAYS_DIR else load_model_version()
+)
+
+explanation_cache = ExplanationCache(
+    cache_dir=os.getenv("EXPLANATION_CACHE_DIR", "static/explanation_cache"),
+    max_bytes=int(os.getenv("EXPLANATION_CACHE_MAX_BYTES", "10000000")),
+    ttl=URL_EXPIRES_IN - 60,
+)
+
+templates = Jinja2Templates(directory="templates")
+
+# Started by the lifespan handler, in the serving process
+process_pool = None
+
+def render_plots(model, features, method="exact"):
+    """
+    Render the plots in the process pool and upload them (job thread).
+    """
+    # Plots of the fast method are cached apart from the exact ones
+    version = ml_model_version if method == "exact" else f"{ml_model_version}-{method}"
+    key = ExplanationCache.make_key(features, version)
+    plot_urls = explanation_cache.get(key)
+    if plot_urls is None:
+        plots = process_pool.submit(scoring_pool.render_plots, features, method).result()
+        plot_urls = upload_plots(plots)
+        explanation_cache.set(key, plot_urls)
+    return plot_urls
+
+explanation_queue = ExplanationJobQueue(
+    render_plots,
+    job_dir=os.getenv("EXPLANATION_JOB_DIR", "static/jobs"),
+    max_workers=int(os.getenv("EXPLANATION_WORKERS", "2")),
+    max_pending=int(os.getenv("EXPLANATION_MAX_PENDING", "64")),
+    job_ttl=URL_EXPIRES_IN,
+)
+
+async def run_in_pool(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(process_pool, func, *args)
+
+def timed(endpoint):
+    """
+    Record the latency of a handler in request_seconds, like app.py does.
+    """
+    def decorate(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            start = time.perf_counter()
+            response = await handler(request)
+            metrics.observe("request_seconds", time.perf_counter() - start,
+                            endpoint=endpoint, status=str(response.status_code))
+            return response
+        return wrapper
+    return decorate
+
+def overloaded(body, status_code):
+    """
+    A 429 or 503 response telling the client when to retry.
+    """
+    return JSONResponse(body, status_code=status_code,
+                        headers={"Retry-After": str(admission.retry_after())})
+
+@timed("/health")
+async def health_check(request: Request):
+    """
+    Health check endpoint (liveness); never waits on the process pool.
+    """
+    return JSONResponse({"status": "healthy"}, status_code=200)
+
+@timed("/ready")
+async def readiness_check(request: Request):
+    """
+    Readiness probe: 503 until the process pool is up and while every
+    /predict slot is taken, like /ready in app.py.
+    """
+    state = {"model_version": ml_model_version, **admission.stats()}
+    if process_pool is None or admission.saturated():
+        return overloaded({"status": "busy", **state}, 503)
+    return JSONResponse({"status": "ready", **state}, status_code=200)
+
+@timed("/predict")
+async def predict(request: Request):
+    """
+    Predict fraud and provide SHAP explanations.
+
+    Same query parameters and responses as /predict in app.py, except
+    that requests over PREDICT_MAX_IN_FLIGHT are turned away without
+    waiting for a slot.
+    """
+    start = time.monotonic()
+    explanation = request.query_params.get("explanation", "plots")
+    if explanation not in ("plots", "json", "plot_data"):
+        return JSONResponse({"error": f"Unknown explanation mode: {explanation}"},
+                            status_code=400)
+    method = request.query_params.get("explain", "exact")
+    if method not in EXPLAIN_METHODS:
+        return JSONResponse({"error": f"Unknown explain method: {method}"},
+                            status_code=400)
+    # Like Flask's request.args.get(type=int): invalid values fall back to 3
+    try:
+        top_k = int(request.query_params["top_k"])
+    except (KeyError, ValueError):
+        top_k = 3
+    if top_k < 0:
+        return JSONResponse({"error": f"top_k must not be negative: {top_k}"},
+                            status_code=400)
+    try:
+        deadline_ms = float(request.query_params["deadline_ms"])
+    except (KeyError, ValueError):
+        deadline_ms = REQUEST_DEADLINE_MS
+    # time.monotonic() is the same clock in the pool processes
+    deadline = request_deadline(deadline_ms, start)
+
+    if not admission.try_acquire():
+        return overloaded({"error": "Too many requests in flight"}, 429)
+    try:
+        return await run_prediction(request, explanation, method, top_k, deadline)
+    finally:
+        admission.release(time.monotonic() - start)
+
+async def run_prediction(request, explanation, method, top_k, deadline):
+    """
+    Score the request body and explain the result (see predict()).
+    """
+    try:
+        try:
+            input_data = await request.json()
+        except ValueError:
+            input_data = None
+        if not input_data:
+            return JSONResponse({"error": "Invalid input data"}, status_code=400)
+
+        # Steps 1 to 3: Preprocess, engineer the features and predict
+        features, prediction = await run_in_pool(scoring_pool.score, input_data)
+        result = {"prediction": prediction}
+        # A few microseconds under a file lock: not worth a pool round trip
+        velocity = scoring_service.velocity_features(input_data)
+        if velocity is not None:
+            result["velocity"] = velocity
+
+        # Step 4: Generate SHAP explanations, if there is budget left
+        if method == "none":
+            return JSONResponse(result, status_code=200)
+        skipped = {**result, "explanation_skipped": "Deadline exceeded"}
+        if deadline_expired(deadline):
+            return JSONResponse(skipped, status_code=200)
+        if explanation == "json":
+            explanations = await run_in_pool(scoring_pool.explain_json, features, top_k,
+                                             method, deadline)
+            if explanations is None:
+                return JSONResponse(skipped, status_code=200)
+            return JSONResponse({**result, "explanations": explanations},
+                                status_code=200)
+        if explanation == "plot_data":
+            plot_data = await run_in_pool(scoring_pool.plot_data, features, method, deadline)
+            if plot_data is None:
+                return JSONResponse(skipped, status_code=200)
+            if request.query_params.get("format") == "html":
+                return templates.TemplateResponse(request, "plots.html",
+                                                  {"plot_data": plot_data})
+            return JSONResponse({**result, "plot_data": plot_data},
+                                status_code=200)
+
+        try:
+            job_id = explanation_queue.submit(None, features, method=method)
+        except QueueFullError as e:
+            return JSONResponse({**result, "explanation_error": str(e)},
+                                status_code=200)
+
+        # Return the prediction in JSON and where to fetch the plots from
+        return JSONResponse({
+            **result,
+            "explanation_id": job_id,
+            "explanation_url": f"/explanations/{job_id}"
+        }, status_code=200)
+
+    except InvalidInputError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@timed("/explanations/<job_id>")
+async def explanation_status(request: Request):
+    """
+    Status of a background explanation job and, once done, its plot URLs.
+    """
+    try:
+        state = explanation_queue.status(request.path_params["job_id"])
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if state is None:
+        return JSONResponse({"error": "Unknown explanation ID"}, status_code=404)
+    return JSONResponse(state, status_code=200)
+
+async def prometheus_metrics(request: Request):
+    """
+    Latency histograms of this server and, with METRICS_DIR set, of its
+    pool processes, in Prometheus format.
+    """
+    return PlainTextResponse(metrics.render_prometheus(),
+                             media_type="text/plain; version=0.0.4")
+
+@asynccontextmanager
+async def lifespan(app):
+    global process_pool
+    # Snapshots of earlier runs would be merged into /metrics
+    MetricsRegistry.reset(metrics.metrics_dir)
+    process_pool, pool_pids = scoring_pool.create_pool(SCORING_PROCESSES, MODEL_PATH,
+                                                       MODEL_ARRAYS_DIR)
+    try:
+        yield
+    finally:
+        explanation_queue.shutdown(wait=False)
+        process_pool.shutdown(wait=True)
+        # Pool processes exit without running atexit handlers
+        if metrics.metrics_dir:
+            for pid in pool_pids:
+                MetricsRegistry.retire(metrics.metrics_dir, pid)
+
+app = Starlette(
+    routes=[
+        Route("/health", health_check, methods=["GET"]),
+        Route("/ready", readiness_check, methods=["GET"]),
+        Route("/predict", predict, methods=["POST"]),
+        Route("/explanations/{job_id}", explanation_status, methods=["GET"]),
+        Route("/metrics", prometheus_metrics, methods=["GET"]),
+    ],
+    lifespan=lifespan,
+)
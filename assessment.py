@@ -1,36 +1,159 @@
-import pandas as pd  # Step 1: Import necessary library
-
-# Step 2: Load Locust stats CSV file
-# This file contains data generated by Locust during the load test.
-# Replace 'locust_results_stats.csv' with the path to your file if it's in a different location.
-data = pd.read_csv("locust_results_stats.csv")  # put the correct file
-
-# Step 3: Display the first few rows of the data for verification
-# This helps confirm that the CSV file loaded correctly.
-print("First few rows of the dataset:")
-print(data.head())
-
-# Step 4: Calculate overall throughput
-# Throughput is the total number of successful requests handled per second.
-total_throughput = data["Requests/s"].sum()
-
-# Step 5: Identify the maximum and average response times
-# - Max Response Time: The longest time taken for a request to complete.
-# - Average Response Time: The average time taken for all requests.
-max_response_time = data["Max Response Time"].max()
-avg_response_time = data["Average Response Time"].mean()
-
-# Step 6: Calculate the failure rate
-# Failure rate is the percentage of requests that resulted in errors (e.g., HTTP 4xx/5xx).
-# Formula: (total failures / total requests) * 100
-total_requests = data["Request Count"].sum()
-total_failures = data["Failure Count"].sum()
-failure_rate = (total_failures / total_requests) * 100 if total_requests > 0 else 0
-
-# Step 7: Display the calculated metrics
-# Print the results in a readable format for easy interpretation.
-print("\nPerformance Metrics:")
-print(f"Total Throughput: {total_throughput:.2f} requests/sec")
-print(f"Max Response Time: {max_response_time} ms")
-print(f"Average Response Time: {avg_response_time:.2f} ms")
-print(f"Failure Rate: {failure_rate:.2f}%")
+"""
+SLO report of a Locust run.
+
+Reads the CSV files written by `locust --csv <prefix> --csv-full-history`:
+
+- <prefix>_stats.csv: per-endpoint percentiles, throughput and failures,
+  checked against the latency and error rate objectives;
+- <prefix>_stats_history.csv (optional): the time series used to find the
+  throughput knee, the load beyond which adding users no longer adds
+  throughput but only latency;
+- <prefix>_failures.csv (optional): the breakdown of errors by endpoint
+  and cause.
+
+Usage: python assessment.py --prefix locust_results --slo-p99-ms 500 --slo-error-rate 0.01
+"""
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+# Percentile columns reported per endpoint
+PERCENTILES = ["50%", "95%", "99%", "99.9%"]
+
+
+def load_csv(path):
+    return pd.read_csv(path) if os.path.exists(path) else None
+
+
+def endpoint_report(stats, slo_p99_ms, slo_error_rate):
+    """
+    Per-endpoint latency percentiles, throughput and SLO verdicts.
+
+    Args:
+        stats (pd.DataFrame): Contents of <prefix>_stats.csv.
+        slo_p99_ms (float): Objective for the 99th percentile, in ms.
+        slo_error_rate (float): Objective for the failure ratio.
+
+    Returns:
+        pd.DataFrame: One row per endpoint, plus the aggregated row.
+    """
+    report = pd.DataFrame({
+        "endpoint": (stats["Type"].fillna("") + " " + stats["Name"]).str.strip(),
+        "requests": stats["Request Count"],
+        "failures": stats["Failure Count"],
+        "req/s": stats["Requests/s"].round(2),
+    })
+    report["error rate"] = np.where(
+        report["requests"] > 0, report["failures"] / report["requests"].clip(lower=1), 0.0
+    )
+    for column in PERCENTILES:
+        if column in stats:
+            report[f"p{column.rstrip('%')} ms"] = stats[column]
+    report["max ms"] = stats["Max Response Time"].round(0)
+    # Locust writes N/A for endpoints without any completed request
+    p99 = pd.to_numeric(stats["99%"], errors="coerce")
+    report["SLO"] = np.where(
+        (p99 <= slo_p99_ms) & (report["error rate"] <= slo_error_rate), "pass", "FAIL"
+    )
+    return report
+
+
+def find_knee(history):
+    """
+    Locate the throughput knee in the stats history of a ramp-up.
+
+    Throughput is averaged per user count; the knee is the user count whose
+    point lies furthest above the straight line joining the first and last
+    points of the normalized throughput curve (the Kneedle heuristic).
+
+    Args:
+        history (pd.DataFrame): Contents of <prefix>_stats_history.csv.
+
+    Returns:
+        dict: Users, throughput and p95 at the knee, or None when the run
+              did not go through at least three user counts.
+    """
+    # Samples taken before the first response carry no throughput
+    rows = history[(history["Name"] == "Aggregated") & (history["Requests/s"] > 0)]
+    rows = rows.assign(**{"95%": pd.to_numeric(rows["95%"], errors="coerce")})
+    if rows.empty:
+        return None
+    steps = rows.groupby("User Count").agg(
+        throughput=("Requests/s", "mean"),
+        p95=("95%", "median"),
+        failures=("Failures/s", "mean"),
+    ).reset_index()
+    steps = steps[steps["User Count"] > 0]
+    if len(steps) < 3:
+        return None
+
+    users = steps["User Count"].to_numpy(dtype=float)
+    throughput = steps["throughput"].to_numpy(dtype=float)
+    x = (users - users.min()) / (users.max() - users.min())
+    spread = throughput.max() - throughput.min()
+    y = (throughput - throughput.min()) / spread if spread > 0 else np.zeros_like(x)
+    line = y[0] + (y[-1] - y[0]) * x
+    knee = int(np.argmax(y - line))
+    return {
+        "users": int(users[knee]),
+        "throughput": float(throughput[knee]),
+        "p95_ms": float(steps["p95"].iloc[knee]),
+        "peak_throughput": float(throughput.max()),
+        "steps": steps,
+    }
+
+
+def failure_report(failures):
+    """
+    Errors grouped by endpoint and cause, most frequent first.
+    """
+    if failures is None or failures.empty:
+        return None
+    report = failures.groupby(["Method", "Name", "Error"], as_index=False)["Occurrences"].sum()
+    report["share"] = (report["Occurrences"] / report["Occurrences"].sum()).round(3)
+    return report.sort_values("Occurrences", ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SLO report of a Locust run.")
+    parser.add_argument("--prefix", default="locust_results",
+                        help="Prefix passed to locust --csv")
+    parser.add_argument("--slo-p99-ms", type=float, default=500.0)
+    parser.add_argument("--slo-error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    stats = pd.read_csv(f"{args.prefix}_stats.csv")
+    history = load_csv(f"{args.prefix}_stats_history.csv")
+    failures = load_csv(f"{args.prefix}_failures.csv")
+
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_columns", 20)
+
+    print(f"SLO: p99 <= {args.slo_p99_ms:.0f} ms, error rate <= {args.slo_error_rate:.2%}\n")
+    report = endpoint_report(stats, args.slo_p99_ms, args.slo_error_rate)
+    print(report.to_string(index=False, formatters={"error rate": "{:.2%}".format}))
+
+    print("\nThroughput knee:")
+    knee = find_knee(history) if history is not None else None
+    if knee is None:
+        print("  not enough history; run locust with --csv-full-history and a ramp-up")
+    else:
+        print(knee["steps"].to_string(index=False))
+        print(f"  knee at {knee['users']} users: {knee['throughput']:.1f} req/s "
+              f"(peak {knee['peak_throughput']:.1f}), p95 {knee['p95_ms']:.0f} ms")
+
+    print("\nErrors:")
+    errors = failure_report(failures)
+    if errors is None:
+        print("  none recorded" if failures is not None else "  no failures file")
+    else:
+        print(errors.to_string(index=False))
+
+    failed = report[report["SLO"] == "FAIL"]["endpoint"].tolist()
+    print(f"\nSLO {'violated by: ' + ', '.join(failed) if failed else 'met by every endpoint'}")
+
+
+if __name__ == "__main__":
+    main()
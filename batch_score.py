@@ -0,0 +1,131 @@
+"""
+Offline batch scorer for back-fills.
+
+Scores a CSV shaped like complete_dataset.csv in fixed-size chunks across
+a process pool, with the same preprocessing and feature engineering code
+as the /predict endpoint. Only a bounded number of chunks is in flight at
+any time, so memory use does not grow with the size of the input. A chunk
+that fails is scored row by row, so a malformed row only gets a message
+in the error column instead of aborting the run.
+
+Usage:
+    python batch_score.py complete_dataset.csv scores.csv --chunk-size 10000 --workers 4
+"""
+
+import os
+import time
+import pickle
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+_model = None
+
+
+def _load_worker_model(model_path):
+    global _model
+    with open(model_path, "rb") as model_file:
+        _model = pickle.load(model_file)
+
+
+def _score(chunk):
+    from api.preprocessing_service import preprocess_data
+    from api.feature_engineering_service import perform_feature_engineering
+    from api.predictive_service import label_predictions
+
+    features = perform_feature_engineering(preprocess_data(chunk))
+    # One pass over the forest gives both the labels and the probabilities
+    proba = _model.predict_proba(features.values)
+    return pd.DataFrame({
+        "TransactionID": chunk["TransactionID"].values,
+        "prediction": label_predictions(_model.classes_.take(np.argmax(proba, axis=1))),
+        "fraud_probability": proba[:, 1],
+        "error": None,
+    })
+
+
+def score_chunk(chunk):
+    """
+    Score one chunk of raw transactions in a worker process.
+
+    Args:
+        chunk (pd.DataFrame): Raw records with the /predict input columns.
+
+    Returns:
+        pd.DataFrame: TransactionID, predicted label, fraud probability and
+                      the error of rows that could not be scored.
+    """
+    try:
+        return _score(chunk)
+    except Exception:
+        # Score the chunk row by row so one bad record fails alone
+        results = []
+        for i in range(len(chunk)):
+            row = chunk.iloc[[i]]
+            try:
+                results.append(_score(row))
+            except Exception as e:
+                results.append(pd.DataFrame({
+                    "TransactionID": row["TransactionID"].values,
+                    "prediction": None,
+                    "fraud_probability": np.nan,
+                    "error": str(e),
+                }))
+        return pd.concat(results, ignore_index=True)
+
+
+def run(input_path, output_path, model_path="models/ml_model.pkl",
+        chunk_size=10_000, workers=None):
+    """
+    Score every row of input_path and write the results to output_path.
+
+    Returns:
+        tuple: (rows scored, elapsed seconds)
+    """
+    workers = workers or os.cpu_count()
+    max_in_flight = 2 * workers
+    rows = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_worker_model,
+                             initargs=(model_path,)) as pool:
+        in_flight = deque()
+        header = True
+
+        def write_oldest():
+            nonlocal rows, header
+            result = in_flight.popleft().result()
+            result.to_csv(output_path, mode="w" if header else "a", header=header, index=False)
+            header = False
+            rows += len(result)
+            elapsed = time.perf_counter() - start
+            print(f"{rows} rows scored, {rows / elapsed:,.0f} rows/s", flush=True)
+
+        for chunk in pd.read_csv(input_path, chunksize=chunk_size):
+            in_flight.append(pool.submit(score_chunk, chunk))
+            # Keep the pipeline full but bounded, and write results in order
+            if len(in_flight) >= max_in_flight:
+                write_oldest()
+        while in_flight:
+            write_oldest()
+
+    return rows, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a transactions CSV in chunks.")
+    parser.add_argument("input", help="CSV shaped like complete_dataset.csv")
+    parser.add_argument("output", help="Where to write the scores")
+    parser.add_argument("--model", default="models/ml_model.pkl")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    rows, elapsed = run(args.input, args.output, args.model, args.chunk_size, args.workers)
+    print(f"Scored {rows} rows in {elapsed:.2f} s ({rows / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+/health and /predict latency under overload, with and without admission control.
+
+gunicorn serves with 4 threads per worker while more /predict clients
+than it can keep up with ask for exact SHAP values, and a prober calls
+/health every 50 ms. Without a limit every thread can be taken by
+/predict and the probes queue behind them; with PREDICT_MAX_IN_FLIGHT
+below the thread count the excess /predict calls are answered 429 at
+once and /health keeps a thread. Reports latency percentiles and the
+status codes per endpoint for each limit.
+
+Usage: python -m benchmarks.admission --clients 16 --duration 30
+"""
+
+import os
+import argparse
+import tempfile
+from collections import Counter
+import numpy as np
+from benchmarks.tail_latency import run_load, start_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--limits", type=int, nargs="+", default=[1000, 2],
+                        help="PREDICT_MAX_IN_FLIGHT values; 1000 means no limit")
+    parser.add_argument("--port", type=int, default=8125)
+    args = parser.parse_args()
+
+    print(f"{args.clients} /predict clients (json, {args.batch_size} records), "
+          f"/health every 50 ms, {args.workers} workers x 4 threads, {args.duration:.0f} s")
+    print(f"{'limit':>6} {'endpoint':>9} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8}  statuses")
+    for limit in args.limits:
+        os.environ["PREDICT_MAX_IN_FLIGHT"] = str(limit)
+        with tempfile.TemporaryDirectory() as work_dir:
+            server = start_server("flask", args.port, args.workers, work_dir)
+            try:
+                results = run_load(args.port, args.clients, args.duration, "json",
+                                   args.batch_size)
+            finally:
+                server.terminate()
+                server.wait()
+        for endpoint, (latencies, errors) in results.items():
+            ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+            p50, p99 = np.percentile(ms, [50, 99])
+            statuses = Counter(errors)
+            statuses["ok"] = len(latencies) - len(errors)
+            print(f"{limit:>6} {endpoint:>9} {len(latencies):>9} {p50:>8.1f} {p99:>8.1f} "
+                  f"{ms.max():>8.1f}  {dict(statuses)}")
+
+
+if __name__ == "__main__":
+    main()
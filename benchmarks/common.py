@@ -0,0 +1,57 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Run the benchmarks from the repository root, e.g.
+`python -m benchmarks.fast_path`.
+"""
+
+import time
+import pandas as pd
+
+DATASET_PATH = "complete_dataset.csv"
+
+# Fields a /predict client sends for each transaction
+REQUEST_FIELDS = [
+    "TransactionID", "Timestamp", "MerchantID", "Amount", "CustomerID",
+    "TransactionAmount", "AnomalyScore", "Category", "CustomerAge",
+    "AccountBalance", "SuspiciousFlag", "LastLogin"
+]
+
+
+def load_records(n=None, path=DATASET_PATH):
+    """
+    Load transactions from the dataset as /predict request records.
+
+    Args:
+        n (int): Number of records to load (all when None).
+        path (str): CSV shaped like complete_dataset.csv.
+
+    Returns:
+        list[dict]: JSON-compatible request records.
+    """
+    df = pd.read_csv(path, nrows=n)[REQUEST_FIELDS]
+    for col in ("TransactionID", "MerchantID", "CustomerID"):
+        df[col] = df[col].astype(str)
+    return df.to_dict(orient="records")
+
+
+def time_call(func, *args, repeat=50, **kwargs):
+    """
+    Time a call and return its median duration in milliseconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        durations.append((time.perf_counter() - start) * 1000)
+    durations.sort()
+    return durations[len(durations) // 2]
+
+
+def batches(records, batch_size):
+    """
+    Cycle through records in slices of batch_size.
+    """
+    while True:
+        for start in range(0, len(records) - batch_size + 1, batch_size):
+            yield records[start:start + batch_size]
@@ -0,0 +1,129 @@
+"""
+Compare the chunked SHAP job with one explainer call over the dataset.
+
+The dataset is repeated up to --rows transactions. The baseline is what
+models/033_explainability.py does for its 100 rows, applied to all of
+them: one TreeExplainer.shap_values call in one process. The job of
+models/explain.py runs with each --jobs count; every run reports its
+duration and peak memory, and its SHAP matrix and importance must match
+the baseline's. The resume path is checked by killing a run part way
+and restarting it.
+
+Usage: python -m benchmarks.explain --rows 20000 --jobs 1 2 4
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import signal
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+EXPLAIN_SCRIPT = "models/explain.py"
+MODEL_PATH = "models/ml_model.pkl"
+
+
+def run_baseline(dataset):
+    import shap
+    from models.train import engineer_features, load_dataset, peak_memory_mb
+
+    start = time.perf_counter()
+    X, _, _ = engineer_features(load_dataset(dataset))
+    with open(MODEL_PATH, "rb") as model_file:
+        explainer = shap.TreeExplainer(pickle.load(model_file))
+    shap_values = explainer.shap_values(X)[:, :, 1]
+    return shap_values, {"seconds": time.perf_counter() - start,
+                         "peak_memory_mb": peak_memory_mb()}
+
+
+def child(args):
+    if args.run == "baseline":
+        shap_values, report = run_baseline(args.dataset)
+        np.save(os.path.join(args.output_dir, "baseline.npy"), shap_values)
+    else:
+        from models.explain import explain
+        report = explain(args.dataset, MODEL_PATH, args.work_dir, args.output_dir,
+                         args.jobs[0], args.chunk_size, log=lambda message: None)
+    print(json.dumps(report), flush=True)
+
+
+def run(kind, dataset, work_dir, output_dir, jobs, chunk_size):
+    command = [sys.executable, "-m", "benchmarks.explain", "--run", kind, "--dataset", dataset,
+               "--work-dir", work_dir, "--output-dir", output_dir, "--jobs", str(jobs),
+               "--chunk-size", str(chunk_size)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def check_resume(dataset, work_dir, output_dir, jobs, chunk_size, after_seconds):
+    command = [sys.executable, EXPLAIN_SCRIPT, "--dataset", dataset, "--work-dir", work_dir,
+               "--output-dir", output_dir, "--jobs", str(jobs), "--chunk-size", str(chunk_size)]
+    proc = subprocess.Popen(command, stdout=subprocess.DEVNULL, start_new_session=True)
+    time.sleep(after_seconds)
+    # Kill the whole run, pool processes included, as a crash would
+    os.killpg(proc.pid, signal.SIGKILL)
+    proc.wait()
+    return run("explain", dataset, work_dir, output_dir, jobs, chunk_size)
+
+
+def shap_matrix(report):
+    return np.load(os.path.join(report["run_dir"], "shap_values.npy"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dataset", default="complete_dataset.csv")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunk-size", type=int, default=2_000)
+    parser.add_argument("--interrupt-after", type=float, default=8.0,
+                        help="Seconds before the resume check kills the run")
+    parser.add_argument("--run", choices=["baseline", "explain"], help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--output-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = pd.read_csv(args.dataset)
+        repeats = -(-args.rows // len(dataset))
+        dataset_path = os.path.join(tmp, "dataset.csv")
+        pd.concat([dataset] * repeats, ignore_index=True)[:args.rows].to_csv(dataset_path,
+                                                                             index=False)
+
+        baseline = run("baseline", dataset_path, tmp, tmp, 1, args.chunk_size)
+        expected = np.load(os.path.join(tmp, "baseline.npy"))
+        expected_importance = np.abs(expected).mean(axis=0)
+
+        print(f"{'run':>22} {'seconds':>8} {'peak MB':>8}")
+        print(f"{'one shap_values call':>22} {baseline['seconds']:>8.1f} "
+              f"{baseline['peak_memory_mb']:>8.0f}")
+        for jobs in args.jobs:
+            directory = os.path.join(tmp, f"jobs-{jobs}")
+            report = run("explain", dataset_path, directory, directory, jobs, args.chunk_size)
+            importance = [values["mean_abs_shap"] for values in report["importance"].values()]
+            if not np.array_equal(shap_matrix(report), expected) or not np.allclose(
+                    importance, expected_importance, rtol=1e-9, atol=0):
+                raise SystemExit(f"SHAP values of the job with {jobs} workers differ")
+            print(f"{f'explain.py, {jobs} workers':>22} {report['seconds']:>8.1f} "
+                  f"{report['peak_memory_mb']:>8.0f}")
+        print(f"Every run matches the single call on {args.rows} rows "
+              f"({report['chunks']} chunks of {args.chunk_size})")
+
+        directory = os.path.join(tmp, "resume")
+        resumed = check_resume(dataset_path, directory, directory, args.jobs[0],
+                               args.chunk_size, args.interrupt_after)
+        same = np.array_equal(shap_matrix(resumed), expected)
+        print(f"Resumed run reused {resumed['reused_chunks']} of {resumed['chunks']} chunks "
+              f"and {'matches' if same else 'DIFFERS FROM'} the single call")
+
+
+if __name__ == "__main__":
+    main()
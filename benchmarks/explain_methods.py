@@ -0,0 +1,98 @@
+"""
+Compare the fast (Saabas) explanations with exact TreeSHAP.
+
+Both methods explain every transaction of complete_dataset.csv. The
+report first checks that each is additive (base value plus contributions
+equals the predicted fraud probability), then measures how closely the
+fast contributions agree with the exact ones: correlation over all
+values, per-record rank correlation, top-1 and top-3 agreement, and the
+rank of the features by global importance. Finally both are timed across
+batch sizes, with the deadline the fast method would fit in.
+
+Usage: python -m benchmarks.explain_methods
+"""
+
+import pickle
+import numpy as np
+from api.columnar_service import compile_features
+from api.explanation_service import FEATURE_NAMES, attributions, exact_cost, register_explainer
+from benchmarks.common import load_records, time_call
+
+BATCH_SIZES = [1, 10, 100, 1_000]
+MODEL_PATH = "models/ml_model.pkl"
+
+
+def ranks(values):
+    # Rank of every value of each row, 0 for the smallest
+    return np.argsort(np.argsort(values, axis=-1, kind="stable"), axis=-1, kind="stable")
+
+
+def rank_correlation(a, b):
+    """
+    Spearman correlation of the rows of a and b, one value per row.
+    """
+    a, b = ranks(a).astype(np.float64), ranks(b).astype(np.float64)
+    a -= a.mean(axis=-1, keepdims=True)
+    b -= b.mean(axis=-1, keepdims=True)
+    return (a * b).sum(axis=-1) / np.sqrt((a * a).sum(axis=-1) * (b * b).sum(axis=-1))
+
+
+def top_k(values, k):
+    return np.argsort(-np.abs(values), axis=1, kind="stable")[:, :k]
+
+
+def agreement(exact, fast):
+    top_exact, top_fast = top_k(exact, 3), top_k(fast, 3)
+    overlap = [len(set(e) & set(f)) / 3 for e, f in zip(top_exact, top_fast)]
+    importance_exact = np.abs(exact).mean(axis=0)
+    importance_fast = np.abs(fast).mean(axis=0)
+    return {
+        "Pearson correlation of all values": np.corrcoef(exact.ravel(), fast.ravel())[0, 1],
+        "median per-record Spearman correlation": np.median(
+            rank_correlation(np.abs(exact), np.abs(fast))),
+        "same top-1 feature": (top_exact[:, 0] == top_fast[:, 0]).mean(),
+        "top-3 overlap": np.mean(overlap),
+        "same sign (|exact| > 0.01)": (np.sign(exact) == np.sign(fast))[np.abs(exact) > 0.01].mean(),
+        "mean |fast - exact| / mean |exact|": np.abs(fast - exact).mean() / np.abs(exact).mean(),
+        "Spearman correlation of global importance": rank_correlation(importance_exact,
+                                                                      importance_fast),
+    }, importance_exact, importance_fast
+
+
+def main():
+    with open(MODEL_PATH, "rb") as model_file:
+        model = pickle.load(model_file)
+    register_explainer(model)
+    features = compile_features(load_records()).astype(np.float64)
+    fraud_proba = model.predict_proba(features)[:, 1]
+
+    results = {}
+    for method in ("exact", "fast"):
+        base_value, values = attributions(model, features, method)
+        error = np.abs(base_value + values.sum(axis=1) - fraud_proba).max()
+        if error > 1e-6:
+            raise SystemExit(f"{method} contributions do not add up to the prediction ({error})")
+        results[method] = values
+    print(f"Both methods add up to predict_proba on all {len(features)} records")
+
+    metrics, importance_exact, importance_fast = agreement(results["exact"], results["fast"])
+    print("\nAgreement of fast with exact")
+    for name, value in metrics.items():
+        print(f"{name:>45}: {value:.3f}")
+
+    print(f"\n{'feature':>18} {'exact mean |v|':>15} {'fast mean |v|':>14}")
+    for i in np.argsort(-importance_exact, kind="stable"):
+        print(f"{FEATURE_NAMES[i]:>18} {importance_exact[i]:>15.5f} {importance_fast[i]:>14.5f}")
+
+    print(f"\n{'batch':>6} {'exact ms':>9} {'fast ms':>8} {'speedup':>8} {'exact estimate ms':>18}")
+    for batch_size in BATCH_SIZES:
+        X = features[:batch_size]
+        repeat = 20 if batch_size <= 100 else 5
+        exact_ms = time_call(attributions, model, X, "exact", repeat=repeat)
+        fast_ms = time_call(attributions, model, X, "fast", repeat=repeat)
+        print(f"{batch_size:>6} {exact_ms:>9.3f} {fast_ms:>8.3f} {exact_ms / fast_ms:>7.1f}x "
+              f"{exact_cost.estimate(batch_size) * 1000:>18.3f}")
+
+
+if __name__ == "__main__":
+    main()
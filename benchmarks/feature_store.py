@@ -0,0 +1,167 @@
+"""
+Lookup latency and memory of the online feature store.
+
+First checks the ID index against a dict on sparse random IDs, and that
+records stripped of their customer attributes score the same features
+once enriched from a snapshot of the raw CSVs. Then, on a synthetic
+store of --entities customers:
+
+- times lookups of one ID, and of batches, per key;
+- reports the snapshot size per million entities;
+- starts --workers processes that map the snapshot and touch every page,
+  like gunicorn workers, and reports the RSS the store adds to each and
+  the PSS it adds over all of them, where shared pages are counted once.
+
+Linux only (reads /proc). Usage: python -m benchmarks.feature_store --entities 1000000
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from api.columnar_service import compile_features
+from api.feature_store import ENRICHED_FIELDS, FeatureStore, build_index, lookup_rows
+from benchmarks.common import load_records
+from benchmarks.model_loading import pss_kb
+
+BATCH_SIZES = [1, 10, 100, 10_000]
+
+CHILD = r"""
+import sys, numpy as np
+
+def rss_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+def pss_kb():
+    with open("/proc/self/smaps_rollup") as rollup:
+        for line in rollup:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+
+from api.feature_store import FeatureStore
+before, pss_before = rss_kb(), pss_kb()
+store = FeatureStore(sys.argv[1])
+table = store.tables["customer"]
+# Touch every page, as a long-running worker eventually does
+touched = int(table.keys.sum()) + int(table.rows.sum())
+touched += sum(float(np.asarray(column).view(np.uint8).sum()) for column in table.columns.values())
+print(rss_kb() - before, pss_before, flush=True)
+sys.stdin.read()
+"""
+
+
+def synthetic_customers(n, rng):
+    ids = rng.choice(np.int64(1) << 40, size=n, replace=False)
+    return ids, {
+        "CustomerAge": rng.integers(18, 90, n).astype(np.int16),
+        "AccountBalance": rng.uniform(0, 20_000, n),
+        "LastLogin": (np.datetime64("2022-01-01") + rng.integers(0, 730, n)).astype("datetime64[D]"),
+        "SuspiciousFlag": rng.integers(0, 2, n).astype(np.int8),
+    }
+
+
+def check_index(rng):
+    ids = rng.choice(np.int64(1) << 62, size=200_000, replace=False) - (np.int64(1) << 61)
+    keys, rows, bits = build_index(ids)
+    expected = {int(key): row for row, key in enumerate(ids)}
+    probes = np.concatenate([ids, rng.integers(-(1 << 61), 1 << 61, 200_000)])
+    found = lookup_rows(keys, rows, bits, probes)
+    for probe, row in zip(probes.tolist(), found.tolist()):
+        if expected.get(probe, -1) != row:
+            raise SystemExit(f"Index lookup of {probe} returned {row}")
+    print(f"Index lookups match a dict on {len(probes)} IDs")
+
+
+def check_enrichment(root):
+    from feature_engineering.build_feature_store import load_entities
+    FeatureStore.publish(root, "raw", load_entities())
+    store = FeatureStore(root)
+    records = load_records(2_000)
+    stripped = [
+        {field: value for field, value in record.items() if field not in ENRICHED_FIELDS}
+        for record in records
+    ]
+    expected = compile_features(records)
+    enriched = compile_features(store.enrich(stripped))
+    if enriched is None or not np.array_equal(expected, enriched):
+        raise SystemExit("Enriched records do not produce the same features")
+    print(f"Enriched features match the full records on {len(records)} transactions")
+
+
+def time_lookups(store, ids, rng):
+    columns = list(store.tables["customer"].columns)
+    print(f"{'batch':>6} {'us/call':>9} {'ns/key':>8}")
+    for batch_size in BATCH_SIZES:
+        repeat = max(20, 20_000 // batch_size)
+        batches = [rng.choice(ids, batch_size) for _ in range(repeat)]
+        start = time.perf_counter()
+        for batch in batches:
+            store.lookup("customer", batch, columns)
+        elapsed = (time.perf_counter() - start) / repeat
+        print(f"{batch_size:>6} {elapsed * 1e6:>9.1f} {elapsed / batch_size * 1e9:>8.0f}")
+
+    record = {"CustomerID": str(ids[0]), "Amount": 10.0}
+    repeat = 20_000
+    start = time.perf_counter()
+    for _ in range(repeat):
+        store.enrich(record)
+    print(f"enrich() of one record: {(time.perf_counter() - start) / repeat * 1e6:.1f} us")
+
+
+def snapshot_bytes(root, version):
+    snapshot_dir = os.path.join(root, "snapshots", version)
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(snapshot_dir) for name in names
+    )
+
+
+def run_workers(root, workers):
+    procs = [
+        subprocess.Popen([sys.executable, "-c", CHILD, root],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    reports = [proc.stdout.readline().split() for proc in procs]
+    rss = [int(report[0]) for report in reports]
+    # All workers are alive and holding the mapped snapshot at this point
+    total_pss = sum(pss_kb(proc.pid) - int(report[1]) for proc, report in zip(procs, reports))
+    for proc in procs:
+        proc.communicate("")
+    return rss, total_pss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entities", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    check_index(rng)
+    with tempfile.TemporaryDirectory() as root:
+        check_enrichment(os.path.join(root, "raw"))
+
+        start = time.perf_counter()
+        ids, columns = synthetic_customers(args.entities, rng)
+        FeatureStore.publish(root, "synthetic", {"customer": (ids, columns)})
+        print(f"Published {args.entities} customers in {time.perf_counter() - start:.2f} s")
+
+        store = FeatureStore(root)
+        time_lookups(store, ids, rng)
+
+        per_million = snapshot_bytes(root, "synthetic") / args.entities * 1e6 / 2**20
+        print(f"Snapshot size: {per_million:.1f} MB per million entities")
+        rss, total_pss = run_workers(root, args.workers)
+        print(f"Store RSS per worker: {np.mean(rss) / 1024:.1f} MB, "
+              f"store PSS over {args.workers} workers: {total_pss / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Compare the compiled forest with scikit-learn's RandomForestClassifier.
+
+First checks that predict and predict_proba agree exactly on the whole
+dataset and on perturbed copies of it, then times both across batch sizes.
+
+Usage: python -m benchmarks.forest_engine
+"""
+
+import pickle
+import numpy as np
+from api.columnar_service import compile_features
+from api.forest_engine import CompiledForest
+from benchmarks.common import load_records, time_call
+
+BATCH_SIZES = [1, 10, 100, 1_000, 10_000]
+MODEL_PATH = "models/ml_model.pkl"
+
+
+def sample_features(features, n_rows, rng):
+    """
+    Draw rows from the dataset and jitter the continuous columns.
+    """
+    rows = features[rng.integers(0, len(features), n_rows)].copy()
+    for col in (0, 1, 2, 5):
+        rows[:, col] *= rng.uniform(0.5, 1.5, n_rows).astype(np.float32)
+    return rows
+
+
+def main():
+    with open(MODEL_PATH, "rb") as model_file:
+        model = pickle.load(model_file)
+    forest = CompiledForest.from_sklearn(model)
+
+    rng = np.random.default_rng(42)
+    features = compile_features(load_records())
+
+    # Accuracy equivalence
+    checks = [features] + [sample_features(features, 10_000, rng) for _ in range(3)]
+    for X in checks:
+        if not np.array_equal(model.predict_proba(X), forest.predict_proba(X)):
+            raise SystemExit("predict_proba differs from scikit-learn")
+        if not np.array_equal(model.predict(X), forest.predict(X)):
+            raise SystemExit("predict differs from scikit-learn")
+    print(f"predict and predict_proba match on {sum(len(X) for X in checks)} rows")
+
+    print(f"{'batch':>6} {'sklearn ms':>11} {'compiled ms':>12} {'speedup':>8}")
+    for batch_size in BATCH_SIZES:
+        X = sample_features(features, batch_size, rng)
+        repeat = 50 if batch_size <= 1_000 else 10
+        sklearn_ms = time_call(model.predict, X, repeat=repeat)
+        compiled_ms = time_call(forest.predict, X, repeat=repeat)
+        print(f"{batch_size:>6} {sklearn_ms:>11.3f} {compiled_ms:>12.3f} "
+              f"{sklearn_ms / compiled_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
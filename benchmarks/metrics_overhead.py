@@ -0,0 +1,67 @@
+"""
+Overhead of the latency instrumentation.
+
+Measures the cost of one histogram observation and of one timer block,
+with and without the periodic snapshot writes, and checks the cost a
+/predict request pays (about 10 observations) against a budget. The
+default budget, 100 us, is 1% of a 10 ms single-record request.
+
+Usage: python -m benchmarks.metrics_overhead --budget-us 100
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+from api.metrics import MetricsRegistry
+
+# Observations recorded by one /predict call (stages, batch size, request)
+OBSERVATIONS_PER_REQUEST = 10
+
+
+def per_call_us(func, n=200_000):
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the metrics overhead.")
+    parser.add_argument("--budget-us", type=float, default=100.0,
+                        help="Allowed instrumentation cost per request, in microseconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as metrics_dir:
+        registries = {
+            "in-memory": MetricsRegistry(),
+            "with snapshots": MetricsRegistry(metrics_dir=metrics_dir, flush_interval=1.0),
+        }
+        worst = 0.0
+        for label, registry in registries.items():
+            def observe():
+                registry.observe("predict_stage_seconds", 0.003, stage="predict")
+
+            def timed():
+                with registry.timer("predict_stage_seconds", stage="predict"):
+                    pass
+
+            observe_us = per_call_us(observe)
+            timer_us = per_call_us(timed)
+            request_us = OBSERVATIONS_PER_REQUEST * timer_us
+            worst = max(worst, request_us)
+            print(f"{label:>15}: observe {observe_us:.2f} us, timer {timer_us:.2f} us, "
+                  f"per request {request_us:.1f} us")
+
+        render_start = time.perf_counter()
+        registries["with snapshots"].render_prometheus()
+        print(f"/metrics render: {(time.perf_counter() - render_start) * 1000:.2f} ms")
+
+    if worst > args.budget_us:
+        sys.exit(f"Instrumentation costs {worst:.1f} us per request, "
+                 f"over the {args.budget_us:.1f} us budget")
+    print(f"Within the {args.budget_us:.1f} us per request budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Startup time and memory of the pickle and memory-mapped model paths.
+
+Starts several worker processes per path, like gunicorn workers, each of
+which imports what it needs, loads the model and scores one batch. For
+every path it reports the time to load, the resident memory attributable
+to the model (RSS after loading minus RSS after the imports) and the
+proportional set size (PSS) summed over all workers, where pages shared
+between workers are only counted once.
+
+Linux only (reads /proc). Usage: python -m benchmarks.model_loading --workers 3
+"""
+
+import sys
+import json
+import pickle
+import argparse
+import tempfile
+import subprocess
+from api.forest_engine import CompiledForest
+
+MODEL_PATH = "models/ml_model.pkl"
+
+CHILD = r"""
+import sys, json, time, numpy as np
+
+def rss_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+mode, path = sys.argv[1], sys.argv[2]
+start = time.perf_counter()
+if mode == "pickle":
+    import pickle, sklearn.ensemble
+    imported = time.perf_counter()
+    before = rss_kb()
+    with open(path, "rb") as model_file:
+        model = pickle.load(model_file)
+else:
+    from api.forest_engine import CompiledForest
+    imported = time.perf_counter()
+    before = rss_kb()
+    model = CompiledForest.load(path)
+loaded = time.perf_counter()
+model.predict(np.zeros((8, model.n_features_in_), dtype=np.float32))
+print(json.dumps({
+    "import_s": imported - start,
+    "load_s": loaded - imported,
+    "model_rss_kb": rss_kb() - before,
+}), flush=True)
+sys.stdin.read()
+"""
+
+
+def pss_kb(pid):
+    with open(f"/proc/{pid}/smaps_rollup") as rollup:
+        for line in rollup:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+
+
+def run_workers(mode, path, workers):
+    procs = [
+        subprocess.Popen([sys.executable, "-c", CHILD, mode, path],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    reports = [json.loads(proc.stdout.readline()) for proc in procs]
+    # All workers are alive and holding the model at this point
+    total_pss = sum(pss_kb(proc.pid) for proc in procs)
+    for proc in procs:
+        proc.communicate("")
+    return reports, total_pss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(MODEL_PATH, "rb") as model_file:
+        forest = CompiledForest.from_sklearn(pickle.load(model_file))
+
+    with tempfile.TemporaryDirectory() as arrays_dir:
+        forest.save(arrays_dir)
+        paths = {"pickle": MODEL_PATH, "mmap": arrays_dir}
+
+        print(f"{'path':>7} {'import s':>9} {'load ms':>8} {'model RSS KB':>13} "
+              f"{'PSS of ' + str(args.workers) + ' workers MB':>22}")
+        for mode, path in paths.items():
+            reports, total_pss = run_workers(mode, path, args.workers)
+            mean = {key: sum(r[key] for r in reports) / len(reports) for key in reports[0]}
+            print(f"{mode:>7} {mean['import_s']:>9.2f} {mean['load_s'] * 1000:>8.2f} "
+                  f"{mean['model_rss_kb']:>13.0f} {total_pss / 1024:>22.1f}")
+
+
+if __name__ == "__main__":
+    main()
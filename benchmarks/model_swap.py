@@ -0,0 +1,212 @@
+"""
+Warm-up time and tail latency of hot-swapping the served model.
+
+First, in fresh processes, a model version is loaded from the registry
+with and without warm-up, and the first requests it serves (scoring and
+exact SHAP, single records and a batch) are timed: the warm-up moves
+that first-call cost before the swap.
+
+Then gunicorn serves a registry of two versions of the model (the same
+forest pickled twice, so the responses stay comparable) while clients
+call /predict. Every --swap-every seconds /admin/reload switches to the
+other version. Latencies are split into the swap windows (from the
+trigger until all workers serve the new version) and the steady state in
+between, and reported with warm-up on and off.
+
+Usage: python -m benchmarks.model_swap --clients 4 --duration 40
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import numpy as np
+from api.model_registry import ModelRegistry, PIPELINE_FILE
+from benchmarks.common import load_records
+from benchmarks.tail_latency import start_server
+
+MODEL_PATH = "models/ml_model.pkl"
+PIPELINE_PATH = f"models/{PIPELINE_FILE}"
+ADMIN_TOKEN = "benchmark"
+
+FIRST_CALLS = r"""
+import sys, json, time
+from api.model_registry import ModelRegistry, load_warm_up_records
+from api.explanation_service import generate_shap_json
+from api.scoring_service import score_records
+from benchmarks.common import load_records
+
+registry = ModelRegistry(sys.argv[1], warm_up_records=load_warm_up_records(n=int(sys.argv[2])))
+bundle = registry.bundle
+records = load_records(100)
+timings = {"load_s": bundle.load_seconds, "warm_up_s": bundle.warm_up_seconds}
+for name, batch in (("1 record", records[:1]), ("100 records", records)):
+    start = time.perf_counter()
+    features, _ = score_records(bundle.batch_model, bundle.compiled_forest, batch, bundle.pipeline)
+    generate_shap_json(bundle.model, features)
+    timings[name] = time.perf_counter() - start
+print(json.dumps(timings))
+"""
+
+
+def publish_versions(registry, work_dir):
+    """
+    Publish the model twice under different versions and return both.
+    """
+    with open(MODEL_PATH, "rb") as model_file:
+        payload = model_file.read()
+    model = pickle.loads(payload)
+    # Another pickle protocol gives other bytes, hence another version
+    for protocol in (4, 5):
+        other = pickle.dumps(model, protocol=protocol)
+        if other != payload:
+            break
+    other_path = os.path.join(work_dir, "ml_model_copy.pkl")
+    with open(other_path, "wb") as other_file:
+        other_file.write(other)
+    second = ModelRegistry.publish(registry, other_path, PIPELINE_PATH)
+    first = ModelRegistry.publish(registry, MODEL_PATH, PIPELINE_PATH)
+    return first, second
+
+
+def first_calls(registry, warm_up_rows):
+    env = dict(os.environ, MODEL_REGISTRY_DIR=registry)
+    output = subprocess.run([sys.executable, "-c", FIRST_CALLS, registry, str(warm_up_rows)],
+                            env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def request(port, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def client(port, body, stop, samples):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    headers = {"Content-Type": "application/json"}
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            connection.request("POST", "/predict?explanation=json", body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            ok = False
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        samples.append((start, time.perf_counter() - start, ok))
+
+
+def swap(port, version, workers):
+    """
+    Trigger a swap and wait until every worker serves the new version.
+
+    Returns:
+        tuple: (start, end) of the swap window, on the perf_counter clock.
+    """
+    start = time.perf_counter()
+    status, body = request(port, "POST", "/admin/reload", json.dumps({"version": version}),
+                           {"Content-Type": "application/json", "X-Admin-Token": ADMIN_TOKEN})
+    if status != 202:
+        raise SystemExit(f"/admin/reload answered {status}: {body}")
+    # /stats lands on any worker; enough consecutive answers cover them all
+    settled = 0
+    while settled < 10 * workers:
+        model = json.loads(request(port, "GET", "/stats")[1])["model"]
+        settled = settled + 1 if model["version"] == version and not model["loading"] else 0
+        time.sleep(0.05)
+    return start, time.perf_counter()
+
+
+def run_swaps(args, work_dir, versions):
+    server = start_server("flask", args.port, args.workers, work_dir)
+    try:
+        records = load_records(args.clients * args.batch_size)
+        stop = threading.Event()
+        samples = []
+        threads = [
+            threading.Thread(target=client, args=(
+                args.port, json.dumps(records[i * args.batch_size:(i + 1) * args.batch_size]),
+                stop, samples))
+            for i in range(args.clients)
+        ]
+        for thread in threads:
+            thread.start()
+        windows = []
+        end = time.perf_counter() + args.duration
+        target = 1
+        while time.perf_counter() + args.swap_every < end:
+            time.sleep(args.swap_every)
+            windows.append(swap(args.port, versions[target], args.workers))
+            target = 1 - target
+        time.sleep(max(0.0, end - time.perf_counter()))
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+    return samples, windows
+
+
+def summarize(samples):
+    if not samples:
+        return "no requests"
+    ms = np.array([latency for _, latency, _ in samples]) * 1000
+    errors = sum(not ok for _, _, ok in samples)
+    p50, p99 = np.percentile(ms, [50, 99])
+    return f"{len(ms):>9} {errors:>7} {p50:>8.1f} {p99:>8.1f} {ms.max():>8.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=40.0)
+    parser.add_argument("--swap-every", type=float, default=8.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--warm-up-rows", type=int, default=300)
+    parser.add_argument("--port", type=int, default=8124)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        registry = os.path.join(work_dir, "registry")
+        versions = publish_versions(registry, work_dir)
+
+        print(f"{'warm-up rows':>12} {'load s':>7} {'warm-up s':>10} "
+              f"{'1st 1 record ms':>16} {'1st 100 records ms':>19}")
+        for rows in (0, args.warm_up_rows):
+            timings = first_calls(registry, rows)
+            print(f"{rows:>12} {timings['load_s']:>7.2f} {timings['warm_up_s']:>10.2f} "
+                  f"{timings['1 record'] * 1000:>16.1f} {timings['100 records'] * 1000:>19.1f}")
+
+        print(f"\n{args.clients} /predict clients (json, {args.batch_size} records), "
+              f"{args.workers} workers, a swap every {args.swap_every:.0f} s")
+        print(f"{'warm-up rows':>12} {'period':>7} {'requests':>9} {'errors':>7} "
+              f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'swap s':>7}")
+        for rows in (0, args.warm_up_rows):
+            os.environ.update(MODEL_REGISTRY_DIR=registry, MODEL_REGISTRY_CHECK_SECONDS="1",
+                              ADMIN_TOKEN=ADMIN_TOKEN, WARM_UP_ROWS=str(rows))
+            ModelRegistry.activate(registry, versions[0])
+            samples, windows = run_swaps(args, os.path.join(work_dir, f"server-{rows}"), versions)
+            in_swap = [s for s in samples if any(a <= s[0] <= b for a, b in windows)]
+            steady = [s for s in samples if not any(a <= s[0] <= b for a, b in windows)]
+            swap_seconds = np.mean([b - a for a, b in windows]) if windows else 0.0
+            print(f"{rows:>12} {'steady':>7} {summarize(steady)}")
+            print(f"{rows:>12} {'swap':>7} {summarize(in_swap)} {swap_seconds:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Plot rendering time of the shap/pyplot and Agg backends.
+
+Renders the bar and beeswarm summary plots of a batch with both backends,
+one request at a time and from several threads at once (as with gunicorn
+--threads), and times the plot-data mode that produces no raster at all.
+The vectorized beeswarm layout is checked against a loop that stacks
+points the way shap.summary_plot does.
+
+Usage: python -m benchmarks.plot_rendering --batch-size 100 --threads 2
+"""
+
+import time
+import pickle
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from api.columnar_service import compile_features
+from api.explanation_service import (
+    FEATURE_NAMES,
+    get_explainer,
+    plot_renderer,
+    render_summary_plots,
+)
+from api.plot_renderer import BEESWARM_BINS, beeswarm_offsets
+from benchmarks.common import load_records
+
+MODEL_PATH = "models/ml_model.pkl"
+
+
+def reference_offsets(values, bins=BEESWARM_BINS):
+    """
+    Point-by-point stacking, as in shap.summary_plot (without its jitter).
+    """
+    quant = np.round(bins * (values - values.min()) / (values.max() - values.min() + 1e-8))
+    offsets = np.zeros(len(values))
+    layer, last_bin = 0, -1
+    for i in np.argsort(quant, kind="stable"):
+        if quant[i] != last_bin:
+            layer = 0
+        offsets[i] = np.ceil(layer / 2) * ((layer % 2) * 2 - 1)
+        layer += 1
+        last_bin = quant[i]
+    return offsets * (0.4 / (np.abs(offsets).max() + 1))
+
+
+def timed(func, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return float(np.median(durations))
+
+
+def concurrent_ms(func, threads, requests):
+    """
+    Wall-clock time per request when requests are served by several threads.
+    """
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda _: func(), range(requests)))
+    return (time.perf_counter() - start) * 1000 / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the plot renderers.")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(MODEL_PATH, "rb") as model_file:
+        model = pickle.load(model_file)
+    matrix = compile_features(load_records(args.batch_size))
+    shap_values = get_explainer(model).shap_values(matrix)[:, :, 1]
+    features = pd.DataFrame(matrix, columns=FEATURE_NAMES)
+
+    for i in range(shap_values.shape[1]):
+        assert np.allclose(beeswarm_offsets(shap_values[:, i]),
+                           reference_offsets(shap_values[:, i])), FEATURE_NAMES[i]
+
+    plot_renderer.warm_up()
+    calls = {
+        "shap": lambda: render_summary_plots(shap_values, features, renderer="shap"),
+        "agg": lambda: render_summary_plots(shap_values, features, renderer="agg"),
+        "plot_data": lambda: plot_renderer.plot_data(shap_values, matrix),
+    }
+    print(f"Batch of {args.batch_size} records, {args.threads} threads")
+    print(f"{'backend':>10} {'sequential ms':>14} {'concurrent ms/request':>22}")
+    for name, call in calls.items():
+        sequential = timed(call, args.repeat)
+        concurrent = concurrent_ms(call, args.threads, args.repeat * args.threads)
+        print(f"{name:>10} {sequential:>14.2f} {concurrent:>22.2f}")
+
+
+if __name__ == "__main__":
+    main()
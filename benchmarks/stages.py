@@ -0,0 +1,173 @@
+"""
+Stage-level benchmark of the /predict pipeline.
+
+Times every stage of a request in isolation, in-process, on batches
+sampled from complete_dataset.csv: preprocess_data,
+perform_feature_engineering, the columnar fast path, make_prediction
+(sklearn and compiled forest), SHAP value computation, plot rendering and
+the concurrent upload of both plots to a local object store stub. Results are
+written as JSON; with --compare, the run fails when a stage got slower
+than the baseline by more than --threshold.
+
+Usage:
+    python -m benchmarks.stages --output bench.json
+    python -m benchmarks.stages --output new.json --compare bench.json --threshold 0.25
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import random
+import argparse
+import platform
+import tempfile
+import numpy as np
+import pandas as pd
+from api.preprocessing_service import preprocess_data
+from api.feature_engineering_service import perform_feature_engineering
+from api.columnar_service import compile_features
+from api.predictive_service import make_prediction
+from api.forest_engine import CompiledForest
+from api.storage_service import LocalObjectStore
+from api.explanation_service import (
+    FEATURE_NAMES,
+    get_explainer,
+    render_summary_plots,
+)
+from benchmarks.common import load_records
+
+MODEL_PATH = "models/ml_model.pkl"
+
+# Stages that take hundreds of milliseconds are repeated less often
+SLOW_STAGES = {"shap_values", "render"}
+
+
+def measure(func, setup, repeat):
+    """
+    Run func(*setup()) repeat times and summarize the durations in ms.
+    """
+    durations = []
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        func(*args)
+        durations.append((time.perf_counter() - start) * 1000)
+    durations = np.array(durations)
+    return {
+        "median_ms": float(np.median(durations)),
+        "p95_ms": float(np.percentile(durations, 95)),
+        "mean_ms": float(durations.mean()),
+        "repeat": repeat,
+    }
+
+
+def stage_inputs(records, model, forest, work_dir):
+    """
+    Prepare the input of every stage for one batch.
+    """
+    preprocessed = preprocess_data(records)
+    features = perform_feature_engineering(preprocessed.copy())
+    matrix = compile_features(records)
+    shap_values_class1 = get_explainer(model).shap_values(matrix)[:, :, 1]
+    plot_frame = pd.DataFrame(matrix, columns=FEATURE_NAMES)
+    plots = render_summary_plots(shap_values_class1, plot_frame)
+    store = LocalObjectStore(os.path.join(work_dir, "store"))
+
+    def upload():
+        store.upload_many({name: (f"{name}.png", data) for name, data in plots.items()})
+
+    return {
+        "preprocess": (preprocess_data, lambda: (records,)),
+        "feature_engineering": (perform_feature_engineering, lambda: (preprocessed.copy(),)),
+        "columnar": (compile_features, lambda: (records,)),
+        "predict_sklearn": (make_prediction, lambda: (model, features)),
+        "predict_compiled": (make_prediction, lambda: (forest, matrix)),
+        "shap_values": (get_explainer(model).shap_values, lambda: (matrix,)),
+        "render": (render_summary_plots,
+                   lambda: (shap_values_class1, plot_frame)),
+        "upload": (upload, lambda: ()),
+    }
+
+
+def run(batch_sizes, repeat, slow_repeat, seed=42):
+    with open(MODEL_PATH, "rb") as model_file:
+        model = pickle.load(model_file)
+    forest = CompiledForest.from_sklearn(model)
+    records = load_records()
+    rng = random.Random(seed)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for batch_size in batch_sizes:
+            batch = rng.sample(records, batch_size)
+            for stage, (func, setup) in stage_inputs(batch, model, forest, work_dir).items():
+                stage_repeat = slow_repeat if stage in SLOW_STAGES else repeat
+                summary = measure(func, setup, stage_repeat)
+                results.append({"stage": stage, "batch_size": batch_size, **summary})
+                print(f"{stage:>20} {batch_size:>6} {summary['median_ms']:>10.3f} ms "
+                      f"(p95 {summary['p95_ms']:.3f})", flush=True)
+    return {
+        "created_at": time.time(),
+        "python": sys.version.split()[0],
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold, min_delta_ms):
+    """
+    List the stages whose median got slower than baseline * (1 + threshold).
+
+    Differences below min_delta_ms are ignored as timer noise.
+    """
+    previous = {(r["stage"], r["batch_size"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get((result["stage"], result["batch_size"]))
+        if before is None:
+            continue
+        ratio = result["median_ms"] / before["median_ms"]
+        delta = result["median_ms"] - before["median_ms"]
+        status = "ok"
+        if ratio > 1 + threshold and delta > min_delta_ms:
+            status = "REGRESSION"
+            regressions.append(result)
+        print(f"{result['stage']:>20} {result['batch_size']:>6} "
+              f"{before['median_ms']:>10.3f} -> {result['median_ms']:>10.3f} ms "
+              f"({ratio:.2f}x) {status}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each /predict stage.")
+    parser.add_argument("--batch-sizes", default="1,10,100",
+                        help="Comma-separated batch sizes (at most 1000)")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--slow-repeat", type=int, default=5,
+                        help="Repetitions for SHAP values and plot rendering")
+    parser.add_argument("--output", default="bench_stages.json")
+    parser.add_argument("--compare", help="Baseline JSON written by an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed relative slowdown before failing")
+    parser.add_argument("--min-delta-ms", type=float, default=0.1)
+    args = parser.parse_args()
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    current = run(batch_sizes, args.repeat, args.slow_repeat)
+    with open(args.output, "w") as output_file:
+        json.dump(current, output_file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(current, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            sys.exit(f"{len(regressions)} stage(s) regressed by more than "
+                     f"{args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
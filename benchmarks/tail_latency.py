@@ -0,0 +1,133 @@
+"""
+Tail latency of the Flask (gunicorn) and async (uvicorn) entry points.
+
+Starts each server in turn on a local port, with the plots going to a
+local object store, and drives it with concurrent /predict clients while
+a prober calls /health at a fixed rate. Reports p50/p95/p99/max and
+errors per endpoint, which is where a blocked worker thread shows up.
+
+Usage: python -m benchmarks.tail_latency --clients 12 --duration 30
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import numpy as np
+from benchmarks.common import load_records
+
+SERVERS = {
+    "flask": ["gunicorn", "--bind", "127.0.0.1:{port}", "--workers", "{workers}",
+              "--preload", "app:app"],
+    "asgi": ["uvicorn", "asgi_app:app", "--host", "127.0.0.1", "--port", "{port}"],
+}
+
+
+def start_server(name, port, workers, work_dir):
+    env = dict(
+        os.environ,
+        OBJECT_STORE="local",
+        LOCAL_STORE_DIR=os.path.join(work_dir, "store"),
+        EXPLANATION_JOB_DIR=os.path.join(work_dir, "jobs"),
+        EXPLANATION_CACHE_DIR=os.path.join(work_dir, "cache"),
+        METRICS_DIR=os.path.join(work_dir, "metrics"),
+        SCORING_PROCESSES=str(workers),
+    )
+    command = [part.format(port=port, workers=workers) for part in SERVERS[name]]
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.5)
+    server.kill()
+    sys.exit(f"{name} server did not start")
+
+
+def client(port, path, body, stop, latencies, errors, interval=0.0):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    method = "POST" if body is not None else "GET"
+    headers = {"Content-Type": "application/json"}
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException):
+            errors.append("connection")
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        latencies.append(time.perf_counter() - start)
+        if interval:
+            stop.wait(interval)
+
+
+def run_load(port, clients, duration, mode, batch_size):
+    records = load_records(clients * batch_size)
+    stop = threading.Event()
+    results = {"/predict": ([], []), "/health": ([], [])}
+    threads = [
+        threading.Thread(target=client, args=(
+            port, f"/predict?explanation={mode}",
+            json.dumps(records[i * batch_size:(i + 1) * batch_size]),
+            stop, *results["/predict"]))
+        for i in range(clients)
+    ]
+    threads.append(threading.Thread(target=client, args=(
+        port, "/health", None, stop, *results["/health"], 0.05)))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the tail latency of both servers.")
+    parser.add_argument("--servers", default="flask,asgi")
+    parser.add_argument("--clients", type=int, default=12)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--workers", type=int, default=3,
+                        help="gunicorn workers, and processes of the async pool")
+    parser.add_argument("--mode", default="plots", choices=["plots", "json", "plot_data"])
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8123)
+    args = parser.parse_args()
+
+    print(f"{args.clients} /predict clients ({args.mode}, {args.batch_size} records), "
+          f"/health every 50 ms, {args.duration:.0f} s")
+    print(f"{'server':>6} {'endpoint':>9} {'requests':>9} {'errors':>7} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name in args.servers.split(","):
+        with tempfile.TemporaryDirectory() as work_dir:
+            server = start_server(name, args.port, args.workers, work_dir)
+            try:
+                results = run_load(args.port, args.clients, args.duration,
+                                   args.mode, args.batch_size)
+            finally:
+                server.terminate()
+                server.wait()
+        for endpoint, (latencies, errors) in results.items():
+            ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            print(f"{name:>6} {endpoint:>9} {len(latencies):>9} {len(errors):>7} "
+                  f"{p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {ms.max():>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
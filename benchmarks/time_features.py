@@ -0,0 +1,138 @@
+"""
+Compare the time feature kernel with the pandas feature engineering.
+
+First checks that api/time_features.py computes exactly the features of
+the original pandas code (pd.to_datetime, then .dt accessors) on the
+dataset and on generated timestamps: the fixed layouts through both the
+vectorized and the scalar paths, dates outside the lookup table, and the
+layouts left to pandas (fractional seconds, offsets, missing values).
+Invalid dates must be rejected by both. Then times both from 1 row up to
+--max-rows rows.
+
+Usage: python -m benchmarks.time_features
+"""
+
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from api.time_features import (
+    SCALAR_MAX, TIME_FEATURES, epoch_ns, time_feature_row, time_features, to_epoch_ns,
+)
+from benchmarks.common import DATASET_PATH
+
+SIZES = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+LAYOUTS = ["%Y-%m-%d", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S"]
+
+
+def reference_time_features(timestamps, last_logins):
+    """
+    The original pandas feature engineering of the service and training.
+    """
+    timestamp = pd.to_datetime(pd.Series(timestamps, dtype=object))
+    last_login = pd.to_datetime(pd.Series(last_logins, dtype=object))
+    return {
+        "gap": (timestamp - last_login).dt.days.abs(),
+        "Hour": timestamp.dt.hour,
+        "Day": timestamp.dt.day,
+        "Month": timestamp.dt.month,
+        "Weekday": timestamp.dt.weekday,
+        "Year": timestamp.dt.year,
+    }
+
+
+def kernel_time_features(timestamps, last_logins):
+    return time_features(to_epoch_ns(timestamps), to_epoch_ns(last_logins))
+
+
+def random_timestamps(rng, n, start="2020-01-01", end="2025-01-01", layout=LAYOUTS[2]):
+    low, high = (pd.Timestamp(value).value // 10**9 for value in (start, end))
+    seconds = rng.integers(low, high, n)
+    return pd.to_datetime(seconds, unit="s").strftime(layout).to_numpy(dtype=object)
+
+
+def check_case(name, timestamps, last_logins):
+    expected = reference_time_features(timestamps, last_logins)
+    actual = kernel_time_features(timestamps, last_logins)
+    for feature in TIME_FEATURES:
+        reference = expected[feature].to_numpy()
+        if actual[feature].dtype != reference.dtype or not np.array_equal(
+                actual[feature], reference, equal_nan=reference.dtype.kind == "f"):
+            raise SystemExit(f"{feature} differs from pandas on {name}")
+    epochs = [epoch_ns(value) for value in timestamps]
+    logins = [epoch_ns(value) for value in last_logins]
+    for row, (epoch, login) in enumerate(zip(epochs, logins)):
+        if epoch is not None and login is not None:
+            scalar = time_feature_row(epoch, login)
+            if scalar != tuple(actual[feature][row] for feature in TIME_FEATURES):
+                raise SystemExit(f"time_feature_row differs on {name}, row {row}")
+
+
+def check_equivalence(rng):
+    dataset = pd.read_csv(DATASET_PATH)
+    cases = {"the dataset": (dataset["Timestamp"].to_numpy(), dataset["LastLogin"].to_numpy())}
+    for layout in LAYOUTS:
+        for n in (1, SCALAR_MAX, 10_000):
+            cases[f"{n} rows of {layout}"] = (random_timestamps(rng, n, layout=layout),
+                                              random_timestamps(rng, n, layout=LAYOUTS[0]))
+    for start, end in (("1800-01-01", "1900-01-01"), ("2200-01-01", "2250-01-01")):
+        cases[f"dates from {start[:4]} to {end[:4]}, outside the table"] = (
+            random_timestamps(rng, 1_000, start, end), random_timestamps(rng, 1_000, start, end),
+        )
+    fractions = random_timestamps(rng, 1_000).astype(object) + ".250"
+    fractions[5::13] = None
+    cases["fractional seconds and missing values"] = (fractions, random_timestamps(rng, 1_000))
+    cases["offsets"] = (random_timestamps(rng, 1_000, layout=LAYOUTS[1] + "+02:00"),
+                        random_timestamps(rng, 1_000, layout=LAYOUTS[1] + "+02:00"))
+    cases["leap days"] = (
+        np.array(["2024-02-29 12:00:00", "2000-02-29 00:00:00", "2023-12-31 23:59:59"] * 4,
+                 dtype=object),
+        np.array(["2024-03-01", "1999-02-28", "2024-01-01"] * 4, dtype=object),
+    )
+    for name, (timestamps, last_logins) in cases.items():
+        check_case(name, timestamps, last_logins)
+
+    for invalid in ("2023-02-30", "2023-13-01 00:00:00", "2023-01-01 25:00:00"):
+        for n in (1, SCALAR_MAX + 1):
+            values = np.array([invalid] * n, dtype=object)
+            try:
+                to_epoch_ns(values)
+            except ValueError:
+                continue
+            raise SystemExit(f"{invalid!r} was accepted")
+    print(f"Features match pandas on {len(cases)} inputs ({len(dataset)} dataset rows "
+          f"included); invalid dates are rejected")
+
+
+def measure(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-rows", type=int, default=SIZES[-1])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    check_equivalence(rng)
+
+    print(f"{'rows':>9} {'pandas s':>9} {'kernel s':>9} {'speedup':>8} {'kernel rows/s':>14}")
+    for n in SIZES:
+        if n > args.max_rows:
+            break
+        timestamps = random_timestamps(rng, n)
+        last_logins = random_timestamps(rng, n, layout=LAYOUTS[0])
+        # Best of a few runs for the small sizes, whose timings are noisy
+        repeat = 5 if n <= 10_000 else 1
+        pandas_s = min(measure(reference_time_features, timestamps, last_logins)
+                       for _ in range(repeat))
+        kernel_s = min(measure(kernel_time_features, timestamps, last_logins)
+                       for _ in range(repeat))
+        print(f"{n:>9} {pandas_s:>9.4f} {kernel_s:>9.4f} {pandas_s / kernel_s:>7.1f}x "
+              f"{n / kernel_s:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
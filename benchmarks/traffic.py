@@ -0,0 +1,114 @@
+"""
+Synthetic /predict traffic sampled from complete_dataset.csv.
+
+Used by locustfile.py. Every batch is built from records drawn at random
+from the dataset and mutated (amounts, scores, ages, timestamps, IDs), so
+requests are unique and exercise the cold path, except for the fraction
+cache_hit_ratio that replays a recently sent batch and hits the
+explanation cache. Batch sizes follow a configurable mix.
+"""
+
+import random
+from datetime import datetime, timedelta
+from benchmarks.common import load_records
+
+
+def parse_batch_mix(spec):
+    """
+    Parse a batch size mix such as "1:0.7,10:0.2,100:0.1".
+
+    Returns:
+        tuple: (batch sizes, weights)
+    """
+    sizes, weights = [], []
+    for item in spec.split(","):
+        size, _, weight = item.partition(":")
+        sizes.append(int(size))
+        weights.append(float(weight or 1))
+    if not sizes or min(sizes) < 1 or min(weights) < 0 or sum(weights) <= 0:
+        raise ValueError(f"Invalid batch mix: {spec}")
+    return sizes, weights
+
+
+def shift_date(value, days, hour=None):
+    """
+    Move a "YYYY-MM-DD[ HH:MM:SS]" string by whole days, keeping its layout.
+    """
+    if len(value) == 10:
+        moved = datetime.strptime(value, "%Y-%m-%d") + timedelta(days=days)
+        return moved.strftime("%Y-%m-%d")
+    moved = datetime.fromisoformat(value) + timedelta(days=days)
+    if hour is not None:
+        moved = moved.replace(hour=hour)
+    return moved.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class TrafficGenerator:
+    """
+    Produces /predict request bodies from mutated dataset records.
+    """
+
+    def __init__(self, records=None, batch_mix="1", cache_hit_ratio=0.0,
+                 hot_set_size=100, seed=None):
+        """
+        Args:
+            records (list): Request records to sample from; the whole
+                            dataset when None.
+            batch_mix (str): Batch sizes and weights, e.g. "1:0.7,10:0.3".
+            cache_hit_ratio (float): Fraction of batches that replay one of
+                                     the recently sent batches.
+            hot_set_size (int): Number of recent batches kept for replay.
+            seed (int): Seed of the random generator.
+        """
+        self.records = records if records is not None else load_records()
+        self.sizes, self.weights = parse_batch_mix(batch_mix)
+        self.cache_hit_ratio = cache_hit_ratio
+        self.hot_set_size = hot_set_size
+        self.categories = sorted({record["Category"] for record in self.records})
+        self.rng = random.Random(seed)
+        self._hot_set = []
+        self._next_id = 10_000_000
+
+    def next_batch(self):
+        """
+        Return the next request body, a list of records.
+        """
+        if self._hot_set and self.rng.random() < self.cache_hit_ratio:
+            return self.rng.choice(self._hot_set)
+
+        size = self.rng.choices(self.sizes, self.weights)[0]
+        batch = [self.mutate(self.rng.choice(self.records)) for _ in range(size)]
+        if len(self._hot_set) < self.hot_set_size:
+            self._hot_set.append(batch)
+        else:
+            self._hot_set[self.rng.randrange(self.hot_set_size)] = batch
+        return batch
+
+    def mutate(self, record):
+        """
+        Copy of a record with plausible random changes and fresh IDs.
+        """
+        rng = self.rng
+        record = dict(record)
+        self._next_id += 1
+        record["TransactionID"] = str(self._next_id)
+        record["CustomerID"] = str(rng.randint(1000, 2999))
+        record["MerchantID"] = str(rng.randint(2000, 2999))
+        record["Amount"] = round(record["Amount"] * rng.lognormvariate(0, 0.25), 2)
+        record["TransactionAmount"] = round(
+            record["TransactionAmount"] * rng.lognormvariate(0, 0.25), 2
+        )
+        record["AccountBalance"] = round(
+            record["AccountBalance"] * rng.lognormvariate(0, 0.1), 2
+        )
+        record["AnomalyScore"] = min(max(record["AnomalyScore"] + rng.gauss(0, 0.05), 0.0), 1.0)
+        record["CustomerAge"] = max(18, record["CustomerAge"] + rng.randint(-2, 2))
+        if rng.random() < 0.05:
+            record["Category"] = rng.choice(self.categories)
+        if rng.random() < 0.02:
+            record["SuspiciousFlag"] = 1 - record["SuspiciousFlag"]
+        # The same day shift keeps the gap between both dates
+        days = rng.randint(-30, 30)
+        record["Timestamp"] = shift_date(record["Timestamp"], days, hour=rng.randint(0, 23))
+        record["LastLogin"] = shift_date(record["LastLogin"], days)
+        return record
@@ -0,0 +1,135 @@
+"""
+Wall-clock time and peak memory of models/train.py against 032_final.py.
+
+The baseline is the random forest search of 032_final.py: GridSearchCV
+over the 108 configurations with 5 folds, then the extra refit of the
+best model, on the data prepared by train.prepare_data (which follows
+032_final.py). Both run in their own process; each reports its duration,
+its peak memory (its pool processes included) and the model it picked,
+and the two models are compared on the test split. The resume path is
+checked by interrupting a training run and restarting it.
+
+Usage: python -m benchmarks.training --jobs 4
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import signal
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+TRAIN_SCRIPT = "models/train.py"
+
+
+def run_baseline(dataset, jobs):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import GridSearchCV
+    from models.train import N_ESTIMATORS, PARAM_GRID, load_dataset, peak_memory_mb, prepare_data
+
+    start = time.perf_counter()
+    arrays, _ = prepare_data(load_dataset(dataset))
+    grid_search = GridSearchCV(
+        RandomForestClassifier(random_state=42),
+        {**PARAM_GRID, "n_estimators": N_ESTIMATORS},
+        cv=5, scoring="f1", n_jobs=jobs,
+    )
+    grid_search.fit(arrays["X_train"], arrays["y_train"])
+    best_rf_model = grid_search.best_estimator_
+    # 032_final.py fits the refitted best model once more
+    best_rf_model.fit(arrays["X_train"], arrays["y_train"])
+    return best_rf_model, {
+        "seconds": time.perf_counter() - start,
+        "peak_memory_mb": peak_memory_mb(),
+        "params": grid_search.best_params_,
+        "cv_f1": grid_search.best_score_,
+    }
+
+
+def child(args):
+    if args.run == "baseline":
+        model, report = run_baseline(args.dataset, args.jobs)
+        with open(os.path.join(args.output_dir, "ml_model.pkl"), "wb") as model_file:
+            pickle.dump(model, model_file)
+    else:
+        from models.train import train
+        report = train(args.dataset, args.work_dir, args.output_dir, args.jobs,
+                       log=lambda message: None)
+    print(json.dumps(report, default=str), flush=True)
+
+
+def run(kind, dataset, work_dir, output_dir, jobs):
+    command = [sys.executable, "-m", "benchmarks.training", "--run", kind,
+               "--dataset", dataset, "--work-dir", work_dir, "--output-dir", output_dir]
+    if jobs:
+        command += ["--jobs", str(jobs)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def check_resume(dataset, work_dir, output_dir, jobs, after_seconds):
+    command = [sys.executable, TRAIN_SCRIPT, "--dataset", dataset, "--work-dir", work_dir,
+               "--output-dir", output_dir]
+    if jobs:
+        command += ["--jobs", str(jobs)]
+    proc = subprocess.Popen(command, stdout=subprocess.DEVNULL, start_new_session=True)
+    time.sleep(after_seconds)
+    # Kill the whole run, pool processes included, as a crash would
+    os.killpg(proc.pid, signal.SIGKILL)
+    proc.wait()
+    return run("train", dataset, work_dir, output_dir, jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dataset", default="complete_dataset.csv")
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--interrupt-after", type=float, default=10.0,
+                        help="Seconds before the resume check kills the run")
+    parser.add_argument("--run", choices=["baseline", "train"], help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--output-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        child(args)
+        return
+
+    from models.train import cached_data
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dirs = {name: os.path.join(tmp, name) for name in ("baseline", "train", "resume")}
+        for directory in dirs.values():
+            os.makedirs(directory)
+
+        baseline = run("baseline", args.dataset, dirs["baseline"], dirs["baseline"], args.jobs)
+        fresh = run("train", args.dataset, dirs["train"], dirs["train"], args.jobs)
+        resumed = check_resume(args.dataset, dirs["resume"], dirs["resume"], args.jobs,
+                               args.interrupt_after)
+
+        print(f"{'run':>22} {'seconds':>8} {'peak MB':>8} {'CV F1':>7}  parameters")
+        for label, report in (("032_final grid search", baseline), ("train.py", fresh),
+                              ("train.py, resumed", resumed)):
+            print(f"{label:>22} {report['seconds']:>8.1f} {report['peak_memory_mb']:>8.0f} "
+                  f"{report['cv_f1']:>7.4f}  {report['params']}")
+        print(f"train.py: {fresh['fits']} fits against 540 for the grid search "
+              f"(plus its refits); the resumed run reused {resumed['reused_fits']} fits")
+
+        arrays, _, _ = cached_data(args.dataset, dirs["train"])
+        predictions = {}
+        for name in ("baseline", "train", "resume"):
+            with open(os.path.join(dirs[name], "ml_model.pkl"), "rb") as model_file:
+                predictions[name] = pickle.load(model_file).predict_proba(arrays["X_test"])
+        same = np.array_equal(predictions["train"], predictions["resume"])
+        print(f"Resumed and uninterrupted runs give {'the same' if same else 'DIFFERENT'} model")
+        if baseline["params"] == fresh["params"]:
+            same = np.array_equal(predictions["baseline"], predictions["train"])
+            print(f"Both searches picked the same parameters; the models "
+                  f"{'are identical' if same else 'DIFFER'} on the test split")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Upload latency of the SHAP plots against a local S3-compatible stand-in.
+
+Starts a minimal S3 server in-process (PUT and GET of objects, with an
+injected per-request latency that stands in for the network round trip)
+and times, for one pair of rendered plots:
+
+- sequential: the previous flow, writing each PNG to disk, uploading it
+  with client.upload_file, presigning it and deleting the file, one plot
+  after the other;
+- concurrent: S3ObjectStore.upload_many, which PUTs both in-memory plots
+  at once over the pooled client and presigns them locally.
+
+The uploaded objects are read back and compared with the rendered bytes.
+No network access or AWS credentials are needed. The same code can be
+pointed at MinIO or LocalStack with --endpoint-url.
+
+Usage: python -m benchmarks.uploads --latency-ms 20 --repeat 20
+"""
+
+import os
+import time
+import uuid
+import argparse
+import tempfile
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from api.storage_service import S3ObjectStore
+
+BUCKET = "fraud-detection-local"
+
+
+class StandInS3Handler(BaseHTTPRequestHandler):
+    """
+    Path-style S3 object PUT/GET, enough for put_object and upload_file.
+    """
+
+    # HTTP/1.1 keeps connections alive and answers "Expect: 100-continue"
+    protocol_version = "HTTP/1.1"
+    objects = {}
+    latency = 0.0
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        self.objects[self.path.split("?")[0]] = body
+        self._reply(200, b"", {"ETag": f'"{uuid.uuid4().hex}"'})
+
+    def do_GET(self):
+        body = self.objects.get(self.path.split("?")[0])
+        time.sleep(self.latency)
+        if body is None:
+            self._reply(404, b"<Error><Code>NoSuchKey</Code></Error>")
+        else:
+            self._reply(200, body)
+
+    def _reply(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stand_in(latency_ms):
+    StandInS3Handler.latency = latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInS3Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def sample_plots():
+    """
+    Render a pair of plots the size of the ones /predict produces.
+    """
+    import pandas as pd
+    from api.explanation_service import FEATURE_NAMES, render_summary_plots
+    rng = np.random.default_rng(0)
+    features = pd.DataFrame(rng.random((20, len(FEATURE_NAMES))), columns=FEATURE_NAMES)
+    return render_summary_plots(rng.normal(size=(20, len(FEATURE_NAMES))), features)
+
+
+def upload_sequential(store, plots, work_dir):
+    urls = {}
+    for name, data in plots.items():
+        key = f"{name}_{uuid.uuid4()}.png"
+        path = os.path.join(work_dir, key)
+        with open(path, "wb") as plot_file:
+            plot_file.write(data)
+        store.client.upload_file(path, store.bucket, key)
+        urls[name] = store.client.generate_presigned_url(
+            ClientMethod="get_object",
+            Params={"Bucket": store.bucket, "Key": key},
+            ExpiresIn=600,
+        )
+        os.remove(path)
+    return urls
+
+
+def upload_concurrent(store, plots):
+    return store.upload_many(
+        {name: (f"{name}_{uuid.uuid4()}.png", data) for name, data in plots.items()}
+    )
+
+
+def summarize(durations):
+    durations = np.array(durations) * 1000
+    return np.median(durations), np.percentile(durations, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the plot upload latency.")
+    parser.add_argument("--latency-ms", type=float, default=20.0,
+                        help="Latency the stand-in adds to every request")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--endpoint-url",
+                        help="Use this S3-compatible server instead of the stand-in")
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+    server = None
+    endpoint_url = args.endpoint_url
+    if endpoint_url is None:
+        server, endpoint_url = start_stand_in(args.latency_ms)
+    store = S3ObjectStore(bucket=BUCKET, endpoint_url=endpoint_url)
+    plots = sample_plots()
+
+    # Round trip check: the objects behind the URLs are the rendered bytes
+    for name, url in upload_concurrent(store, plots).items():
+        with urllib.request.urlopen(url) as response:
+            assert response.read() == plots[name], f"{name} differs after upload"
+
+    timings = {"sequential": [], "concurrent": []}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            upload_sequential(store, plots, work_dir)
+            timings["sequential"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            upload_concurrent(store, plots)
+            timings["concurrent"].append(time.perf_counter() - start)
+
+    size_kb = sum(len(data) for data in plots.values()) / 1024
+    print(f"Two plots, {size_kb:.0f} KB, {args.latency_ms:.0f} ms added per request")
+    for label, durations in timings.items():
+        median, p95 = summarize(durations)
+        print(f"{label:>11}: median {median:8.2f} ms, p95 {p95:8.2f} ms")
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
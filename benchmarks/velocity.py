@@ -0,0 +1,136 @@
+"""
+Correctness, speed and memory of the per-customer velocity windows.
+
+Checks, on synthetic bursts of transactions from a few customers, that
+the aggregator matches a brute-force count over the same buckets, and
+that customers evicted for lack of capacity only lose history they would
+have lost anyway once idle. Then checks that the offline pass of
+feature_engineering/velocity_features.py and the service, fed the
+dataset's records one request at a time through a shared state file,
+return identical features. Finally times updates and reports the memory
+per tracked customer.
+
+Usage: python -m benchmarks.velocity
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from api.velocity import WINDOWS, VelocityAggregator, feature_names, to_epoch_seconds
+from feature_engineering.velocity_features import compute_velocity_features
+from benchmarks.common import load_records
+
+
+def brute_force(customer_ids, timestamps, amounts, windows):
+    """
+    Counts and sums of the earlier transactions in the same buckets.
+    """
+    out = np.zeros((len(customer_ids), 2 * len(windows)))
+    for i in range(len(customer_ids)):
+        column = 0
+        for seconds, n_buckets in windows.values():
+            width = seconds // n_buckets
+            bucket = timestamps[i] // width
+            # Time-ordered input: the newest bucket is the current one
+            earlier = (
+                (customer_ids[:i] == customer_ids[i])
+                & (timestamps[:i] // width > bucket - n_buckets)
+            )
+            out[i, column] = earlier.sum()
+            out[i, column + 1] = amounts[:i][earlier].sum()
+            column += 2
+    return out
+
+
+def synthetic_stream(n, n_customers, rng):
+    gaps = rng.exponential(120, n).astype(np.int64)
+    timestamps = 1_700_000_000 + np.cumsum(gaps)
+    customer_ids = rng.integers(1, n_customers + 1, n)
+    amounts = np.round(rng.lognormal(3, 1, n), 2)
+    return customer_ids, timestamps, amounts
+
+
+def check_brute_force(rng):
+    customer_ids, timestamps, amounts = synthetic_stream(5_000, 20, rng)
+    expected = brute_force(customer_ids, timestamps, amounts, WINDOWS)
+    actual = VelocityAggregator(capacity=64).update_many(customer_ids, timestamps, amounts)
+    if not np.array_equal(expected[:, 0::2], actual[:, 0::2]):
+        raise SystemExit("Velocity counts differ from the brute-force counts")
+    if not np.allclose(expected[:, 1::2], actual[:, 1::2], rtol=1e-12):
+        raise SystemExit("Velocity sums differ from the brute-force sums")
+    print(f"Counts and sums match a brute-force computation on {len(customer_ids)} transactions")
+
+
+def check_eviction(rng):
+    # Far more customers than slots: evicted customers restart from zero,
+    # so their counts can only be lower than with unbounded memory
+    customer_ids, timestamps, amounts = synthetic_stream(20_000, 2_000, rng)
+    bounded = VelocityAggregator(capacity=256).update_many(customer_ids, timestamps, amounts)
+    unbounded = VelocityAggregator(capacity=8192).update_many(customer_ids, timestamps, amounts)
+    if (bounded[:, 0::2] > unbounded[:, 0::2]).any():
+        raise SystemExit("Eviction produced counts above the unbounded ones")
+    lost = (bounded[:, 0::2] != unbounded[:, 0::2]).any(axis=1).mean()
+    print(f"With 256 slots for 2000 customers, {lost:.1%} of the transactions "
+          f"lost history to eviction")
+
+
+def check_offline_online(state_path):
+    records = load_records()
+    frame = pd.DataFrame(records)
+    frame["TransactionID"] = frame["TransactionID"].astype(np.int64)
+    frame["CustomerID"] = frame["CustomerID"].astype(np.int64)
+    frame["Timestamp"] = pd.to_datetime(frame["Timestamp"])
+    offline = compute_velocity_features(frame).set_index("TransactionID")
+
+    # The service sees the same stream, one request at a time
+    order = sorted(range(len(records)),
+                   key=lambda i: (to_epoch_seconds(records[i]["Timestamp"]),
+                                  int(records[i]["TransactionID"])))
+    aggregator = VelocityAggregator(path=state_path)
+    online = {}
+    for i in order:
+        online[int(records[i]["TransactionID"])] = aggregator.update_records(records[i])[0]
+    online = pd.DataFrame.from_dict(online, orient="index")[feature_names()]
+    if not offline.loc[online.index].equals(online.astype(offline.dtypes.to_dict())):
+        raise SystemExit("Offline and online velocity features differ")
+    print(f"Offline and online features match on {len(online)} transactions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=100_000)
+    parser.add_argument("--customers", type=int, default=50_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    check_brute_force(rng)
+    check_eviction(rng)
+    with tempfile.TemporaryDirectory() as state_dir:
+        check_offline_online(os.path.join(state_dir, "velocity.state"))
+
+        customer_ids, timestamps, amounts = synthetic_stream(args.updates, args.customers, rng)
+        for label, path in (("in memory", None),
+                            ("shared file", os.path.join(state_dir, "bench.state"))):
+            aggregator = VelocityAggregator(path=path)
+            start = time.perf_counter()
+            aggregator.update_many(customer_ids, timestamps, amounts)
+            per_update = (time.perf_counter() - start) / args.updates
+            single = time.perf_counter()
+            for i in range(1_000):
+                aggregator.update_many(customer_ids[i:i + 1], timestamps[i:i + 1],
+                                       amounts[i:i + 1])
+            per_call = (time.perf_counter() - single) / 1_000
+            print(f"{label:>11}: {per_update * 1e6:.1f} us per update in bulk, "
+                  f"{per_call * 1e6:.1f} us per single-transaction call")
+
+        state_bytes = sum(array.nbytes for array in aggregator._arrays.values())
+        print(f"State: {state_bytes / 2**20:.1f} MB for {aggregator.capacity} customers "
+              f"({state_bytes / aggregator.capacity:.0f} bytes each), "
+              f"whatever the transaction rate")
+
+
+if __name__ == "__main__":
+    main()
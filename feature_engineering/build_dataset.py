@@ -0,0 +1,269 @@
+"""
+Build the training dataset from the raw CSVs, in a streaming join.
+
+Scripted, scalable replacement for 20_Data_Processed/dataset_merged.ipynb.
+transaction_records.csv is read in chunks; each chunk is hash-joined
+against the other tables, loaded once and indexed by their key:
+
+- transaction metadata, amounts, anomaly scores, fraud indicators and
+  category labels on TransactionID;
+- merchant data on MerchantID;
+- customer data, account activity and suspicious activity on CustomerID.
+
+Joins are inner joins, as in the notebook, and every key must be unique
+in its table; TransactionID must also be unique across the chunks and
+the transactions already in the dataset. Each chunk becomes a partition
+of a typed ColumnarDataset; with --append, a new transaction file is
+added as further partitions (a file that was already ingested is
+skipped). The partitions of a file are committed together once all of
+them are written, so an interrupted or failed run adds nothing. --csv
+also writes the rows in the layout of complete_dataset.csv, with its
+header whenever the file is new.
+
+Usage:
+    python feature_engineering/build_dataset.py --output feature_engineering/20_Data_Processed/complete_dataset
+    python feature_engineering/build_dataset.py --output ... --transactions new_records.csv --append
+"""
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import resource
+import numpy as np
+import pandas as pd
+
+# make the serving package importable when run as `python feature_engineering/build_dataset.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.columnar_dataset import STRING, ColumnarDataset  # noqa: E402
+
+RAW_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "10_Data_Raw")
+
+TRANSACTIONS = "Transaction_Data_Raw/transaction_records.csv"
+
+# Tables joined on each key: (file, columns kept, renames)
+DIMENSIONS = {
+    "TransactionID": [
+        ("Transaction_Data_Raw/transaction_metadata.csv", ["Timestamp", "MerchantID"], {}),
+        ("Transaction_Amount_Raw/amount_data.csv", ["TransactionAmount"], {}),
+        ("Transaction_Amount_Raw/anomaly_scores.csv", ["AnomalyScore"], {}),
+        ("Fraudulent_Patterns_Raw/fraud_indicators.csv", ["FraudIndicator"], {}),
+        ("Merchant_Information_Raw/transaction_category_labels.csv", ["Category"], {}),
+    ],
+    "MerchantID": [
+        ("Merchant_Information_Raw/merchant_data.csv", ["MerchantName", "Location"],
+         {"Location": "MerchantLocation"}),
+    ],
+    "CustomerID": [
+        ("Customer_Profile_Raw/customer_data.csv", ["Name", "Age", "Address"],
+         {"Name": "CustomerName", "Age": "CustomerAge", "Address": "CustomerAddress"}),
+        ("Customer_Profile_Raw/account_activity.csv", ["AccountBalance", "LastLogin"], {}),
+        ("Fraudulent_Patterns_Raw/suspicious_activity.csv", ["SuspiciousFlag"], {}),
+    ],
+}
+
+# Columns and types of the output, in the order of complete_dataset.csv
+SCHEMA = {
+    "TransactionID": "int64",
+    "Timestamp": "datetime64[s]",
+    "MerchantID": "int64",
+    "Amount": "float64",
+    "CustomerID": "int64",
+    "TransactionAmount": "float64",
+    "AnomalyScore": "float64",
+    "FraudIndicator": "int8",
+    "Category": STRING,
+    "MerchantName": STRING,
+    "MerchantLocation": STRING,
+    "CustomerName": STRING,
+    "CustomerAge": "int16",
+    "CustomerAddress": STRING,
+    "AccountBalance": "float64",
+    "LastLogin": "datetime64[D]",
+    "SuspiciousFlag": "int8",
+}
+
+DATE_COLUMNS = {"Timestamp": "%Y-%m-%d %H:%M:%S", "LastLogin": "%Y-%m-%d"}
+
+
+def load_dimension(raw_dir, key, tables):
+    """
+    Inner-join the tables sharing a key into one table indexed by it.
+    """
+    joined = None
+    for path, columns, renames in tables:
+        table = pd.read_csv(os.path.join(raw_dir, path), usecols=[key] + columns)
+        if table[key].duplicated().any():
+            raise ValueError(f"Duplicate {key} values in {path}")
+        table = table.set_index(key).rename(columns=renames)
+        joined = table if joined is None else joined.join(table, how="inner")
+    return joined
+
+
+def hash_join(chunk, dimension, key):
+    """
+    Inner-join a chunk against a table indexed by key.
+
+    The index of the table acts as the hash table: get_indexer looks up
+    every key of the chunk at once, and rows without a match are dropped.
+    """
+    positions = dimension.index.get_indexer(chunk[key])
+    matched = positions >= 0
+    chunk = chunk.loc[matched].reset_index(drop=True)
+    columns = dimension.iloc[positions[matched]].reset_index(drop=True)
+    return pd.concat([chunk, columns], axis=1)
+
+
+def check_unique(ids, seen):
+    """
+    Reject transaction IDs repeated within a chunk or already seen.
+
+    Args:
+        ids (np.ndarray): TransactionID values of a chunk.
+        seen (np.ndarray): Sorted IDs of the dataset and the earlier chunks.
+
+    Returns:
+        np.ndarray: seen with ids added, still sorted.
+    """
+    ids = np.sort(ids)
+    repeated = ids[1:][ids[1:] == ids[:-1]]
+    positions = np.searchsorted(seen, ids).clip(max=max(len(seen) - 1, 0))
+    known = ids[seen[positions] == ids] if len(seen) else ids[:0]
+    duplicates = np.union1d(repeated, known)
+    if len(duplicates):
+        raise ValueError(f"Duplicate TransactionID values in the transaction records: "
+                         f"{duplicates[:5].tolist()}")
+    return np.union1d(seen, ids)
+
+
+def join_chunk(chunk, dimensions):
+    """
+    Join one chunk of transaction records into complete_dataset rows.
+    """
+    for key, dimension in dimensions.items():
+        chunk = hash_join(chunk, dimension, key)
+    for column, layout in DATE_COLUMNS.items():
+        chunk[column] = pd.to_datetime(chunk[column], format=layout)
+    return chunk.sort_values("TransactionID", kind="stable")[list(SCHEMA)]
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as source_file:
+        for block in iter(lambda: source_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def peak_memory_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def build(output, transactions=None, raw_dir=RAW_DIR, chunk_size=100_000,
+          append=False, csv_path=None):
+    """
+    Stream the transaction records through the joins into the dataset.
+
+    Args:
+        output (str): Directory of the ColumnarDataset.
+        transactions (str): Transaction records CSV; the raw one when None.
+        raw_dir (str): Directory of the raw tables.
+        chunk_size (int): Transactions read, joined and written at a time.
+        append (bool): Add to an existing dataset instead of creating it;
+                       a rebuild replaces the old dataset once complete.
+        csv_path (str): Also write the rows as CSV, like complete_dataset.csv.
+
+    Returns:
+        dict: Rows read and written, duration and peak memory.
+    """
+    start = time.perf_counter()
+    transactions = transactions or os.path.join(raw_dir, TRANSACTIONS)
+    source = file_digest(transactions)
+
+    if append and os.path.exists(output):
+        dataset = ColumnarDataset.open(output)
+        if dataset.schema != SCHEMA:
+            raise ValueError(f"Schema of {output} does not match this pipeline")
+        if dataset.has_source(source):
+            return {"rows_read": 0, "rows_written": 0, "skipped": True,
+                    "seconds": time.perf_counter() - start, "peak_memory_mb": peak_memory_mb()}
+    else:
+        dataset = ColumnarDataset.create(output, SCHEMA, overwrite=not append)
+
+    dimensions = {
+        key: load_dimension(raw_dir, key, tables) for key, tables in DIMENSIONS.items()
+    }
+
+    # IDs of the rows ingested so far, sorted: 8 bytes a transaction
+    seen = np.unique(dataset.read_column("TransactionID"))
+    # CSV rows go to a staging file too, added to csv_path on commit
+    csv_staging = f"{csv_path}.tmp" if csv_path else None
+    header = not (append and csv_path and os.path.exists(csv_path)
+                  and os.path.getsize(csv_path) > 0)
+
+    rows_read = rows_written = 0
+    reader = pd.read_csv(
+        transactions, chunksize=chunk_size,
+        dtype={"TransactionID": "int64", "Amount": "float64", "CustomerID": "int64"},
+    )
+    for i, chunk in enumerate(reader):
+        rows_read += len(chunk)
+        seen = check_unique(chunk["TransactionID"].to_numpy(), seen)
+        joined = join_chunk(chunk, dimensions)
+        rows_written += dataset.stage(joined)
+        if csv_path:
+            rows = joined.assign(**{
+                column: joined[column].dt.strftime(layout)
+                for column, layout in DATE_COLUMNS.items()
+            })
+            rows.to_csv(csv_staging, mode="a" if i else "w", header=header and not i,
+                        index=False)
+
+    # Partitions and source in one manifest write: a run that stops before
+    # it is not mistaken for a complete one, nor half applied
+    dataset.commit(source)
+    if csv_path and rows_read:
+        if header:
+            os.replace(csv_staging, csv_path)
+        else:
+            with open(csv_staging, "rb") as staged, open(csv_path, "ab") as csv_file:
+                shutil.copyfileobj(staged, csv_file)
+            os.remove(csv_staging)
+
+    return {
+        "rows_read": rows_read,
+        "rows_written": rows_written,
+        "skipped": False,
+        "seconds": time.perf_counter() - start,
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Join the raw CSVs into the training dataset.")
+    parser.add_argument("--output", required=True, help="Directory of the columnar dataset")
+    parser.add_argument("--transactions",
+                        help="Transaction records to add (default: the raw transaction_records.csv)")
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--append", action="store_true",
+                        help="Append to the dataset instead of rebuilding it")
+    parser.add_argument("--csv", help="Also write the rows to this CSV file")
+    args = parser.parse_args()
+
+    report = build(args.output, args.transactions, args.raw_dir, args.chunk_size,
+                   args.append, args.csv)
+    if report["skipped"]:
+        print("These transactions were already appended; nothing to do")
+        return
+    rate = report["rows_read"] / report["seconds"] if report["seconds"] else 0
+    print(f"Read {report['rows_read']} transactions, wrote {report['rows_written']} rows "
+          f"in {report['seconds']:.2f} s ({rate:,.0f} rows/s), "
+          f"peak memory {report['peak_memory_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compute the per-customer velocity features of the training transactions.
+
+Runs the aggregator the service uses (api/velocity.py) over the
+transaction records in a single pass, sorted by Timestamp and then
+TransactionID, so the training features are those the service would
+have returned for the same stream. Timestamps come from
+transaction_metadata.csv, joined on TransactionID.
+
+Usage:
+    python feature_engineering/velocity_features.py --output feature_engineering/20_Data_Processed/velocity_features.csv
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# make the serving package importable when run as `python feature_engineering/velocity_features.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.velocity import VELOCITY_CAPACITY, VelocityAggregator, feature_names  # noqa: E402
+from feature_engineering.build_dataset import RAW_DIR, TRANSACTIONS  # noqa: E402
+
+METADATA = "Transaction_Data_Raw/transaction_metadata.csv"
+
+
+def compute_velocity_features(transactions, capacity=VELOCITY_CAPACITY, windows=None):
+    """
+    Velocity features of transactions, in one pass in event time order.
+
+    Args:
+        transactions (pd.DataFrame): TransactionID, CustomerID, Amount and
+                                     Timestamp (datetime64) columns.
+        capacity (int): Customers tracked at once, as in the service.
+        windows (dict): Windows of the aggregator; its defaults when None.
+
+    Returns:
+        pd.DataFrame: TransactionID and one column per feature, in the
+                      order the transactions were processed.
+    """
+    ordered = transactions.sort_values(["Timestamp", "TransactionID"], kind="stable")
+    seconds = ordered["Timestamp"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+    aggregator = VelocityAggregator(capacity=capacity, windows=windows)
+    values = aggregator.update_many(
+        ordered["CustomerID"].to_numpy(), seconds, ordered["Amount"].to_numpy()
+    )
+    features = pd.DataFrame(values, columns=feature_names(aggregator.windows))
+    for column in features:
+        if column.startswith("txn_count"):
+            features[column] = features[column].astype(np.int64)
+    features.insert(0, "TransactionID", ordered["TransactionID"].to_numpy())
+    return features
+
+
+def load_transactions(raw_dir=RAW_DIR, transactions=None):
+    """
+    Transaction records with their Timestamp from the metadata table.
+    """
+    records = pd.read_csv(transactions or os.path.join(raw_dir, TRANSACTIONS),
+                          usecols=["TransactionID", "Amount", "CustomerID"])
+    metadata = pd.read_csv(os.path.join(raw_dir, METADATA),
+                           usecols=["TransactionID", "Timestamp"])
+    records = records.merge(metadata, on="TransactionID", how="inner")
+    records["Timestamp"] = pd.to_datetime(records["Timestamp"], format="%Y-%m-%d %H:%M:%S")
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute per-customer velocity features.")
+    parser.add_argument("--output", required=True, help="CSV file to write")
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--transactions",
+                        help="Transaction records (default: the raw transaction_records.csv)")
+    parser.add_argument("--capacity", type=int, default=VELOCITY_CAPACITY)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    transactions = load_transactions(args.raw_dir, args.transactions)
+    features = compute_velocity_features(transactions, args.capacity)
+    features.sort_values("TransactionID").to_csv(args.output, index=False)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote velocity features of {len(features)} transactions to {args.output} "
+          f"in {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+gunicorn settings read from the working directory by `gunicorn app:app`.
+
+Threads per worker come from GUNICORN_THREADS, which app.py also reads to
+size its /predict admission limit; set them there rather than with
+--threads so the two agree.
+
+Server hooks that keep the per-worker metrics snapshots of api/metrics.py
+consistent: stale snapshots are wiped when the server starts, and the
+counters of every worker the master reaps (after an exit, a crash or a
+kill) are folded into the retired snapshot so /metrics keeps them.
+METRICS_DIR defaults to static/metrics here; it must be set before
+api.metrics is imported.
+"""
+
+import os
+
+os.environ.setdefault("METRICS_DIR", "static/metrics")
+
+from api.metrics import MetricsRegistry, metrics  # noqa: E402
+
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+
+def on_starting(server):
+    MetricsRegistry.reset(metrics.metrics_dir)
+
+
+def child_exit(server, worker):
+    if metrics.metrics_dir and os.path.isdir(metrics.metrics_dir):
+        MetricsRegistry.retire(metrics.metrics_dir, worker.pid)
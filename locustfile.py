@@ -1,33 +1,86 @@
-from locust import HttpUser, TaskSet, task
+"""
+Load test of the fraud detection service.
 
+Batches are sampled and mutated from complete_dataset.csv (see
+benchmarks/traffic.py), with a configurable batch size mix, share of
+cache-hitting replays and arrival process:
 
-class UserBehavior(TaskSet):
-    @task(1)
-    def log_data(self):
-        self.client.get("/health")
+- closed (default): each user sends a batch, waits for the response,
+  thinks for --think-time seconds and sends the next one, so the offered
+  load drops when the service slows down;
+- open: each user fires batches at Poisson arrivals of --arrival-rate per
+  second without waiting for the responses, so the offered load stays
+  the same whatever the latency.
 
-    @task(2)
-    def predict(self):
-        payload = [
-            {
-                "TransactionID": "1",
-                "Timestamp": "2024-12-10T12:00:00",
-                "MerchantID": "101",
-                "Amount": 100.5,
-                "CustomerID": "202",
-                "TransactionAmount": 150.75,
-                "AnomalyScore": 0.5,
-                "Category": "Online",
-                "CustomerAge": 35,
-                "AccountBalance": 5000.25,
-                "SuspiciousFlag": 0,
-                "LastLogin": "2024-12-09T15:00:00"
-            }
-            ]
-        self.client.post("/predict", json=payload)
+Example:
+    locust -f locustfile.py --headless -u 50 -r 5 -t 5m \
+        --host http://127.0.0.1:8000 --csv locust_results --csv-full-history \
+        --batch-mix 1:0.7,10:0.2,100:0.1 --cache-hit-ratio 0.2 --arrival open
+"""
+
+import gevent
+from locust import HttpUser, events, task
+from benchmarks.traffic import TrafficGenerator
+
+_generator = None
+
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+    parser.add_argument("--batch-mix", default="1:0.7,10:0.2,100:0.1",
+                        help="Batch sizes and weights, e.g. 1:0.7,10:0.2,100:0.1")
+    parser.add_argument("--cache-hit-ratio", type=float, default=0.0,
+                        help="Fraction of batches replaying a recently sent one")
+    parser.add_argument("--arrival", choices=["closed", "open"], default="closed",
+                        help="Closed loop (wait for responses) or open (Poisson arrivals)")
+    parser.add_argument("--arrival-rate", type=float, default=1.0,
+                        help="Batches per second and user in the open model")
+    parser.add_argument("--think-time", type=float, default=1.0,
+                        help="Mean pause between batches in the closed model, in seconds")
+    parser.add_argument("--explanation", default="plots",
+                        choices=["plots", "json", "plot_data"],
+                        help="Explanation mode requested from /predict")
+    parser.add_argument("--health-ratio", type=float, default=0.5,
+                        help="/health calls per /predict call")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+@events.init.add_listener
+def create_generator(environment, **kwargs):
+    global _generator
+    options = environment.parsed_options
+    if options is None:
+        return
+    _generator = TrafficGenerator(
+        batch_mix=options.batch_mix,
+        cache_hit_ratio=options.cache_hit_ratio,
+        seed=options.seed,
+    )
 
 
 class LoadTest(HttpUser):
-    tasks = [UserBehavior]
-    min_wait = 1000
-    max_wait = 2000
+    def wait_time(self):
+        options = self.environment.parsed_options
+        # Open arrivals are paced inside the task
+        if options.arrival == "open" or options.think_time <= 0:
+            return 0
+        return _generator.rng.expovariate(1 / options.think_time)
+
+    def predict(self):
+        options = self.environment.parsed_options
+        batch = _generator.next_batch()
+        # One stats row per batch size, so the report can split the mix
+        self.client.post(f"/predict?explanation={options.explanation}", json=batch,
+                         name=f"/predict [batch={len(batch)}]")
+        if _generator.rng.random() < options.health_ratio:
+            self.client.get("/health")
+
+    @task
+    def send(self):
+        options = self.environment.parsed_options
+        if options.arrival == "closed":
+            self.predict()
+            return
+        # Open model: arrivals do not wait for earlier responses
+        gevent.spawn(self.predict)
+        gevent.sleep(_generator.rng.expovariate(options.arrival_rate))
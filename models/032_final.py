@@ -3,15 +3,23 @@ Data Modelling
 """
 
 # importing the required libraries
+import os
+import sys
 import pandas as pd
 import numpy as np
 import pickle
 
+# make the serving package importable when run as `python models/032_final.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.feature_pipeline import FeaturePipeline  # noqa: E402
+from api.time_features import TIME_FEATURES, add_time_features  # noqa: E402
+from models.frost import generate_frost_samples  # noqa: E402
+
 # Preprocessing
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+from sklearn.preprocessing import LabelEncoder, MinMaxScaler  # noqa: E402
 
 # Model Selection and Cross-Validation
-from sklearn.model_selection import (
+from sklearn.model_selection import (  # noqa: E402
     train_test_split,
     KFold,
     cross_val_score,
@@ -19,14 +27,14 @@ from sklearn.model_selection import (
 )
 
 # Machine Learning Models
-from sklearn.linear_model import LogisticRegression
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.svm import SVC
-from sklearn.neighbors import KNeighborsClassifier
+from sklearn.linear_model import LogisticRegression  # noqa: E402
+from sklearn.tree import DecisionTreeClassifier  # noqa: E402
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier  # noqa: E402
+from sklearn.svm import SVC  # noqa: E402
+from sklearn.neighbors import KNeighborsClassifier  # noqa: E402
 
 # Metrics
-from sklearn.metrics import (
+from sklearn.metrics import (  # noqa: E402
     accuracy_score,
     precision_score,
     recall_score,
@@ -36,7 +44,7 @@ from sklearn.metrics import (
 )
 
 # Imbalanced Data Handling
-from imblearn.over_sampling import SMOTE
+from imblearn.over_sampling import SMOTE  # noqa: E402
 
 fraud = pd.read_csv("complete_dataset.csv")
 print(fraud.columns)
@@ -63,21 +71,12 @@ models struggling to accurately identify fraudulent cases.
 
 # FEATURE ENGINEERING
 
-# converting the TimeStamp to a datetime format
-fraud1["Timestamp"] = pd.to_datetime(fraud1["Timestamp"])
-fraud1["LastLogin"] = pd.to_datetime(fraud1["LastLogin"])
-
-fraud1["gap"] = (fraud1["Timestamp"] - fraud1["LastLogin"]).dt.days.abs()
+# gap in days between Timestamp and LastLogin, and the time-based
+# features of Timestamp, as computed when serving
+add_time_features(fraud1)
 
 print(fraud1.dtypes)
 
-# Extract useful time-based features
-fraud1["Hour"] = fraud1["Timestamp"].dt.hour
-fraud1["Day"] = fraud1["Timestamp"].dt.day
-fraud1["Month"] = fraud1["Timestamp"].dt.month
-fraud1["Weekday"] = fraud1["Timestamp"].dt.weekday
-fraud1["Year"] = fraud1["Timestamp"].dt.year
-
 X = fraud1.drop(["FraudIndicator", "LastLogin", "Timestamp"], axis=1)
 y = fraud1["FraudIndicator"]
 
@@ -88,6 +87,11 @@ label_encoder = LabelEncoder()
 X["Category"] = label_encoder.fit_transform(X["Category"])
 X.head(10)
 
+# capture the vocabulary, column order and dtypes for the serving pipeline
+feature_pipeline = FeaturePipeline.from_training_data(
+    X, label_encoder, engineered_columns=TIME_FEATURES
+)
+
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2)
 
 # checking the sizes
@@ -119,25 +123,6 @@ smote = SMOTE()
 X_train_smote, y_train_smote = smote.fit_resample(X_train_scaled, y_train)
 
 
-# Define FROST function
-def generate_frost_samples(X_minority, initial_feature_index, k=5, m=1.5):
-    initial_feature_values = X_minority[:, initial_feature_index]
-    similarity_matrix = 1 / (
-        1 + np.abs(initial_feature_values[:, np.newaxis] - initial_feature_values)
-    )
-    k_nearest_indices = np.argsort(similarity_matrix, axis=1)[:, -k:]
-    synthetic_samples_initial = []
-    for i in range(len(initial_feature_values)):
-        for j in k_nearest_indices[i]:
-            synthetic_value = initial_feature_values[i] + m * (
-                initial_feature_values[j] - initial_feature_values[i]
-            )
-            synthetic_sample = np.copy(X_minority[i])
-            synthetic_sample[initial_feature_index] = synthetic_value
-            synthetic_samples_initial.append(synthetic_sample)
-    return np.array(synthetic_samples_initial)
-
-
 # Apply FROST for oversampling
 initial_feature_index = 0  # Choose the index of the initial feature to oversample
 X_train_frost = generate_frost_samples(
@@ -424,3 +409,8 @@ with open("ml_model.pkl", "wb") as file:
     pickle.dump(best_rf_model, file)
 
 print("Model saved as 'ml_model.pkl'")
+
+# the serving pipeline must be saved next to the model it was fitted with
+feature_pipeline.save("feature_pipeline.json")
+
+print("Feature pipeline saved as 'feature_pipeline.json'")
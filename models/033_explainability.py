@@ -1,24 +1,21 @@
+import os
+import sys
 import pickle
 import pandas as pd
 import shap
 import matplotlib.pyplot as plt
 from sklearn.preprocessing import LabelEncoder
 
+# make the serving package importable when run as `python models/033_explainability.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.time_features import add_time_features  # noqa: E402
+
 # Load the dataset
 fraud = pd.read_csv("complete_dataset.csv")
 
 
 # Preprocessing the data (Feature engineering)
-fraud["Timestamp"] = pd.to_datetime(fraud["Timestamp"])
-fraud["LastLogin"] = pd.to_datetime(fraud["LastLogin"])
-
-fraud["gap"] = (fraud["Timestamp"] - fraud["LastLogin"]).dt.days.abs()
-
-fraud["Hour"] = fraud["Timestamp"].dt.hour
-fraud["Day"] = fraud["Timestamp"].dt.day
-fraud["Month"] = fraud["Timestamp"].dt.month
-fraud["Weekday"] = fraud["Timestamp"].dt.weekday
-fraud["Year"] = fraud["Timestamp"].dt.year
+add_time_features(fraud)
 
 
 # Drop columns that are not needed
@@ -44,7 +41,8 @@ y = fraud["FraudIndicator"]
 label_encoder = LabelEncoder()
 X["Category"] = label_encoder.fit_transform(X["Category"])
 
-# Select a subset for SHAP (first 100 rows)
+# Select a subset for SHAP (first 100 rows); models/explain.py explains
+# every row in parallel
 X_shap = X[:100]
 
 # Load the trained model
@@ -0,0 +1,247 @@
+"""
+Explain the whole dataset with SHAP: a resumable, parallel batch job.
+
+models/033_explainability.py explains the first 100 transactions, as
+exact TreeSHAP over the whole dataset takes too long in one process.
+This job explains every transaction:
+
+- the feature matrix (the engineered features of 033_explainability.py)
+  is written once to features.npy, which every process memory-maps;
+- the rows are split into chunks of --chunk-size, explained in a process
+  pool whose workers each build one TreeExplainer for the model;
+- every chunk writes its SHAP values towards the fraud class at its own
+  rows of shap_values.npy, a memory-mapped matrix;
+- the sums behind the global feature importance (mean |SHAP| and mean
+  SHAP of every feature) are aggregated as chunks complete, and saved
+  with the list of finished chunks in progress.json, so an interrupted
+  run resumes with the chunks left.
+
+The run directory in --work-dir is keyed by the dataset, the model and
+the chunk size. Once every chunk is done, the importance is saved to
+shap_importance.json and the summary plots of the whole population are
+drawn into --output-dir; the beeswarm shows a sample of --plot-points
+transactions.
+
+Usage:
+    python models/explain.py --dataset complete_dataset.csv --work-dir shap_run --jobs 4
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import shap
+
+# make the serving package importable when run as `python models/explain.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.plot_renderer import SummaryPlotRenderer  # noqa: E402
+from models.train import engineer_features, hash_file, load_dataset, peak_memory_mb  # noqa: E402
+
+# Fraud class column of the explainer's output
+FRAUD_CLASS = 1
+
+# State of a pool process: its explainer and the memory-mapped matrices
+_worker = {}
+
+
+def _init_worker(model_path, run_dir):
+    with open(model_path, "rb") as model_file:
+        model = pickle.load(model_file)
+    _worker["explainer"] = shap.TreeExplainer(model)
+    _worker["features"] = np.load(os.path.join(run_dir, "features.npy"), mmap_mode="r")
+    _worker["shap_values"] = np.load(os.path.join(run_dir, "shap_values.npy"), mmap_mode="r+")
+
+
+def explain_chunk(chunk, start, end):
+    """
+    Explain rows start to end into shap_values.npy (pool process).
+
+    Returns:
+        tuple: (chunk, sum of |SHAP| per feature, sum of SHAP per feature).
+    """
+    values = _worker["explainer"].shap_values(np.asarray(_worker["features"][start:end]))
+    values = values[:, :, FRAUD_CLASS]
+    shap_values = _worker["shap_values"]
+    shap_values[start:end] = values
+    # Flushed before the chunk is reported, so a recorded chunk is on disk
+    shap_values.flush()
+    return chunk, np.abs(values).sum(axis=0).tolist(), values.sum(axis=0).tolist()
+
+
+class Progress:
+    """
+    Finished chunks and the running importance sums, persisted after every chunk.
+    """
+
+    def __init__(self, path, n_features):
+        self.path = path
+        self.state = {"chunks": [], "rows": 0, "abs_sum": [0.0] * n_features,
+                      "sum": [0.0] * n_features}
+        if os.path.exists(path):
+            with open(path) as progress_file:
+                self.state = json.load(progress_file)
+        self.done = set(self.state["chunks"])
+
+    def record(self, chunk, rows, abs_sum, total):
+        self.done.add(chunk)
+        self.state["chunks"] = sorted(self.done)
+        self.state["rows"] += rows
+        self.state["abs_sum"] = [a + b for a, b in zip(self.state["abs_sum"], abs_sum)]
+        self.state["sum"] = [a + b for a, b in zip(self.state["sum"], total)]
+        with open(f"{self.path}.tmp", "w") as progress_file:
+            json.dump(self.state, progress_file)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def importance(self, feature_names):
+        rows = max(self.state["rows"], 1)
+        return {
+            name: {"mean_abs_shap": abs_sum / rows, "mean_shap": total / rows}
+            for name, abs_sum, total in zip(feature_names, self.state["abs_sum"],
+                                            self.state["sum"])
+        }
+
+
+def prepare_run(dataset_path, model_path, work_dir, chunk_size):
+    """
+    Run directory of the inputs, with features.npy and shap_values.npy.
+
+    Returns:
+        tuple: (run directory, feature names, number of rows).
+    """
+    digest = hash_file(hash_file(hashlib.sha256(), dataset_path), model_path)
+    digest.update(json.dumps({"chunk_size": chunk_size}).encode())
+    run_dir = os.path.join(work_dir, f"shap-{digest.hexdigest()[:16]}")
+    meta_path = os.path.join(run_dir, "meta.json")
+
+    if not os.path.exists(meta_path):
+        X, _, _ = engineer_features(load_dataset(dataset_path))
+        os.makedirs(run_dir, exist_ok=True)
+        np.save(os.path.join(run_dir, "features.npy"), X.to_numpy(dtype=np.float64))
+        shap_values = np.lib.format.open_memmap(
+            os.path.join(run_dir, "shap_values.npy"), mode="w+", dtype=np.float64,
+            shape=X.shape,
+        )
+        del shap_values
+        # Written last: its presence marks a prepared run directory
+        with open(f"{meta_path}.tmp", "w") as meta_file:
+            json.dump({"features": list(X.columns), "rows": len(X)}, meta_file)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    with open(meta_path) as meta_file:
+        meta = json.load(meta_file)
+    return run_dir, meta["features"], meta["rows"]
+
+
+def render_plots(run_dir, feature_names, output_dir, plot_points, seed=0):
+    """
+    Bar plot of every row's importance, beeswarm of a sample of plot_points rows.
+    """
+    shap_values = np.load(os.path.join(run_dir, "shap_values.npy"), mmap_mode="r")
+    features = np.load(os.path.join(run_dir, "features.npy"), mmap_mode="r")
+    rows = np.arange(len(shap_values))
+    if len(rows) > plot_points:
+        rows = np.sort(np.random.default_rng(seed).choice(rows, plot_points, replace=False))
+
+    renderer = SummaryPlotRenderer(feature_names)
+    importance = np.abs(shap_values).mean(axis=0)
+    order = np.argsort(-importance, kind="stable")
+    plots = {
+        "shap_summary_bar.png": renderer.render_bar(shap_values, order),
+        "shap_summary.png": renderer.render_beeswarm(np.asarray(shap_values[rows]),
+                                                      np.asarray(features[rows]), order),
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    for name, png in plots.items():
+        with open(os.path.join(output_dir, name), "wb") as png_file:
+            png_file.write(png)
+    return list(plots)
+
+
+def explain(dataset_path, model_path, work_dir, output_dir, jobs=None, chunk_size=10_000,
+            plot_points=10_000, log=print):
+    """
+    Explain every row of the dataset, resuming a previous run of the same inputs.
+
+    Args:
+        dataset_path (str): complete_dataset.csv or a ColumnarDataset directory.
+        model_path (str): Pickled model to explain.
+        work_dir (str): Directory of the run directories.
+        output_dir (str): Where shap_importance.json and the plots go.
+        jobs (int): Processes explaining in parallel; defaults to the CPU count.
+        chunk_size (int): Rows explained per task.
+        plot_points (int): Rows drawn in the beeswarm plot.
+
+    Returns:
+        dict: Run directory, importance, chunk counts, duration and peak memory.
+    """
+    start = time.perf_counter()
+    run_dir, feature_names, n_rows = prepare_run(dataset_path, model_path, work_dir, chunk_size)
+    progress = Progress(os.path.join(run_dir, "progress.json"), len(feature_names))
+
+    chunks = [(chunk, begin, min(begin + chunk_size, n_rows))
+              for chunk, begin in enumerate(range(0, n_rows, chunk_size))]
+    pending = [task for task in chunks if task[0] not in progress.done]
+    log(f"{len(chunks) - len(pending)} of {len(chunks)} chunks done, {len(pending)} left")
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(model_path, run_dir)) as pool:
+            futures = {pool.submit(explain_chunk, *task): task for task in pending}
+            for future in as_completed(futures):
+                chunk, begin, end = futures[future]
+                _, abs_sum, total = future.result()
+                progress.record(chunk, end - begin, abs_sum, total)
+                log(f"chunk {chunk} ({end - begin} rows): "
+                    f"{len(progress.done)}/{len(chunks)} done")
+
+    importance = progress.importance(feature_names)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "shap_importance.json"), "w") as importance_file:
+        json.dump(importance, importance_file, indent=2)
+    plots = render_plots(run_dir, feature_names, output_dir, plot_points)
+
+    return {
+        "run_dir": run_dir,
+        "rows": n_rows,
+        "chunks": len(chunks),
+        "reused_chunks": len(chunks) - len(pending),
+        "importance": importance,
+        "plots": plots,
+        "seconds": time.perf_counter() - start,
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Explain the whole dataset with SHAP.")
+    parser.add_argument("--dataset", default="complete_dataset.csv",
+                        help="complete_dataset.csv or a columnar dataset directory")
+    parser.add_argument("--model", default="models/ml_model.pkl")
+    parser.add_argument("--work-dir", default="shap_run",
+                        help="SHAP matrix and progress; rerun with it to resume")
+    parser.add_argument("--output-dir", default="models")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Parallel workers (default: the number of CPUs)")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--plot-points", type=int, default=10_000,
+                        help="Transactions sampled for the beeswarm plot")
+    args = parser.parse_args()
+
+    report = explain(args.dataset, args.model, args.work_dir, args.output_dir, args.jobs,
+                     args.chunk_size, args.plot_points)
+    print(f"{'feature':>18} {'mean |SHAP|':>12} {'mean SHAP':>10}")
+    ranked = sorted(report["importance"].items(), key=lambda item: -item[1]["mean_abs_shap"])
+    for name, values in ranked:
+        print(f"{name:>18} {values['mean_abs_shap']:>12.5f} {values['mean_shap']:>10.5f}")
+    print(f"{report['rows']} rows in {report['chunks']} chunks ({report['reused_chunks']} "
+          f"reused) in {report['seconds']:.1f} s, peak memory {report['peak_memory_mb']:.0f} MB")
+    print(f"SHAP values in {os.path.join(report['run_dir'], 'shap_values.npy')}; "
+          f"plots in {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
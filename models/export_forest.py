@@ -0,0 +1,42 @@
+"""
+Export the pickled forest as memory-mappable arrays.
+
+Writes one .npy file per tree array plus manifest.json, which
+CompiledForest.load maps read-only so that every gunicorn worker shares
+the same pages instead of unpickling its own copy of the model.
+
+Usage:
+    python models/export_forest.py models/ml_model.pkl models/ml_model_arrays
+"""
+
+import os
+import sys
+import pickle
+import hashlib
+import argparse
+
+# make the serving package importable when run as `python models/export_forest.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.forest_engine import CompiledForest  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the forest as .npy arrays.")
+    parser.add_argument("model", nargs="?", default="models/ml_model.pkl")
+    parser.add_argument("output", nargs="?", default="models/ml_model_arrays")
+    args = parser.parse_args()
+
+    with open(args.model, "rb") as model_file:
+        payload = model_file.read()
+    model = pickle.loads(payload)
+
+    # same identifier as scoring_service.load_model_version, so cache keys do not change
+    model_version = hashlib.sha256(payload).hexdigest()[:16]
+
+    forest = CompiledForest.from_sklearn(model, model_version=model_version)
+    forest.save(args.output)
+    print(f"Exported {forest.n_estimators} trees ({len(forest.feature)} nodes) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+FROST oversampling of the minority class, vectorized.
+
+Each minority sample gets k synthetic copies whose initial feature is
+moved m times the distance towards one of its k most similar samples on
+that feature (itself included), as in the original implementation of
+models/032_final.py. Similarity is 1 / (1 + |difference|) on a single
+feature, so the k most similar samples of a value are a run of k
+neighbours in the sorted values: sorting once replaces the n x n
+similarity matrix and its per-row argsort, and the neighbours of every
+sample are found together in O(n k) time and memory, after an
+O(n log n) sort. When the k-th nearest distance is tied, the neighbour
+picked may differ from the original's, whose pick among equally near
+samples depends on the unstable order of argsort.
+"""
+
+import numpy as np
+
+
+def frost_neighbors(values, k=5):
+    """
+    Indices of the k most similar values of each value, least similar first.
+
+    Args:
+        values (np.ndarray): The initial feature of the minority samples.
+        k (int): Neighbours per sample, the sample itself included.
+
+    Returns:
+        np.ndarray: Shape (n, min(k, n)); row i lists the neighbours of
+                    values[i] by decreasing distance, so it ends with i
+                    (or a sample of equal value).
+    """
+    n = len(values)
+    k = min(k, n)
+    if n == 0:
+        return np.empty((0, 0), dtype=np.int64)
+    order = np.argsort(values, kind="stable")
+    ordered = values[order]
+
+    # Grow a run of sorted values around each position by its nearer
+    # side, k - 1 times: the run holds the k nearest values
+    positions = np.arange(n)
+    low = positions.copy()
+    high = positions.copy()
+    padded = np.concatenate(([-np.inf], ordered, [np.inf]))
+    for _ in range(k - 1):
+        left = ordered - padded[low]
+        right = padded[high + 2] - ordered
+        take_right = right < left
+        high += take_right
+        low -= ~take_right
+    window = low[:, np.newaxis] + np.arange(k)
+    positions = positions[:, np.newaxis]
+
+    # Least similar first, like the tail of an ascending argsort
+    distance = np.abs(ordered[window] - ordered[positions])
+    window = np.take_along_axis(window, np.argsort(-distance, axis=1, kind="stable"), axis=1)
+
+    neighbors = np.empty((n, k), dtype=np.int64)
+    neighbors[order] = order[window]
+    return neighbors
+
+
+def iter_frost_samples(X_minority, initial_feature_index, k=5, m=1.5, chunk_size=100_000):
+    """
+    Generate the FROST samples in blocks of chunk_size minority rows.
+
+    Yields:
+        np.ndarray: Synthetic samples of consecutive minority rows, k per
+                    row, in the order of generate_frost_samples().
+    """
+    values = X_minority[:, initial_feature_index]
+    neighbors = frost_neighbors(values, k)
+    for start in range(0, len(X_minority), chunk_size):
+        end = min(start + chunk_size, len(X_minority))
+        yield _frost_block(X_minority, values, neighbors, start, end, initial_feature_index, m)
+
+
+def generate_frost_samples(X_minority, initial_feature_index, k=5, m=1.5):
+    """
+    FROST samples of the minority class, as one preallocated array.
+
+    Args:
+        X_minority (np.ndarray): Minority samples, shape (n, n_features).
+        initial_feature_index (int): Column whose values are interpolated.
+        k (int): Synthetic samples per minority sample.
+        m (float): Interpolation factor towards each neighbour.
+
+    Returns:
+        np.ndarray: Shape (n * min(k, n), n_features).
+    """
+    values = X_minority[:, initial_feature_index]
+    neighbors = frost_neighbors(values, k)
+    return _frost_block(X_minority, values, neighbors, 0, len(X_minority),
+                        initial_feature_index, m)
+
+
+def _frost_block(X_minority, values, neighbors, start, end, initial_feature_index, m):
+    k = neighbors.shape[1]
+    block = np.empty((end - start, k, X_minority.shape[1]), dtype=X_minority.dtype)
+    block[:] = X_minority[start:end, np.newaxis, :]
+    own = values[start:end, np.newaxis]
+    block[:, :, initial_feature_index] = own + m * (values[neighbors[start:end]] - own)
+    return block.reshape(-1, X_minority.shape[1])
@@ -0,0 +1,48 @@
+"""
+Publish a trained model to the model registry and make it current.
+
+Copies ml_model.pkl and feature_pipeline.json into a version directory
+named after the hash of the model, then points the registry's CURRENT
+file at it. Servers started with MODEL_REGISTRY_DIR load, warm up and
+swap in the new version in the background within
+MODEL_REGISTRY_CHECK_SECONDS; POST /admin/reload starts it right away.
+With --activate an already published version is made current again,
+e.g. to roll back.
+
+Usage:
+    python models/publish_model.py --registry model_registry --model-dir models
+    python models/publish_model.py --registry model_registry --activate 0123456789abcdef
+"""
+
+import os
+import sys
+import argparse
+
+# make the serving package importable when run as `python models/publish_model.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.model_registry import MODEL_FILE, PIPELINE_FILE, ModelRegistry  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish a model to the model registry.")
+    parser.add_argument("--registry", default=os.getenv("MODEL_REGISTRY_DIR", "model_registry"))
+    parser.add_argument("--model-dir", default="models",
+                        help=f"Directory holding {MODEL_FILE} and {PIPELINE_FILE}")
+    parser.add_argument("--activate", metavar="VERSION",
+                        help="Make a published version current instead")
+    args = parser.parse_args()
+
+    if args.activate:
+        ModelRegistry.activate(args.registry, args.activate)
+        print(f"Version {args.activate} is now current in {args.registry}")
+        return
+    version = ModelRegistry.publish(
+        args.registry,
+        os.path.join(args.model_dir, MODEL_FILE),
+        os.path.join(args.model_dir, PIPELINE_FILE),
+    )
+    print(f"Published version {version} to {args.registry}")
+
+
+if __name__ == "__main__":
+    main()
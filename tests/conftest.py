@@ -0,0 +1,5 @@
+import os
+import sys
+
+# make the serving package importable when run as `pytest`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
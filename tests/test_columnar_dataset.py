@@ -0,0 +1,62 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from api.columnar_dataset import STRING, ColumnarDataset
+
+SCHEMA = {"TransactionID": "int64", "Amount": "float64", "Category": STRING}
+
+
+def frame(ids):
+    return pd.DataFrame({
+        "TransactionID": ids,
+        "Amount": np.asarray(ids, dtype=np.float64) / 10,
+        "Category": ["Food" if i % 2 else None for i in ids],
+    })
+
+
+def test_append_and_read_back(tmp_path):
+    dataset = ColumnarDataset.create(str(tmp_path / "dataset"), SCHEMA)
+    dataset.append(frame([1, 2, 3]), source="a")
+    dataset.append(frame([4]))
+    reopened = ColumnarDataset.open(str(tmp_path / "dataset"))
+    assert reopened.has_source("a") and reopened.n_rows == 4
+    pd.testing.assert_frame_equal(reopened.to_frame(), frame([1, 2, 3, 4]))
+
+
+def test_create_refuses_an_existing_dataset(tmp_path):
+    ColumnarDataset.create(str(tmp_path / "dataset"), SCHEMA)
+    with pytest.raises(ValueError):
+        ColumnarDataset.create(str(tmp_path / "dataset"), SCHEMA)
+
+
+def test_rebuild_replaces_the_old_dataset_on_commit(tmp_path):
+    directory = str(tmp_path / "dataset")
+    ColumnarDataset.create(directory, SCHEMA).append(frame([1, 2]), source="old")
+
+    rebuild = ColumnarDataset.create(directory, SCHEMA, overwrite=True)
+    rebuild.stage(frame([7, 8, 9]))
+    # Readers see the old dataset until the rebuild is committed
+    pd.testing.assert_frame_equal(ColumnarDataset.open(directory).to_frame(), frame([1, 2]))
+
+    rebuild.commit("new")
+    assert sorted(os.listdir(tmp_path)) == ["dataset"]
+    reopened = ColumnarDataset.open(directory)
+    assert reopened.has_source("new") and not reopened.has_source("old")
+    pd.testing.assert_frame_equal(reopened.to_frame(), frame([7, 8, 9]))
+    # Later appends go to the new dataset
+    rebuild.append(frame([10]))
+    assert ColumnarDataset.open(directory).n_rows == 4
+
+
+def test_interrupted_rebuild_leaves_the_old_dataset(tmp_path):
+    directory = str(tmp_path / "dataset")
+    ColumnarDataset.create(directory, SCHEMA).append(frame([1, 2]))
+    ColumnarDataset.create(directory, SCHEMA, overwrite=True).stage(frame([7]))
+
+    pd.testing.assert_frame_equal(ColumnarDataset.open(directory).to_frame(), frame([1, 2]))
+    # The next rebuild starts over
+    rebuild = ColumnarDataset.create(directory, SCHEMA, overwrite=True)
+    rebuild.append(frame([3]))
+    pd.testing.assert_frame_equal(ColumnarDataset.open(directory).to_frame(), frame([3]))
+    assert sorted(os.listdir(tmp_path)) == ["dataset"]
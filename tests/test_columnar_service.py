@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+from api.columnar_service import REQUIRED_COLUMNS, compile_features
+from api.preprocessing_service import feature_pipeline, preprocess_data
+from api.feature_engineering_service import perform_feature_engineering
+
+RECORDS = pd.read_csv("complete_dataset.csv").to_dict("records")
+
+
+def reference_features(records):
+    # The general pandas path of score_records
+    return perform_feature_engineering(preprocess_data(records)).to_numpy(dtype=np.float32)
+
+
+def assert_matches_pandas(records):
+    features = compile_features(records)
+    assert features is not None
+    assert features.dtype == np.float32
+    np.testing.assert_array_equal(features, reference_features(records))
+
+
+def with_value(column, value):
+    return [{**RECORDS[0], column: value}, RECORDS[1]]
+
+
+@pytest.mark.parametrize("size", [1, 2, 32, len(RECORDS)])
+def test_dataset_records(size):
+    assert_matches_pandas(RECORDS[:size])
+
+
+def test_single_record():
+    assert_matches_pandas(RECORDS[3])
+
+
+FLOAT_COLUMNS = ["Amount", "TransactionAmount", "AnomalyScore", "AccountBalance"]
+
+
+@pytest.mark.parametrize("column", FLOAT_COLUMNS + ["CustomerAge", "SuspiciousFlag"])
+def test_none_is_filled_with_zero(column):
+    assert_matches_pandas(with_value(column, None))
+
+
+@pytest.mark.parametrize("column", FLOAT_COLUMNS)
+def test_nan_is_filled_with_zero(column):
+    assert_matches_pandas(with_value(column, float("nan")))
+
+
+@pytest.mark.parametrize("column, value", [("Amount", "12.5"), ("CustomerAge", "41"),
+                                           ("Timestamp", "2022-03-04"),
+                                           ("LastLogin", "2022-01-05 10:11:12")])
+def test_strings_and_other_fixed_layouts(column, value):
+    assert_matches_pandas(with_value(column, value))
+
+
+@pytest.mark.parametrize("column, value", [
+    ("Timestamp", "2022-01-01 00:00:00.5"),
+    ("Timestamp", "2022-01-01T00:00:00+02:00"),
+    ("LastLogin", "2022/01/05"),
+    # NaN integers are left to pandas
+    ("CustomerAge", float("nan")),
+])
+def test_falls_back_to_pandas(column, value):
+    records = with_value(column, value)
+    assert compile_features(records) is None
+    # The pandas path scores them instead
+    assert reference_features(records).shape == (2, len(feature_pipeline.columns))
+
+
+@pytest.mark.parametrize("records", [
+    [],
+    "not records",
+    [RECORDS[0], "not a record"],
+    [{column: RECORDS[0][column] for column in REQUIRED_COLUMNS if column != "Amount"}],
+    with_value("Category", "Unseen"),
+    with_value("Timestamp", None),
+    with_value("LastLogin", "2022-02-30"),
+    with_value("Amount", "not a number"),
+])
+def test_falls_back_on_invalid_input(records):
+    # The pandas path raises the error the client sees
+    assert compile_features(records) is None
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+import shap
+from sklearn.ensemble import RandomForestClassifier
+from api.forest_engine import CompiledForest
+
+N_FEATURES = 13
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, N_FEATURES))
+    y = (X[:, 0] + X[:, 3] * X[:, 5] + rng.normal(scale=0.5, size=len(X)) > 0).astype(int)
+    return X, y
+
+
+@pytest.fixture(scope="module")
+def model(data):
+    X, y = data
+    return RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0).fit(X, y)
+
+
+@pytest.fixture(scope="module")
+def forest(model):
+    return CompiledForest.from_sklearn(model, model_version="test")
+
+
+@pytest.mark.parametrize("n_rows", [1, 7, 400])
+def test_predictions_match_sklearn(data, model, forest, n_rows):
+    X = data[0][:n_rows]
+    np.testing.assert_array_equal(forest.predict_proba(X), model.predict_proba(X))
+    np.testing.assert_array_equal(forest.predict(X), model.predict(X))
+
+
+@pytest.mark.parametrize("bad", [np.nan, np.inf, -np.inf])
+def test_rejects_nan_and_infinity(data, forest, bad):
+    X = data[0][:3].copy()
+    X[1, 2] = bad
+    with pytest.raises(ValueError, match="NaN or infinity"):
+        forest.predict_proba(X)
+
+
+@pytest.mark.parametrize("shape", [(3, N_FEATURES - 1), (N_FEATURES,)])
+def test_rejects_wrong_shape(forest, shape):
+    with pytest.raises(ValueError, match=f"expects {N_FEATURES} features"):
+        forest.predict(np.zeros(shape))
+
+
+def test_save_and_load_round_trip(tmp_path, data, forest):
+    forest.save(tmp_path)
+    loaded = CompiledForest.load(tmp_path)
+    assert isinstance(loaded.feature, np.memmap)
+    assert loaded.model_version == "test"
+    assert loaded.n_estimators == forest.n_estimators
+    X = data[0]
+    np.testing.assert_array_equal(loaded.predict_proba(X), forest.predict_proba(X))
+
+
+def test_shap_model_matches_tree_explainer(data, model, forest):
+    X = data[0][:25]
+    expected = shap.TreeExplainer(model)
+    explainer = shap.TreeExplainer(forest.to_shap_model())
+    np.testing.assert_allclose(np.asarray(explainer.shap_values(X)),
+                               np.asarray(expected.shap_values(X)), atol=1e-12)
+    np.testing.assert_allclose(explainer.expected_value, expected.expected_value, atol=1e-12)
+
+
+def test_contributions_add_up_to_probabilities(data, forest):
+    X = data[0][:50]
+    bias, contributions = forest.contributions(X)
+    assert contributions.shape == (len(X), N_FEATURES, 2)
+    np.testing.assert_allclose(bias + contributions.sum(axis=1), forest.predict_proba(X),
+                               atol=1e-12)
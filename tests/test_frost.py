@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from models.frost import frost_neighbors, generate_frost_samples, iter_frost_samples
+
+N_FEATURES = 4
+
+
+def reference_frost_samples(X_minority, initial_feature_index, k=5, m=1.5):
+    # The original dense implementation of models/032_final.py
+    initial_feature_values = X_minority[:, initial_feature_index]
+    similarity_matrix = 1 / (
+        1 + np.abs(initial_feature_values[:, np.newaxis] - initial_feature_values)
+    )
+    k_nearest_indices = np.argsort(similarity_matrix, axis=1)[:, -k:]
+    synthetic_samples_initial = []
+    for i in range(len(initial_feature_values)):
+        for j in k_nearest_indices[i]:
+            synthetic_value = initial_feature_values[i] + m * (
+                initial_feature_values[j] - initial_feature_values[i]
+            )
+            synthetic_sample = np.copy(X_minority[i])
+            synthetic_sample[initial_feature_index] = synthetic_value
+            synthetic_samples_initial.append(synthetic_sample)
+    return np.array(synthetic_samples_initial)
+
+
+def minority(n, seed=0):
+    return np.random.default_rng(seed).random((n, N_FEATURES))
+
+
+@pytest.mark.parametrize("n", [1, 5, 6, 50, 300])
+@pytest.mark.parametrize("feature", range(N_FEATURES))
+def test_matches_reference(n, feature):
+    X_minority = minority(n, seed=n)
+    np.testing.assert_array_equal(generate_frost_samples(X_minority, feature),
+                                  reference_frost_samples(X_minority, feature))
+
+
+@pytest.mark.parametrize("k, m", [(1, 1.5), (3, 0.5), (8, 2.0)])
+def test_matches_reference_for_other_parameters(k, m):
+    X_minority = minority(40)
+    np.testing.assert_array_equal(generate_frost_samples(X_minority, 1, k=k, m=m),
+                                  reference_frost_samples(X_minority, 1, k=k, m=m))
+
+
+@pytest.mark.parametrize("n", [1, 2, 4])
+def test_more_neighbours_than_samples(n):
+    # Every sample is a neighbour of every other: n samples per row
+    X_minority = minority(n)
+    samples = generate_frost_samples(X_minority, 0, k=5)
+    assert samples.shape == (n * n, N_FEATURES)
+    np.testing.assert_array_equal(samples, reference_frost_samples(X_minority, 0, k=5))
+
+
+def test_no_samples():
+    X_minority = np.empty((0, N_FEATURES))
+    assert frost_neighbors(X_minority[:, 0]).shape == (0, 0)
+    assert generate_frost_samples(X_minority, 0).shape == (0, N_FEATURES)
+    assert list(iter_frost_samples(X_minority, 0)) == []
+
+
+def test_ties_move_by_the_same_distances():
+    # Where the k-th nearest distance is tied, the original's pick depends
+    # on argsort's unstable order; any of the tied neighbours is as near
+    X_minority = minority(200)
+    X_minority[:, 2] = np.random.default_rng(1).integers(0, 10, 200)
+    expected = reference_frost_samples(X_minority, 2)
+    actual = generate_frost_samples(X_minority, 2)
+    own = np.repeat(X_minority[:, 2], 5)
+    moved = [np.sort(np.abs(samples[:, 2] - own).reshape(200, 5), axis=1)
+             for samples in (expected, actual)]
+    np.testing.assert_array_equal(moved[0], moved[1])
+    np.testing.assert_array_equal(np.delete(expected, 2, axis=1), np.delete(actual, 2, axis=1))
+
+
+@pytest.mark.parametrize("n", [1, 7, 50, 101])
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 1_000])
+def test_chunks_concatenate_to_the_full_array(n, chunk_size):
+    X_minority = minority(n)
+    chunks = list(iter_frost_samples(X_minority, 3, chunk_size=chunk_size))
+    assert len(chunks) == -(-n // chunk_size)
+    np.testing.assert_array_equal(np.vstack(chunks), generate_frost_samples(X_minority, 3))
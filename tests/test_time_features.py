@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+from api.time_features import (
+    NAT, SCALAR_MAX, TIME_FEATURES, time_feature_row, time_features, to_epoch_ns,
+)
+
+
+def reference_time_features(timestamps, last_logins):
+    # The original feature engineering: pd.to_datetime, then .dt accessors
+    timestamp = pd.to_datetime(pd.Series(timestamps, dtype=object))
+    last_login = pd.to_datetime(pd.Series(last_logins, dtype=object))
+    return {
+        "gap": (timestamp - last_login).dt.days.abs(),
+        "Hour": timestamp.dt.hour,
+        "Day": timestamp.dt.day,
+        "Month": timestamp.dt.month,
+        "Weekday": timestamp.dt.weekday,
+        "Year": timestamp.dt.year,
+    }
+
+
+def assert_matches_pandas(timestamps, last_logins):
+    expected = reference_time_features(timestamps, last_logins)
+    epochs, logins = to_epoch_ns(timestamps), to_epoch_ns(last_logins)
+    actual = time_features(epochs, logins)
+    for name in TIME_FEATURES:
+        reference = expected[name].to_numpy()
+        assert actual[name].dtype == reference.dtype, name
+        np.testing.assert_array_equal(actual[name], reference, err_msg=name)
+    for row, (epoch, login) in enumerate(zip(epochs.tolist(), logins.tolist())):
+        if epoch != NAT and login != NAT:
+            assert time_feature_row(epoch, login) == tuple(
+                expected[name].iloc[row] for name in TIME_FEATURES)
+
+
+def timestamps(start, end, n, layout="%Y-%m-%d %H:%M:%S", seed=0):
+    low, high = (pd.Timestamp(value).value // 10**9 for value in (start, end))
+    seconds = np.random.default_rng(seed).integers(low, high, n)
+    return pd.to_datetime(seconds, unit="s").strftime(layout).tolist()
+
+
+# Both the scalar (up to SCALAR_MAX values) and the vectorized paths
+SIZES = [1, SCALAR_MAX + 1, 200]
+
+
+@pytest.mark.parametrize("n", SIZES)
+@pytest.mark.parametrize("layout", ["%Y-%m-%d", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S"])
+def test_fixed_layouts(n, layout):
+    assert_matches_pandas(timestamps("2020-01-01", "2025-01-01", n, layout),
+                          timestamps("2019-01-01", "2025-01-01", n, "%Y-%m-%d", seed=1))
+
+
+@pytest.mark.parametrize("n", SIZES)
+@pytest.mark.parametrize("start, end", [("1700-01-01", "1900-01-01"),
+                                        ("2200-01-01", "2262-01-01")])
+def test_dates_outside_the_calendar_table(n, start, end):
+    assert_matches_pandas(timestamps(start, end, n), timestamps(start, end, n, seed=1))
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_fractional_seconds(n):
+    values = [f"{value}.{row % 1000:03d}{'5' * (row % 4)}"
+              for row, value in enumerate(timestamps("2020-01-01", "2025-01-01", n))]
+    assert_matches_pandas(values, timestamps("2020-01-01", "2025-01-01", n, seed=1))
+
+
+@pytest.mark.parametrize("n", SIZES)
+@pytest.mark.parametrize("offset", ["+05:30", "-08:00", "Z"])
+def test_timezone_offsets_keep_the_local_wall_time(n, offset):
+    values, logins = (
+        [f"{value}{offset}"
+         for value in timestamps("2020-01-01", "2025-01-01", n, "%Y-%m-%dT%H:%M:%S", seed)]
+        for seed in (0, 1)
+    )
+    assert_matches_pandas(values, logins)
+
+
+def test_gap_between_different_offsets_counts_wall_clock_days():
+    # The .dt code subtracted UTC instants here: 2023-01-01T18:00Z and
+    # 2023-01-01T04:00Z are 0 days apart, the wall times 1 day
+    values = ["2023-01-01T23:30:00+05:30"] * SIZES[1]
+    logins = ["2022-12-31T20:00:00-08:00"] * SIZES[1]
+    features = time_features(to_epoch_ns(values), to_epoch_ns(logins))
+    assert (features["gap"] == 1).all()
+    assert (features["Hour"] == 23).all() and (features["Day"] == 1).all()
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_missing_values(n):
+    values = timestamps("2020-01-01", "2025-01-01", n)
+    logins = timestamps("2020-01-01", "2025-01-01", n, seed=1)
+    values[0] = None
+    logins[-1] = float("nan")
+    assert_matches_pandas(values, logins)
+    features = time_features(to_epoch_ns(values), to_epoch_ns(logins))
+    assert np.isnan(features["Hour"][0]) and np.isnan(features["gap"][-1])
+
+
+def test_datetime64_input():
+    values = pd.to_datetime(timestamps("1750-01-01", "2262-01-01", 100)).to_numpy()
+    logins = pd.to_datetime(timestamps("1950-01-01", "2050-01-01", 100, seed=1)).to_numpy()
+    assert_matches_pandas(values, logins)
+
+
+@pytest.mark.parametrize("n", SIZES)
+@pytest.mark.parametrize("bad", ["not a date", "2023-02-30", "2023-13-01 00:00:00",
+                                 "2023-01-01 24:00:00"])
+def test_unparseable_strings_raise_like_pandas(n, bad):
+    values = timestamps("2020-01-01", "2025-01-01", n)
+    values[-1] = bad
+    with pytest.raises(ValueError):
+        pd.to_datetime(pd.Series(values, dtype=object))
+    with pytest.raises(ValueError):
+        to_epoch_ns(values)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+from api.velocity import VelocityAggregator
+from feature_engineering.velocity_features import compute_velocity_features
+
+# Five-minute buckets, as in the service's 1h window
+WINDOWS = {"1h": (3600, 12)}
+
+
+def features(aggregator, timestamps, amounts=None, customer_id=1):
+    amounts = amounts or [1.0] * len(timestamps)
+    return aggregator.update_many([customer_id] * len(timestamps), timestamps, amounts)
+
+
+def test_in_order_events_count_the_window_before_them():
+    aggregator = VelocityAggregator(capacity=8, windows=WINDOWS)
+    values = features(aggregator, [0, 600, 1200, 4000], [1.0, 2.0, 4.0, 8.0])
+    np.testing.assert_array_equal(values, [[0, 0], [1, 1], [2, 3], [2, 6]])
+
+
+def test_late_event_ignores_later_transactions():
+    aggregator = VelocityAggregator(capacity=8, windows=WINDOWS)
+    features(aggregator, [0, 3000], [1.0, 2.0])
+    # The event at 600 s only sees the one at 0 s, not the one at 3000 s
+    np.testing.assert_array_equal(features(aggregator, [600], [4.0]), [[1, 1]])
+    # ...and is counted for the events after it
+    np.testing.assert_array_equal(features(aggregator, [3100]), [[3, 7]])
+
+
+@pytest.mark.parametrize("late", [0, 3600])
+def test_event_older_than_the_ring_gets_zeros(late):
+    aggregator = VelocityAggregator(capacity=8, windows=WINDOWS)
+    features(aggregator, [0, 7200])
+    np.testing.assert_array_equal(features(aggregator, [late]), [[0, 0]])
+
+
+def transactions(n, customers=20, seed=0):
+    rng = np.random.default_rng(seed)
+    # Ties on Timestamp are broken by TransactionID, offline and online
+    seconds = rng.integers(0, 3 * 86400, n) // 60 * 60
+    return pd.DataFrame({
+        "TransactionID": rng.permutation(n) + 1,
+        "CustomerID": rng.integers(1, customers + 1, n),
+        "Amount": rng.integers(1, 10_000, n) / 100,
+        "Timestamp": pd.to_datetime(seconds + 1_700_000_000, unit="s"),
+    })
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 50])
+def test_online_updates_match_offline_features(batch_size):
+    offline = compute_velocity_features(transactions(500))
+    records = transactions(500).sort_values(["Timestamp", "TransactionID"], kind="stable")
+    records["Timestamp"] = records["Timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    records = records.to_dict("records")
+
+    aggregator = VelocityAggregator()
+    online = []
+    for start in range(0, len(records), batch_size):
+        online += aggregator.update_records(records[start:start + batch_size])
+    online = pd.DataFrame(online)
+    online.insert(0, "TransactionID", [record["TransactionID"] for record in records])
+    pd.testing.assert_frame_equal(online, offline)